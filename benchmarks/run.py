@@ -0,0 +1,156 @@
+"""
+Runs the benchmark suite of defSim and compares results between versions.
+
+Run the suite and write the results to a JSON file (by default in benchmarks/results, named after the version of
+defSim and the git commit)::
+
+    python benchmarks/run.py run --quick
+    python benchmarks/run.py run --suite topology --suite influence_function --output before.json
+
+Compare two result files, which prints the ratio of each measure and exits with status 1 if a measure got worse by
+more than the threshold::
+
+    python benchmarks/run.py compare before.json after.json --threshold 0.1
+"""
+import argparse
+import concurrent.futures
+import datetime
+import json
+import multiprocessing as mp
+import os
+import pathlib
+import platform
+import subprocess
+import sys
+
+BENCHMARK_FOLDER = pathlib.Path(__file__).resolve().parent
+REPOSITORY = BENCHMARK_FOLDER.parent
+sys.path[:0] = [str(BENCHMARK_FOLDER), str(REPOSITORY)]  # the measured defSim is the one in this repository
+
+import suites  # noqa: E402
+
+
+def metadata() -> dict:
+    """
+    :returns: The versions and the machine the results were measured with.
+    """
+    import defSim
+    import networkx
+    import numpy
+
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=str(REPOSITORY), capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {'defSim_version': defSim.__version__,
+            'commit': commit,
+            'date': datetime.datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'numpy': numpy.__version__,
+            'networkx': networkx.__version__,
+            'platform': platform.platform(),
+            'processor': platform.processor(),
+            'cpu_count': os.cpu_count()}
+
+
+def run_case(case: dict) -> dict:
+    """
+    Measures a case in a new process.
+
+    :returns: The case without its function, with the measures or the error that was raised.
+    """
+    result = {'suite': case['suite'], 'name': case['name'], 'parameters': case['parameters']}
+    # a process per case, so every case starts with a new interpreter and its own peak memory
+    with concurrent.futures.ProcessPoolExecutor(max_workers=1, mp_context=mp.get_context('spawn')) as executor:
+        try:
+            result['measures'] = executor.submit(case['function'], **case['parameters']).result()
+        except Exception as error:
+            result['error'] = '{}: {}'.format(type(error).__name__, error)
+    return result
+
+
+def run(arguments):
+    cases = suites.create_cases(quick=arguments.quick, suites=arguments.suite)
+    if arguments.filter:
+        cases = [case for case in cases if arguments.filter in case['name']]
+    info = metadata()
+    output = arguments.output
+    if output is None:
+        output = BENCHMARK_FOLDER / 'results' / '{}-{}.json'.format(info['defSim_version'],
+                                                                    info['commit'] or info['date'])
+    output = pathlib.Path(output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+
+    results = []
+    for number, case in enumerate(cases, start=1):
+        result = run_case(case)
+        results.append(result)
+        measures = result.get('measures', {'error': result.get('error')})
+        print('[{}/{}] {} {}: {}'.format(number, len(cases), case['suite'], case['name'],
+                                         ', '.join('{}={}'.format(key, _format(value))
+                                                   for key, value in measures.items())), flush=True)
+        # written after every case, so an interrupted run keeps the finished cases
+        output.write_text(json.dumps({'metadata': info, 'quick': arguments.quick, 'results': results}, indent=1))
+    print('Results written to {}'.format(output))
+
+
+def compare(arguments) -> int:
+    """
+    :returns: The number of measures that got worse by more than the threshold.
+    """
+    before, after = [json.loads(pathlib.Path(path).read_text()) for path in [arguments.before, arguments.after]]
+    print('{} ({}) -> {} ({})'.format(before['metadata']['defSim_version'], before['metadata']['commit'],
+                                      after['metadata']['defSim_version'], after['metadata']['commit']))
+    before_results = {(result['suite'], result['name']): result for result in before['results']}
+    regressions = 0
+    print('{:<22}{:<30}{:<22}{:>12}{:>12}{:>9}'.format('suite', 'case', 'measure', 'before', 'after', 'ratio'))
+    for result in after['results']:
+        previous = before_results.get((result['suite'], result['name']))
+        if previous is None or 'measures' not in result or 'measures' not in previous:
+            continue
+        for measure, value in result['measures'].items():
+            old_value = previous['measures'].get(measure)
+            if value is None or old_value is None or old_value == 0:
+                continue
+            ratio = value / old_value
+            # a ratio above 1 is an improvement, whatever the direction of the measure
+            improvement = ratio if measure in suites.HIGHER_IS_BETTER else 1 / ratio if ratio > 0 else float('inf')
+            flag = ''
+            if improvement < 1 - arguments.threshold:
+                flag = '  worse'
+                regressions += 1
+            elif improvement > 1 + arguments.threshold:
+                flag = '  better'
+            print('{:<22}{:<30}{:<22}{:>12}{:>12}{:>9.2f}{}'.format(result['suite'], result['name'], measure,
+                                                                   _format(old_value), _format(value), ratio, flag))
+    print('{} measures got worse by more than {:.0%}'.format(regressions, arguments.threshold))
+    return regressions
+
+
+def _format(value) -> str:
+    return '{:.4g}'.format(value) if isinstance(value, float) else str(value)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Runs the benchmarks of defSim and compares results.")
+    commands = parser.add_subparsers(dest='command', required=True)
+    run_parser = commands.add_parser('run', help="Run the benchmarks and write the results to a JSON file.")
+    run_parser.add_argument('--quick', action='store_true', help="Only measure small networks.")
+    run_parser.add_argument('--suite', action='append', help="Only run this suite (can be repeated).")
+    run_parser.add_argument('--filter', help="Only run cases whose name contains this text.")
+    run_parser.add_argument('--output', help="The path of the results file.")
+    compare_parser = commands.add_parser('compare', help="Compare two results files.")
+    compare_parser.add_argument('before')
+    compare_parser.add_argument('after')
+    compare_parser.add_argument('--threshold', type=float, default=0.1,
+                                help="The relative change that is reported as a regression (default 0.1).")
+    arguments = parser.parse_args()
+    if arguments.command == 'run':
+        run(arguments)
+    else:
+        sys.exit(1 if compare(arguments) > 0 else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,225 @@
+"""
+The benchmark cases of defSim. Every case is a dictionary with the suite it belongs to, a name that identifies it
+across versions, the function that measures it and the parameters of that function. The measuring functions run in a
+fresh process per case (see run.py), so the peak memory of a case is not affected by the cases before it.
+"""
+import os
+import subprocess
+import sys
+import time
+import statistics
+
+SIZES = [49, 1000, 10 ** 4, 10 ** 5, 10 ** 6]
+QUICK_SIZES = [49, 1000]
+
+# the topologies with their network parameters, and the largest size that is measured (the spatial random graph
+# computes the distances between all pairs of agents in Python, which takes about 20 seconds for 1000 agents)
+TOPOLOGIES = {'grid': ({'neighborhood': 'von_neumann'}, 10 ** 6),
+              'ring': ({'num_neighbors': 4}, 10 ** 6),
+              'spatial_random_graph': ({'min_neighbors': 4}, 1000),
+              'fast_gnp_random_graph': ({'average_degree': 4}, 10 ** 6)}
+
+COMMUNICATION_REGIMES = ["one-to-one", "one-to-many", "many-to-one"]
+
+# the built-in influence operators with attributes and a dissimilarity measure they work with
+INFLUENCE_FUNCTIONS = {'similarity_adoption': ('random_categorical', 'hamming'),
+                       'bounded_confidence': ('random_continuous', 'euclidean'),
+                       'weighted_linear': ('random_continuous', 'euclidean'),
+                       'persuasion': ('random_continuous', 'euclidean')}
+
+DISSIMILARITY_MEASURES = {'hamming': 'random_categorical',
+                          'euclidean': 'random_continuous',
+                          'manhattan': 'random_continuous'}
+
+OUTPUT_REALIZATIONS = ["Basic", "ClusterFinder", "Regions", "Zones", "Isolates", "AverageDistance", "AverageOpinion",
+                       "Spread", "Dispersion", "Coverage"]
+
+
+def create_cases(quick: bool = False, suites: list = None) -> list:
+    """
+    :param bool=False quick: If true, only small networks are measured and fewer cores are used for the parallel
+        scaling, so the whole suite runs in a few minutes.
+    :param list=None suites: The names of the suites to create. If None, all suites are created.
+    :returns: A list of benchmark cases.
+    """
+    sizes = QUICK_SIZES if quick else SIZES
+    cases = []
+
+    for topology, (network_parameters, max_size) in TOPOLOGIES.items():
+        for num_agents in sizes:
+            if num_agents <= max_size:
+                cases.append(_simulation_case('topology', '{}-{}'.format(topology, num_agents), topology=topology,
+                                              num_agents=num_agents, network_parameters=network_parameters))
+    for regime in COMMUNICATION_REGIMES:
+        cases.append(_simulation_case('communication_regime', regime, communication_regime=regime))
+    for influence_function, (attributes_initializer, dissimilarity_measure) in INFLUENCE_FUNCTIONS.items():
+        cases.append(_simulation_case('influence_function', influence_function,
+                                      influence_function=influence_function,
+                                      attributes_initializer=attributes_initializer,
+                                      dissimilarity_measure=dissimilarity_measure))
+    for dissimilarity_measure, attributes_initializer in DISSIMILARITY_MEASURES.items():
+        influence_function = 'similarity_adoption' if dissimilarity_measure == 'hamming' else 'weighted_linear'
+        cases.append(_simulation_case('dissimilarity_measure', dissimilarity_measure,
+                                      influence_function=influence_function,
+                                      attributes_initializer=attributes_initializer,
+                                      dissimilarity_measure=dissimilarity_measure))
+    for realization in OUTPUT_REALIZATIONS:
+        cases.append({'suite': 'output_realization', 'name': realization, 'function': measure_output,
+                      'parameters': {'realization': realization, 'num_agents': 1000 if quick else 10 ** 4}})
+    cores = sorted({1, 2, min(4, os.cpu_count())} if quick else {1, 2, 4, 8, os.cpu_count()})
+    for num_cores in cores:
+        if num_cores <= os.cpu_count():
+            cases.append({'suite': 'parallel_scaling', 'name': 'cores-{}'.format(num_cores),
+                          'function': measure_experiment,
+                          'parameters': {'num_cores': num_cores, 'num_simulations': 16}})
+    cases.append({'suite': 'import', 'name': 'import defSim', 'function': measure_import,
+                  'parameters': {'statement': 'import defSim'}})
+    cases.append({'suite': 'import', 'name': 'import defSim.Experiment', 'function': measure_import,
+                  'parameters': {'statement': 'import defSim.Experiment'}})
+
+    if suites is not None:
+        cases = [case for case in cases if case['suite'] in suites]
+    return cases
+
+
+def _simulation_case(suite: str, name: str, topology: str = 'grid', num_agents: int = 1000,
+                     network_parameters: dict = None, communication_regime: str = 'one-to-one',
+                     influence_function: str = 'similarity_adoption',
+                     attributes_initializer: str = 'random_categorical',
+                     dissimilarity_measure: str = 'hamming') -> dict:
+    return {'suite': suite, 'name': name, 'function': measure_simulation,
+            'parameters': {'topology': topology, 'num_agents': num_agents,
+                           'network_parameters': network_parameters or {},
+                           'communication_regime': communication_regime, 'influence_function': influence_function,
+                           'attributes_initializer': attributes_initializer,
+                           'dissimilarity_measure': dissimilarity_measure,
+                           'repeat': 3 if num_agents < 10 ** 5 else 1}}
+
+
+def peak_memory_mb() -> float or None:
+    """
+    :returns: The peak resident memory of this process in megabytes, or None if it cannot be measured on this platform.
+    """
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2 ** 20 if sys.platform == 'darwin' else peak / 2 ** 10  # bytes on macOS, kilobytes on Linux
+
+
+def _create_simulation(topology: str, num_agents: int, network_parameters: dict, communication_regime: str,
+                       influence_function: str, attributes_initializer: str, dissimilarity_measure: str, seed: int):
+    from defSim.Simulation import Simulation
+
+    parameter_dict = {'num_agents': num_agents, 'num_features': 3, 'num_traits': 3, **network_parameters}
+    if topology == 'fast_gnp_random_graph':
+        parameter_dict.update(n=num_agents, p=min(1.0, parameter_dict.pop('average_degree') / max(1, num_agents - 1)),
+                              seed=seed)
+    return Simulation(topology=topology,
+                      attributes_initializer=attributes_initializer,
+                      influence_function=influence_function,
+                      dissimilarity_measure=dissimilarity_measure,
+                      communication_regime=communication_regime,
+                      parameter_dict=parameter_dict,
+                      seed=seed)
+
+
+def measure_simulation(repeat: int = 3, min_seconds: float = 0.5, **parameters) -> dict:
+    """
+    Measures the setup of a simulation (the generation of the network, the initialization of the attributes and the
+    distances) and the number of steps per second.
+
+    :param int=3 repeat: The number of simulations that are measured. The median of each measure is reported.
+    :param float=0.5 min_seconds: The minimum time the steps of each simulation are measured.
+    :returns: A dictionary with the measures.
+    """
+    import warnings
+    warnings.simplefilter('ignore')
+
+    baseline_memory = peak_memory_mb()
+    setup_seconds, steps_per_second = [], []
+    for seed in range(repeat):
+        simulation = _create_simulation(seed=seed + 1, **parameters)
+        start = time.perf_counter()
+        simulation.initialize()
+        setup_seconds.append(time.perf_counter() - start)
+
+        steps = 0
+        batch = 100
+        start = time.perf_counter()
+        while time.perf_counter() - start < min_seconds:
+            for _ in range(batch):
+                simulation.run_step()
+            steps += batch
+            batch *= 2
+        steps_per_second.append(steps / (time.perf_counter() - start))
+        del simulation
+    peak_memory = peak_memory_mb()
+    return {'setup_seconds': statistics.median(setup_seconds),
+            'steps_per_second': statistics.median(steps_per_second),
+            'peak_memory_mb': peak_memory,
+            'simulation_memory_mb': peak_memory - baseline_memory if peak_memory is not None else None}
+
+
+def measure_output(realization: str, num_agents: int, repeat: int = 5) -> dict:
+    """
+    Measures the time to create one output realization for a simulation that ran for a number of steps.
+    """
+    import warnings
+    from defSim.tools import CreateOutputTable
+    warnings.simplefilter('ignore')
+
+    simulation = _create_simulation(topology='grid', num_agents=num_agents, network_parameters={},
+                                    communication_regime='one-to-one', influence_function='similarity_adoption',
+                                    attributes_initializer='random_categorical', dissimilarity_measure='hamming',
+                                    seed=1)
+    simulation.initialize()
+    for _ in range(10 * num_agents):
+        simulation.run_step()
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        CreateOutputTable.create_output_table(network=simulation.network, realizations=[realization])
+        seconds.append(time.perf_counter() - start)
+    return {'seconds': statistics.median(seconds), 'peak_memory_mb': peak_memory_mb()}
+
+
+def measure_experiment(num_cores: int, num_simulations: int) -> dict:
+    """
+    Measures the wall-clock time of an experiment with a fixed number of simulations on num_cores cores.
+    """
+    import warnings
+    from defSim.Experiment import Experiment
+    warnings.simplefilter('ignore')
+
+    experiment = Experiment(topology='grid',
+                            network_parameters={'num_agents': 100, 'neighborhood': 'von_neumann'},
+                            attribute_parameters={'num_features': 3, 'num_traits': 3},
+                            max_iterations=5000,
+                            repetitions=num_simulations,
+                            seed=1)
+    start = time.perf_counter()
+    experiment.run(parallel=num_cores > 1, num_cores=num_cores, show_progress=False)
+    seconds = time.perf_counter() - start
+    return {'seconds': seconds, 'simulations_per_second': num_simulations / seconds}
+
+
+def measure_import(statement: str, repeat: int = 5) -> dict:
+    """
+    Measures the time to run an import statement in a new interpreter.
+    """
+    # the new interpreter imports defSim from this repository, like the other cases
+    repository = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    environment = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [repository,
+                                                                            os.environ.get('PYTHONPATH')])))
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-c', statement], check=True, env=environment)
+        seconds.append(time.perf_counter() - start)
+    return {'seconds': statistics.median(seconds)}
+
+
+# the direction in which each measure improves, used when results are compared
+HIGHER_IS_BETTER = {'steps_per_second', 'simulations_per_second'}
@@ -11,17 +11,24 @@ from defSim.dissimilarity_component import dissimilarity_calculator
 from defSim.network_init import network_init
 from defSim.network_evolution_sim.network_evolution_sim import NetworkModifier
 from defSim.Simulation import Simulation
-from defSim.tools.CreateDataFiles import create_data_files
+from defSim.tools.CreateDataFiles import create_data_files, ResultStream
+from defSim.tools.SharedNetwork import SharedNetwork
+from defSim.tools.ExperimentStore import ExperimentStore, stable_repr
+from defSim.tools.InitialStateCache import InitialStateCache
+from defSim.tools.CostModel import CostModel, RuntimeEstimate, RuntimeLog, RuntimeModel
+from defSim.tools.JobRunner import JobRunner, Launcher, SlurmLauncher
+from defSim.tools.WorkQueue import WorkQueue, start_local_workers
+from defSim.tools.Profiling import Profiler, ProfiledParameters
+from defSim.tools.EventLog import EventLog
+from defSim.tools import WorkerPool
 import multiprocessing as mp
 from tqdm import tqdm
 import random
-import timeit
+import time
 import warnings
 import pandas as pd
-import os
-import pickle
-from defSim.tools import ClusterExecutionScript
 import copy
+import contextlib
 import pathlib
 
 
@@ -38,6 +45,100 @@ def yield_parallel_with_progress_bar(function, iterable, pool):
         yield item
 
 
+def yield_parallel_unordered(function, iterable, pool, num_workers: int, target_chunk_seconds: float = 1):
+    """
+    Runs a function over an iterable in the pool and yields the results as soon as they are done, in any order.
+    The first task of every worker is sent on its own to measure how long a task takes. The remaining tasks are then
+    sent in chunks that take about target_chunk_seconds each, which keeps the communication overhead of short tasks
+    low, but with at least four chunks per worker so the work stays balanced.
+    """
+    items = list(iterable)
+    pilot_items, remaining_items = items[:num_workers], items[num_workers:]
+
+    start = time.perf_counter()
+    for item in pool.imap_unordered(function, pilot_items):
+        yield item
+    seconds_per_task = max(time.perf_counter() - start, 1e-6)  # the pilot tasks ran side by side
+
+    if remaining_items:
+        max_chunksize = max(1, len(remaining_items) // (4 * num_workers))
+        chunksize = min(max(1, int(target_chunk_seconds / seconds_per_task)), max_chunksize)
+        for item in pool.imap_unordered(function, remaining_items, chunksize=chunksize):
+            yield item
+
+
+# state of a worker process, set once per worker by _initialize_worker
+_worker_experiment = None
+_worker_network = None
+
+
+def _initialize_worker(experiment, shared_network):
+    """
+    Stores the experiment and the shared network structure in a worker process, so they are sent to each worker only
+    once (or inherited without copying, if worker processes are forked) rather than with every simulation.
+    """
+    global _worker_experiment, _worker_network
+    if isinstance(shared_network, str) and shared_network == WorkerPool.PRELOADED_NETWORK:
+        shared_network = WorkerPool.preloaded_network()
+    _worker_experiment = experiment
+    _worker_network = shared_network
+
+
+def _run_simulation_in_worker(parameter_dict):
+    """
+    Utility function to run a simulation of the experiment stored in the worker process, on a private graph over the
+    shared network structure.
+    """
+    network = _worker_network.to_graph() if _worker_network is not None else None
+    return _worker_experiment._create_and_run_simulation(parameter_dict, network=network)
+
+
+class _PilotTimeout(Exception):
+    """
+    Stops a pilot simulation of Experiment.estimate_runtime when its time budget is used up.
+    """
+
+
+def _run_pilot_simulation(pilot):
+    """
+    Runs a pilot simulation until it stops or until its time budget is used up, and measures its setup time, its time
+    per step and its number of steps.
+    """
+    simulation, seconds_available = pilot
+    start_time = time.perf_counter()
+    simulation.initialize()
+    setup_seconds = time.perf_counter() - start_time
+
+    deadline = time.perf_counter() + seconds_available
+    run_step = simulation.run_step
+
+    def run_step_before_deadline():
+        if time.perf_counter() > deadline:
+            raise _PilotTimeout()
+        run_step()
+
+    # the stop condition of the simulation still decides when it stops, the deadline only interrupts it
+    simulation.run_step = run_step_before_deadline
+    censored = False
+    start_time = time.perf_counter()
+    try:
+        simulation.run(initialize=False, show_progress=False)
+    except _PilotTimeout:
+        censored = True
+    run_seconds = time.perf_counter() - start_time
+    return {'setup_seconds': setup_seconds, 'step_seconds': run_seconds / max(1, simulation.time_steps),
+            'steps': simulation.time_steps, 'censored': censored, 'max_iterations': simulation.max_iterations}
+
+
+def _run_keyed_simulation_in_worker(keyed_parameter_dict):
+    """
+    Utility function to run a simulation in a worker process and return its result together with its key in the
+    experiment store.
+    """
+    key, parameter_dict = keyed_parameter_dict
+    return key, _run_simulation_in_worker(parameter_dict)
+
+
 class Experiment:
     """
     The main class for creating and running experiments. Each simulation consists of 7 modular components, where
@@ -105,6 +206,11 @@ class Experiment:
             DissimilarityCalculator or a string that selects from the predefined options ["hamming", "euclidean", ...]
         tickwise (List = []): A list containing the names of all agent attributes that should be recorded at every
             timestep.
+        tickwise_folder_path (str or pathlib.Path): If not None, recorded agent attributes are streamed to .npy files in
+            this folder while the simulations run, instead of being kept in memory.
+        event_log (List[str] or :class:`~defSim.tools.EventLog.EventLog` = None): The names of agent features of which
+            every change is recorded in an event log per simulation, reported in the EventLog column. Unlike tickwise
+            recordings, its size grows with the number of changes rather than the number of ticks.
         stop_condition (String = "pragmatic_convergence"): Determines at what point a simulation is supposed to stop.
             Options include "strict_convergence", which means that it is theoretically not possible anymore for any
             agent to influence another, "pragmatic_convergence", which means that it is assumed that little change is
@@ -120,6 +226,30 @@ class Experiment:
         seed (int = random.randint(10000, 99999)): Optionally set seed for replicability.
         parameter_dict (dict = {}):  A dictionary with all parameters that will be passed to the specific component
             implementations.
+        store (str, pathlib.Path or :class:`ExperimentStore` = None): If not None, the results of all simulations are
+            saved in this store (a path is opened as an SQLite database), and simulations of which the results are
+            already in the store are not run again. Rerunning an experiment after a crash, or with additional parameter
+            values, then only runs the missing simulations.
+        initial_state_cache (bool, str, pathlib.Path or :class:`InitialStateCache` = None): If not None, simulations
+            with the same initial condition (network, initial attributes and seed) generate it only once. If True,
+            initial states are cached in memory, and if a path is given, they are also stored in that folder (which
+            also shares them between worker processes and runs). Only parameters that are not exclusively influence,
+            focal agent, neighbor selection or stop condition parameters are part of the initial condition.
+        common_random_numbers (bool = False): If True, parameter combinations that only differ in influence, focal
+            agent, neighbor selection or stop condition parameters get the same seeds for their repetitions. They then
+            start from identical initial states, and differences in their results are due to those parameters only.
+        scheduling (str = "random"): The order in which parallel simulations are started. If "random", they are run in
+            the (shuffled) order of the parameter_dict_list. If "longest_first", a :class:`CostModel` predicts the
+            runtime of each simulation from the samples of :meth:`estimate_runtime` and the runtime_log, and the
+            simulations expected to take longest are started first. Workers then take one simulation at a time, so
+            no core sits idle while a long simulation started last is still running.
+        runtime_log (str or pathlib.Path = None): If not None, the runtime of every simulation is appended to this
+            file, and used to predict runtimes when scheduling is "longest_first".
+        profile (bool, str, pathlib.Path or :class:`~defSim.tools.Profiling.Profiler` = None): If not None, a sample
+            of the simulations is profiled in the processes that run them, and the profiles are merged into a pstats
+            file and a collapsed stack file for flame graphs when the experiment is done. If True, 10% of the
+            simulations are profiled into the folder "profiles", and if a path is given, into that folder. Only
+            experiments defined by parameter combinations are profiled.
     """
 
     def __init__(self,
@@ -141,6 +271,8 @@ class Experiment:
                  network_modifier_parameters: dict = {},
                  dissimilarity_measure: str = "hamming" or dissimilarity_calculator.DissimilarityCalculator,
                  tickwise: list = [],
+                 tickwise_folder_path: str or pathlib.Path = None,
+                 event_log: List[str] or EventLog = None,
                  stop_condition: str = "max_iteration",
                  stop_condition_parameters: dict = {},
                  max_iterations: int = 100000,
@@ -149,7 +281,13 @@ class Experiment:
                  output_file_name: str = 'defSim_output.csv',
                  repetitions: int = 1,
                  seed: int = None,
-                 parameter_dict: dict = {}):
+                 parameter_dict: dict = {},
+                 store: str or pathlib.Path or ExperimentStore = None,
+                 initial_state_cache: bool or str or pathlib.Path or InitialStateCache = None,
+                 common_random_numbers: bool = False,
+                 scheduling: str = "random",
+                 runtime_log: str or pathlib.Path = None,
+                 profile: bool or str or pathlib.Path or Profiler = None):
         self.simulations = simulations
         self.network = network
         self.communication_regime = {"communication_regime": communication_regime}
@@ -168,6 +306,8 @@ class Experiment:
         self.network_modifier_parameters = network_modifier_parameters
         self.dissimilarity_measure = dissimilarity_measure
         self.tickwise = tickwise
+        self.tickwise_folder_path = tickwise_folder_path
+        self.event_log = event_log
         self.stop_condition = stop_condition
         self.stop_condition_parameters = stop_condition_parameters
         self.max_iterations = max_iterations
@@ -178,101 +318,103 @@ class Experiment:
         self.seed = seed
         self.parameter_dict = parameter_dict
         self.parameter_dict_list = []  # this is the internal dictionary that is created by permuting all parameters
-
-    def estimate_runtime(self, sample_runs: int = None, sample_steps: int = 10):
+        self.store = store
+        if initial_state_cache is True:
+            initial_state_cache = InitialStateCache()
+        elif isinstance(initial_state_cache, (str, pathlib.Path)):
+            initial_state_cache = InitialStateCache(folder_path=initial_state_cache)
+        self.initial_state_cache = initial_state_cache if initial_state_cache else None
+        self.common_random_numbers = common_random_numbers
+        self._network_repr = None
+        if scheduling not in ["random", "longest_first"]:
+            raise ValueError("Can only select from the scheduling options ['random', 'longest_first']")
+        self.scheduling = scheduling
+        self.runtime_log = runtime_log
+        self.runtime_samples = []  # (parameter dict, seconds) of simulations sampled by estimate_runtime
+        self.cost_model = None
+        self.runtime_model = None  # the RuntimeModel fitted by estimate_runtime
+        if profile is True:
+            profile = Profiler()
+        elif isinstance(profile, (str, pathlib.Path)):
+            profile = Profiler(folder=profile)
+        self.profiler = profile if profile else None
+
+    def estimate_runtime(self, sample_runs: int = None, sample_steps: int = None, time_budget: float = 60,
+                         num_cores: int = 1, confidence: float = .9) -> RuntimeEstimate:
         """
-        If simulations are specified, this function infers the experiment runtime from sampled runs/steps.
-
-        If no simulations are specified, function creates the parameterDictList if that hasn't happened already
-        and then infers from sampled runs the runtime of the whole experiment.
-
-        Runtime estimates are for running on a single core.
-
-        :param int=None sample_runs: The number of entries in the parameterDictList to sample in order to estimate the
-            runtime.
-        :param int=10 sample_steps: The number of iterations executed in each simulation run to base the estimated
-            runtime on.
-        :returns: estimated time of simulation in seconds
+        Estimates the runtime of the experiment from pilot runs. A sample of the simulations is run until they stop, or
+        until the time budget is used up, and the setup time, time per step and number of steps of each pilot run are
+        measured. A :class:`~defSim.tools.CostModel.RuntimeModel` fitted on these measurements predicts the runtime of
+        every simulation from its parameters, so the estimate also holds for stop conditions other than max_iteration.
+
+        If no simulations are specified, the parameterDictList is created if that hasn't happened already. The runtimes
+        of the pilot runs are kept in runtime_samples, where they are used to schedule the simulations when
+        scheduling is "longest_first".
+
+        :param int=None sample_runs: The number of simulations to run as pilots. If None, ten simulations are sampled,
+            or two per core if that is more.
+        :param int=None sample_steps: No longer used, pilot simulations run until they stop.
+        :param float=60 time_budget: The wall-clock time in seconds available for the pilot runs. Pilot runs that are
+            still running when their share of the budget is used up are stopped, and their number of steps is then only
+            known to lie between the steps done and max_iterations, which widens the confidence interval.
+        :param int=1 num_cores: The number of cores for which the runtime is estimated. The pilot runs also use them.
+        :param float=.9 confidence: The confidence level of the interval around the estimate.
+        :returns: A RuntimeEstimate: the expected wall-clock time in seconds, which also holds the bounds of the
+            confidence interval (lower and upper) and the expected total CPU time (cpu_seconds).
         """
+        if sample_steps is not None:
+            warnings.warn("sample_steps is no longer used, pilot simulations run until they stop.",
+                          DeprecationWarning)
 
         if self.simulations is not None:
-            # make copy to prevent modifying simulations which must be run later
-            simulations_copy = copy.deepcopy(self.simulations)
-            # Select parameter combinations to test (subset of all simulations in the experiment)
-            if sample_runs is not None and sample_runs < len(simulations_copy):
-                simulations_to_run = random.sample(simulations_copy, sample_runs)
-            else:
-                simulations_to_run = simulations_copy
-                if sample_runs is not None and sample_runs > len(simulations_copy):
-                    warnings.warn(
-                        "Reducing number of sampled simulations to total number of simulations in the experiment.")
-
+            parameter_dicts = [simulation.parameter_dict for simulation in self.simulations]
+            cost_parameters = [{**simulation.parameter_dict, 'max_iterations': simulation.max_iterations}
+                               for simulation in self.simulations]
+            max_iterations = None
         else:
-            if self.stop_condition != "max_iteration":
-                warnings.warn(
-                    "Runtime estimates are based on max number of iterations. Runtime estimates for simulations with "
-                    "different stop conditions are highly unreliable.")
-
-            if sample_steps > self.max_iterations:
-                warnings.warn("Number of sample steps greater than max iterations of the simulations.")
-
             # Create parameter_dict_list if not set yet
             if len(self.parameter_dict_list) == 0:
                 self.parameter_dict_list = self._create_parameter_dictionaries()
-
-            # Select parameter combinations to test (subset of all simulations in the experiment)
-            if sample_runs is not None and sample_runs < len(self.parameter_dict_list):
-                selected_parameter_combinations = random.sample(self.parameter_dict_list, sample_runs)
-            else:
-                selected_parameter_combinations = self.parameter_dict_list
-                if sample_runs is not None and sample_runs > len(self.parameter_dict_list):
-                    warnings.warn(
-                        "Reducing number of sampled simulations to total number of simulations in the experiment.")
-
-            # Set up simulations
-            simulations_to_run = []
-            for parameter_combination in selected_parameter_combinations:
-                simulations_to_run.append(
-                    Simulation(network=self.network.copy() if self.network is not None else self.network,
-                               topology=self.topology,
-                               network_modifiers=self.network_modifiers,
-                               attributes_initializer=self.attributes_initializer,
-                               focal_agent_selector=self.focal_agent_selector,
-                               neighbor_selector=self.neighbor_selector,
-                               influence_function=self.influence_function,
-                               influenceable_attributes=self.influenceable_attributes,
-                               stop_condition=self.stop_condition,
-                               max_iterations=self.max_iterations,
-                               communication_regime=parameter_combination["communication_regime"],
-                               parameter_dict=parameter_combination,
-                               dissimilarity_measure=self.dissimilarity_measure,
-                               output_realizations=self.output_realizations,
-                               tickwise=self.tickwise,
-                               seed=parameter_combination["seed"]
-                               ))
-
-        # Setup each simulation and record mean setup time
-        sampled_setup_times = [timeit.timeit(lambda: sim.initialize(), number=1) for sim in
-                               simulations_to_run]
-        mean_setup_time = np.mean(sampled_setup_times)
-
-        # Execute single steps of each simulation (sample_steps times per simulation) and record mean time per step
-        sampled_execution_times = [timeit.timeit(lambda: sim.run_step(), number=sample_steps) for sim in
-                                   simulations_to_run]
-        mean_execution_time = np.mean(sampled_execution_times) / sample_steps
-
+            parameter_dicts = self.parameter_dict_list
+            cost_parameters = [self._cost_parameters(parameter_dict) for parameter_dict in parameter_dicts]
+            max_iterations = self.max_iterations
+
+        # Select the simulations to run as pilots (subset of all simulations in the experiment)
+        if sample_runs is None:
+            sample_runs = max(10, 2 * num_cores)
+        elif sample_runs > len(parameter_dicts):
+            warnings.warn("Reducing number of sampled simulations to total number of simulations in the experiment.")
+        sample = random.sample(range(len(parameter_dicts)), min(sample_runs, len(parameter_dicts)))
         if self.simulations is not None:
-            num_simulations = len(self.simulations)
-            warnings.warn(
-                "Runtime estimates are based on {} iterations because true maximum iterations for user-defined "
-                "simulations are unknown.".format(
-                    self.max_iterations))
+            # make copies to prevent modifying simulations which must be run later
+            pilot_simulations = [copy.deepcopy(self.simulations[index]) for index in sample]
         else:
-            num_simulations = len(self.parameter_dict_list)
-
-        # Estimated time in seconds based on number of simulations, setup time and step time
-        # Assumes that simulations run until max iterations
-        return num_simulations * mean_setup_time + (num_simulations * mean_execution_time * self.max_iterations)
+            pilot_simulations = [self._create_simulation(parameter_dicts[index]) for index in sample]
+
+        # the pilots run in rounds of num_cores simulations, which share the time budget
+        num_rounds = -(-len(pilot_simulations) // num_cores)
+        tasks = [(simulation, time_budget / num_rounds) for simulation in pilot_simulations]
+        if num_cores > 1 and len(tasks) > 1:
+            with mp.Pool(min(num_cores, len(tasks))) as pool:
+                pilots = pool.map(_run_pilot_simulation, tasks, chunksize=1)
+        else:
+            pilots = [_run_pilot_simulation(task) for task in tasks]
+        if any(pilot['censored'] for pilot in pilots):
+            warnings.warn("{} of {} pilot simulations did not stop within the time budget, increase time_budget for a "
+                          "more precise estimate.".format(sum(pilot['censored'] for pilot in pilots), len(pilots)))
+
+        self.runtime_model = RuntimeModel().fit([cost_parameters[index] for index in sample], pilots)
+        estimate = self.runtime_model.estimate(cost_parameters, num_cores=num_cores, confidence=confidence,
+                                               max_iterations=max_iterations)
+
+        # keep the runtime of each pilot, to predict runtimes when scheduling simulations
+        if self.simulations is None:
+            for index, pilot in zip(sample, pilots):
+                runtime = pilot['setup_seconds'] + pilot['step_seconds'] * pilot['steps']
+                if pilot['censored']:
+                    runtime = max(runtime, estimate.predictions[index])
+                self.runtime_samples.append((parameter_dicts[index], runtime))
+        return estimate
 
     def return_values(self):
         """
@@ -296,7 +438,8 @@ class Experiment:
 
         return True
 
-    def run(self, parallel: bool = False, num_cores=mp.cpu_count(), show_progress: bool = True) -> pd.DataFrame:
+    def run(self, parallel: bool = False, num_cores=mp.cpu_count(), show_progress: bool = True,
+            streaming: bool = False, buffer_size: int = 1000, executor: WorkerPool.WorkerPool = None) -> pd.DataFrame:
         """
 
         If the experiment is defined by a list of simulations:
@@ -312,23 +455,61 @@ class Experiment:
         :param parallel: Boolean that determines in which mode the simulations will run.
         :param num_cores: Determines the number of cores in the machine that will be utilized for the execution.
         :param show_progress: Boolean that determines whether to show a progress bar.
+        :param streaming: If true, results are appended to a CSV file in the output folder as soon as they are done,
+            with at most buffer_size results in memory. Simulations are run in any order, and the results of
+            simulations that finished are kept if the experiment stops early. The dataframe that is returned is read
+            from the file, and does not contain tickwise columns (these are written to separate files). Streaming
+            requires an output_file_name with the suffix '.csv'.
+        :param int=1000 buffer_size: The maximum number of results to keep in memory before appending them to the
+            file. Only used if streaming is true.
+        :param WorkerPool=None executor: A :class:`~defSim.tools.WorkerPool.WorkerPool` whose workers run the
+            simulations, instead of new processes that are started for this run. If given, the simulations run in
+            parallel on its workers, and num_cores is ignored.
         :returns: A dataframe that contains one row per Simulation.
 
         """
+        if executor is not None:
+            parallel, num_cores = True, executor.num_workers
+
+        if self.profiler is None or self.simulations is not None:
+            return self._run(parallel=parallel, num_cores=num_cores, show_progress=show_progress, streaming=streaming,
+                             buffer_size=buffer_size, executor=executor)
+
+        # the sampled simulations are marked in the parameter_dict_list for the duration of the run
+        if len(self.parameter_dict_list) == 0:
+            self.parameter_dict_list = self._create_parameter_dictionaries()
+        parameter_dict_list = self.parameter_dict_list
+        self.parameter_dict_list = self.profiler.select(parameter_dict_list)
+        try:
+            return self._run(parallel=parallel, num_cores=num_cores, show_progress=show_progress, streaming=streaming,
+                             buffer_size=buffer_size, executor=executor)
+        finally:
+            self.parameter_dict_list = parameter_dict_list
+            self.profiler.merge()
+
+    def _run(self, parallel: bool, num_cores: int, show_progress: bool, streaming: bool, buffer_size: int,
+             executor: WorkerPool.WorkerPool = None) -> pd.DataFrame:
+        """
+        Runs the experiment, see :meth:`run`.
+        """
+        if self.store is not None and self.simulations is None:
+            return self._run_with_store(parallel=parallel, num_cores=num_cores, show_progress=show_progress,
+                                        streaming=streaming, buffer_size=buffer_size, executor=executor)
+        if streaming:
+            return self._run_streaming(parallel=parallel, num_cores=num_cores, show_progress=show_progress,
+                                       buffer_size=buffer_size, executor=executor)
 
         # if a list of simulations to run is specified
         if self.simulations is not None:
             print("%d simulations specified" % len(self.simulations))
             if parallel:
-                pool = mp.Pool(processes=num_cores)
-
-                if show_progress:
-                    results = list(
-                        yield_parallel_with_progress_bar(function=call_simulation_run, iterable=self.simulations,
-                                                         pool=pool))
-                else:
-                    results = pool.imap(call_simulation_run, self.simulations)
-                pool.close()
+                with self._pool(num_cores, executor) as pool:
+                    if show_progress:
+                        results = list(
+                            yield_parallel_with_progress_bar(function=call_simulation_run, iterable=self.simulations,
+                                                             pool=pool))
+                    else:
+                        results = list(pool.imap(call_simulation_run, self.simulations))
 
                 results_dataframe = pd.concat(results).reset_index()
                 if self.output_folder_path is not None:
@@ -354,14 +535,26 @@ class Experiment:
 
             if len(self.parameter_dict_list) == 0:
                 self.parameter_dict_list = self._create_parameter_dictionaries()
-            if parallel:
-                pool = mp.Pool(processes=num_cores)
+            if parallel and self.scheduling != "random":
+                with self._pool(num_cores, executor, _initialize_worker, self._prepare_workers(executor)) as pool:
+                    tasks = self._schedule(list(enumerate(self.parameter_dict_list)))
+                    indexed_results = pool.imap_unordered(_run_keyed_simulation_in_worker, tasks, chunksize=1)
+                    indexed_results = dict(tqdm(indexed_results, total=len(tasks), mininterval=1,
+                                                disable=not show_progress))
+                results = [indexed_results[index] for index in range(len(self.parameter_dict_list))]
 
-                if show_progress:
-                    results = list(yield_parallel_with_progress_bar(function=self._create_and_run_simulation,
-                                                                    iterable=self.parameter_dict_list, pool=pool))
-                else:
-                    results = pool.map(self._create_and_run_simulation, self.parameter_dict_list)
+                results_dataframe = pd.concat(results).reset_index()
+                if self.output_folder_path is not None:
+                    create_data_files(output_table=results_dataframe, output_folder_path=self.output_folder_path,
+                                      output_file_name=self.output_file_name)
+                return results_dataframe
+            elif parallel:
+                with self._pool(num_cores, executor, _initialize_worker, self._prepare_workers(executor)) as pool:
+                    if show_progress:
+                        results = list(yield_parallel_with_progress_bar(function=_run_simulation_in_worker,
+                                                                        iterable=self.parameter_dict_list, pool=pool))
+                    else:
+                        results = pool.map(_run_simulation_in_worker, self.parameter_dict_list)
 
                 results_dataframe = pd.concat(results).reset_index()
                 if self.output_folder_path is not None:
@@ -381,101 +574,439 @@ class Experiment:
                                       output_file_name=self.output_file_name)
                 return results_dataframe
 
+    def run_jobs(self, folder: str or pathlib.Path = "jobs", launcher: Launcher = None, chunk_size: int = None,
+                 chunk_seconds: float = None, max_retries: int = 2, overwrite: bool = False) -> pd.DataFrame:
+        """
+        Runs the experiment as a set of chunks in separate processes, with a :class:`~defSim.tools.JobRunner.JobRunner`.
+        By default the chunks run as subprocesses on this machine; with a SlurmLauncher they run as a job array on a
+        SLURM cluster. Chunks that fail are run again, and the results of all chunks are merged.
+
+        :param str="jobs" folder: The folder to which the chunks and their results are written. If the folder holds
+            results of the same experiment, chunks that finished before are not run again. If it holds results of
+            another experiment, a FileExistsError is raised, unless overwrite is True.
+        :param Launcher=None launcher: The launcher that runs the chunks. If None, a LocalLauncher is used.
+        :param int=None chunk_size: The number of simulations per chunk.
+        :param float=None chunk_seconds: The expected runtime of a chunk in seconds, used if chunk_size is None and the
+            runtimes of the simulations can be predicted (see :meth:`estimate_runtime`).
+        :param int=2 max_retries: The number of times a chunk that failed is run again.
+        :param bool=False overwrite: Whether to remove the results of another experiment from the folder.
+        :returns: A dataframe that contains one row per Simulation.
+        """
+        if self.simulations is not None:
+            raise ValueError("Only experiments defined by parameter combinations can be run as jobs")
+        runner = JobRunner(self, folder=folder, launcher=launcher, chunk_size=chunk_size, chunk_seconds=chunk_seconds,
+                           max_retries=max_retries, overwrite=overwrite)
+        results_dataframe = runner.run()
+        if self.output_folder_path is not None:
+            create_data_files(output_table=results_dataframe, output_folder_path=self.output_folder_path,
+                              output_file_name=self.output_file_name)
+        return results_dataframe
+
+    def run_with_queue(self, folder: str or pathlib.Path = "queue", num_workers: int = mp.cpu_count(),
+                       tasks_per_file: int = 1, lease_seconds: float = 300, poll_interval: float = 5,
+                       timeout: float = None, overwrite: bool = False) -> pd.DataFrame:
+        """
+        Runs the experiment through a :class:`~defSim.tools.WorkQueue.WorkQueue` in a shared folder. Workers take a
+        task whenever they finish one, and tasks of workers that fail are taken over by others after lease_seconds.
+        Next to the workers started here, workers can be started on other machines that share the folder with
+        ``python -m defSim.worker <folder>``.
+
+        :param str="queue" folder: The folder of the queue. If it holds the same experiment, finished tasks are not
+            run again. If it holds results of another experiment, a FileExistsError is raised, unless overwrite is
+            True.
+        :param int=mp.cpu_count() num_workers: The number of workers to start on this machine. With 0, the
+            simulations are only run by workers started elsewhere.
+        :param int=1 tasks_per_file: The number of simulations per task.
+        :param float=300 lease_seconds: The time after which a task without heartbeat of its worker is run again.
+        :param float=5 poll_interval: The number of seconds between two checks whether all tasks are done.
+        :param float=None timeout: The maximum number of seconds to wait for the results. If None, there is no limit.
+        :param bool=False overwrite: Whether to remove the tasks and results of another experiment from the folder.
+        :returns: A dataframe that contains one row per Simulation.
+        """
+        queue = WorkQueue(folder, lease_seconds=lease_seconds)
+        queue.submit(self, tasks_per_file=tasks_per_file, overwrite=overwrite)
+        workers = start_local_workers(queue.folder, num_workers)
+        try:
+            results_dataframe = queue.wait(poll_interval=poll_interval, timeout=timeout)
+        finally:
+            for worker in workers:
+                if worker.poll() is None:
+                    worker.terminate()
+                worker.wait()
+        if self.output_folder_path is not None:
+            create_data_files(output_table=results_dataframe, output_folder_path=self.output_folder_path,
+                              output_file_name=self.output_file_name)
+        return results_dataframe
+
     def run_on_cluster(self,
                        chunk_size: int = 2400,
                        batch_path: str = "batchscripts",
                        output_path: str = "output",
                        walltime: str = "30:00",
-                       partition: str = "short"):
+                       partition: str = "short",
+                       cpus_per_task: int = 24,
+                       max_retries: int = 2,
+                       overwrite: bool = False) -> pd.DataFrame:
         """
         This method can be used to execute large Experiments on a SLURM cluster.
-        It creates a number of sbatch scripts that are immediatly executed to send jobs to the SLURM job manager.
+        It submits the chunks of the experiment as a job array, waits until they are done, runs failed chunks again,
+        and merges the results (see :meth:`run_jobs`). The method blocks until the whole experiment has finished,
+        polling squeue, so the script should run in a session that lasts as long as the job (e.g. in tmux, or as a job
+        itself). An interrupted run is resumed by running the script again with the same batch_path.
         To be able to use this method the script with the Experiment must be executed on a SLURM server.
 
         :param chunk_size: Determines how many Simulations should run per node in the cluster.
-        :param batch_path: The path to the folder where the batchscripts will be created. If the folder not exists yet,
+        :param batch_path: The path to the job folder, where the job script, the chunks and their results are stored.
+            If the folder not exists yet, it will be created.
+        :param output_path: The path to the folder where the merged output will be saved. If the folder not exists yet,
             it will be created.
-        :param output_path: The path to the folder where the output will be saved. If the folder not exists yet, it will
-            be created.
         :param walltime: The expected time one node maximally needs for computing its chunk of simulations.
         :param partition: If the SLURM cluster has multiple partitions, it can be decided where to run the jobs with
             this parameter.
+        :param cpus_per_task: The number of cores per node that run the simulations of a chunk.
+        :param max_retries: The number of times a chunk that failed is submitted again.
+        :param overwrite: Whether to remove the results of another experiment from the batch_path. If False, a
+            FileExistsError is raised for a batch_path with results of another experiment.
+        :returns: A dataframe that contains one row per Simulation.
         """
-
-        # todo: check problems with cluster work and update to match recent changes such as seed and simulation lists
-        if not isinstance(self.network, nx.Graph) and self.network is not None:
+        if not isinstance(self.network, nx.Graph) and self.network is not None and self.network != 'list':
             self.network = network_init.read_network(self.network)
-            # not implemented yet
+        launcher = SlurmLauncher(walltime=walltime, partition=partition, cpus_per_task=cpus_per_task)
+        results_dataframe = self.run_jobs(folder=batch_path, launcher=launcher, chunk_size=chunk_size,
+                                          max_retries=max_retries, overwrite=overwrite)
+        create_data_files(output_table=results_dataframe, output_folder_path=output_path,
+                          output_file_name=self.output_file_name)
+        return results_dataframe
+
+    def _run_streaming(self, parallel: bool, num_cores: int, show_progress: bool, buffer_size: int,
+                       executor: WorkerPool.WorkerPool = None) -> pd.DataFrame:
+        """
+        Runs the experiment while appending the results to the output file, see :meth:`run`.
+        """
+        if self.simulations is not None:
+            print("%d simulations specified" % len(self.simulations))
+            function, tasks, initializer, initargs = call_simulation_run, self.simulations, None, ()
+        else:
+            if len(self.parameter_dict_list) == 0:
+                self.parameter_dict_list = self._create_parameter_dictionaries()
+            if parallel:
+                function, tasks = _run_simulation_in_worker, self.parameter_dict_list
+                initializer, initargs = _initialize_worker, self._prepare_workers(executor)
+                if self.scheduling != "random":
+                    tasks = [parameter_dict for _, parameter_dict in self._schedule([(None, parameter_dict)
+                                                                                     for parameter_dict in tasks])]
+            else:
+                function, tasks, initializer, initargs = self._create_and_run_simulation, self.parameter_dict_list, \
+                                                         None, ()
 
+        stream = ResultStream(output_folder_path=self.output_folder_path, output_file_name=self.output_file_name,
+                              buffer_size=buffer_size)
+        try:
+            if parallel:
+                with self._pool(num_cores, executor, initializer, initargs) as pool:
+                    results = self._imap_unordered(function=function, tasks=tasks, pool=pool, num_cores=num_cores)
+                    for result in tqdm(results, total=len(tasks), mininterval=1, disable=not show_progress):
+                        stream.append(result)
+            else:
+                for task in tqdm(tasks, mininterval=1, disable=not show_progress):
+                    stream.append(function(task))
+        finally:
+            # keep everything that finished, also if a simulation failed
+            stream.flush()
+
+        results_dataframe = stream.read()
+        if any(suffix.lower() != '.csv' for suffix in pathlib.Path(self.output_file_name).suffixes):
+            create_data_files(output_table=results_dataframe, output_folder_path=stream.output_folder,
+                              output_file_name=self.output_file_name)
+        return results_dataframe
+
+    def _run_with_store(self, parallel: bool, num_cores: int, show_progress: bool, streaming: bool,
+                        buffer_size: int, executor: WorkerPool.WorkerPool = None) -> pd.DataFrame:
+        """
+        Runs the simulations that are not yet in the store, see :meth:`run`. New results are saved as soon as they are
+        done, and are merged with the stored results in the order of the parameter_dict_list.
+        """
         if len(self.parameter_dict_list) == 0:
             self.parameter_dict_list = self._create_parameter_dictionaries()
-        print("%d different parameter combinations" % len(self.parameter_dict_list))
-        random.shuffle(self.parameter_dict_list)
-        datachunks = [self.parameter_dict_list[x:x + chunk_size] for x in
-                      range(0, len(self.parameter_dict_list), chunk_size)]
-
-        if not os.path.exists(batch_path):
-            os.mkdir(batch_path)
-        if not os.path.exists("pickles"):
-            os.mkdir("pickles")
-        if not os.path.exists(output_path):
-            os.mkdir(output_path)
-        for i, chunk in enumerate(datachunks):
-            meta_parameter_dict = {
-                "network": self.network,
-                "topology": self.topology,
-                "initialization": self.attributes_initializer,
-                "focal_agent_selector": self.focal_agent_selector,
-                "neighbor_selector": self.neighbor_selector,
-                "influence_function": self.influence_function,
-                "influenceable_attributes": self.influenceable_attributes,
-                "network_modifiers": self.network_modifiers,
-                "dissimilarity_measure": self.dissimilarity_measure,
-                "stop_condition": self.stop_condition,
-                "max_iterations": self.max_iterations,
-                "output_realizations": self.output_realizations,
-                "seed": self.seed,
-                "parameter_dicts": chunk
-            }
-            with open(os.path.join("pickles", "chunk%d.p" % i), "wb") as parameterFile:
-                pickle.dump(meta_parameter_dict, parameterFile)
-            batchfile_path = os.path.join(batch_path, "batch_%d.sh" % i)
-            with open(batchfile_path, "w") as fh:
-                fh.writelines("#!/bin/bash\n")
-                fh.writelines("#SBATCH --job-name=simulation_chunk_%d.job\n" % i)
-                fh.writelines("#SBATCH --output=%s%s.txt\n" % (os.path.join(output_path, "chunk"), i))
-                fh.writelines("#SBATCH --time=%s\n" % walltime)
-                fh.writelines("#SBATCH --mem=8000\n")
-                fh.writelines("#SBATCH --partition=%s\n" % partition)
-                fh.writelines("#SBATCH --cpus-per-task=24\n")
-                # todo test whether spaces in path could be a problem
-                fh.writelines("python %s %d %s %s\n" % (
-                    ClusterExecutionScript.__file__, i, os.path.abspath("pickles"), os.path.abspath(output_path)))
-            os.system("sbatch %s" % os.path.abspath(batchfile_path))
-            print("script created at %s" % os.path.abspath(batchfile_path))
-        # todo: this cannot work, can it? Only when the simulations are actually executed, they need access to the files
-        # time.sleep(1)  # probably unnecessary, but I don't want to delete the folder to quickly
-        # shutil.rmtree("pickles")
-
-    def _create_and_run_simulation(self, parameter_dict):
-        simulation = Simulation(network=self.network.copy() if isinstance(self.network, nx.Graph) else self.network,
-                                topology=self.topology,
-                                network_modifiers=self.network_modifiers,
-                                attributes_initializer=self.attributes_initializer,
-                                focal_agent_selector=self.focal_agent_selector,
-                                neighbor_selector=self.neighbor_selector,
-                                influence_function=self.influence_function,
-                                influenceable_attributes=self.influenceable_attributes,
-                                stop_condition=self.stop_condition,
-                                max_iterations=self.max_iterations,
-                                communication_regime=parameter_dict["communication_regime"],
-                                parameter_dict=parameter_dict,
-                                dissimilarity_measure=self.dissimilarity_measure,
-                                output_realizations=self.output_realizations,
-                                tickwise=self.tickwise,
-                                seed=parameter_dict['seed']
-                                )
-        return simulation.run(show_progress=False)
+        if isinstance(self.store, ExperimentStore):
+            store_context = contextlib.nullcontext(self.store)
+        else:
+            store_context = ExperimentStore(self.store)  # a store that is opened here is closed when the run ends
+        with store_context as store:
+            return self._run_missing(store, parallel=parallel, num_cores=num_cores, show_progress=show_progress,
+                                     streaming=streaming, buffer_size=buffer_size, executor=executor)
+
+    def _run_missing(self, store: ExperimentStore, parallel: bool, num_cores: int, show_progress: bool,
+                     streaming: bool, buffer_size: int, executor: WorkerPool.WorkerPool = None) -> pd.DataFrame:
+        """
+        Runs the simulations whose results are not in an open store, see :meth:`_run_with_store`.
+        """
+        keys = store.create_keys(self.parameter_dict_list, configuration=self._component_configuration(),
+                                 seed=self.seed)
+        completed = store.completed(keys)
+        missing = [(key, parameter_dict) for key, parameter_dict in zip(keys, self.parameter_dict_list)
+                   if key not in completed]
+        print("%d of %d simulations found in the store" % (len(keys) - len(missing), len(keys)))
+
+        pool_context = contextlib.ExitStack()
+        if parallel and missing:
+            pool = pool_context.enter_context(self._pool(num_cores, executor, _initialize_worker,
+                                                         self._prepare_workers(executor)))
+            new_results = self._imap_unordered(function=_run_keyed_simulation_in_worker, tasks=self._schedule(missing),
+                                               pool=pool, num_cores=num_cores)
+        else:
+            new_results = ((key, self._create_and_run_simulation(parameter_dict)) for key, parameter_dict in missing)
+        new_results = tqdm(new_results, total=len(missing), mininterval=1, disable=not show_progress)
+
+        try:
+            if streaming:
+                stream = ResultStream(output_folder_path=self.output_folder_path,
+                                      output_file_name=self.output_file_name, buffer_size=buffer_size)
+                try:
+                    for key in keys:
+                        if key in completed:
+                            stream.append(store.get(key))
+                    for key, result in new_results:
+                        store.put(key, result)
+                        stream.append(result)
+                finally:
+                    stream.flush()
+                results_dataframe = stream.read()
+                if any(suffix.lower() != '.csv' for suffix in pathlib.Path(self.output_file_name).suffixes):
+                    create_data_files(output_table=results_dataframe, output_folder_path=stream.output_folder,
+                                      output_file_name=self.output_file_name)
+                return results_dataframe
+
+            results = {}
+            for key, result in new_results:
+                store.put(key, result)
+                results[key] = result
+        finally:
+            pool_context.close()
+
+        results_dataframe = pd.concat([results[key] if key in results else store.get(key)
+                                       for key in keys]).reset_index()
+        if self.output_folder_path is not None:
+            create_data_files(output_table=results_dataframe, output_folder_path=self.output_folder_path,
+                              output_file_name=self.output_file_name)
+        return results_dataframe
+
+    def fit_cost_model(self) -> CostModel or None:
+        """
+        Fits a :class:`CostModel` on the runtimes sampled by :meth:`estimate_runtime` and the runtimes in the
+        runtime_log, and stores it in the cost_model attribute.
+
+        :returns: The fitted CostModel, or None if no runtimes are available.
+        """
+        parameter_dicts, seconds = RuntimeLog(self.runtime_log).read() if self.runtime_log is not None else ([], [])
+        for parameter_dict, runtime in self.runtime_samples:
+            parameter_dicts.append(self._cost_parameters(parameter_dict))
+            seconds.append(runtime)
+        if not any(runtime > 0 for runtime in seconds):
+            return None
+        self.cost_model = CostModel().fit(parameter_dicts, seconds)
+        return self.cost_model
+
+    def _cost_parameters(self, parameter_dict: dict) -> dict:
+        """
+        :returns: The parameters of a simulation together with the settings of the experiment that affect its runtime.
+        """
+        def name(component):
+            return component if isinstance(component, str) else getattr(component, '__name__',
+                                                                         type(component).__name__)
+
+        return {**parameter_dict,
+                'topology': self.topology if self.network is None else 'pre-loaded',
+                'max_iterations': self.max_iterations,
+                'influence_function': name(self.influence_function),
+                'stop_condition': name(self.stop_condition)}
+
+    def _schedule(self, tasks: list) -> list:
+        """
+        Orders tasks according to the scheduling option of the experiment.
+
+        :param tasks: A list of tuples, of which the second element is a parameter dictionary.
+        :returns: The tasks, with the longest expected runtime first if scheduling is "longest_first".
+        """
+        if self.scheduling == "random" or len(tasks) < 2:
+            return list(tasks)
+        cost_model = self.fit_cost_model()
+        if cost_model is None:
+            warnings.warn("No runtimes available to predict the runtime of simulations, run estimate_runtime() or set "
+                          "a runtime_log. Simulations are started in random order.")
+            return list(tasks)
+        predictions = cost_model.predict([self._cost_parameters(task[1]) for task in tasks])
+        return [tasks[index] for index in np.argsort(-predictions, kind='stable')]
+
+    def _imap_unordered(self, function, tasks: list, pool, num_cores: int):
+        """
+        Yields results as soon as they are done. Scheduled tasks are handed to the workers one at a time, so they start
+        in the scheduled order, otherwise tasks are sent in chunks (see :func:`yield_parallel_unordered`).
+        """
+        if self.scheduling != "random":
+            return pool.imap_unordered(function, tasks, chunksize=1)
+        return yield_parallel_unordered(function=function, iterable=tasks, pool=pool, num_workers=num_cores)
+
+    def _component_configuration(self) -> dict:
+        """
+        :returns: A dictionary with the settings of the experiment that are not part of the parameter dictionaries,
+            which together with the parameters determine the result of a simulation.
+        """
+        configuration = {"network": self.network,
+                         "topology": self.topology,
+                         "network_modifiers": self.network_modifiers,
+                         "attributes_initializer": self.attributes_initializer,
+                         "focal_agent_selector": self.focal_agent_selector,
+                         "neighbor_selector": self.neighbor_selector,
+                         "influence_function": self.influence_function,
+                         "influenceable_attributes": self.influenceable_attributes,
+                         "dissimilarity_measure": self.dissimilarity_measure,
+                         "stop_condition": self.stop_condition,
+                         "max_iterations": self.max_iterations,
+                         "output_realizations": self.output_realizations,
+                         "tickwise": self.tickwise,
+                         "common_random_numbers": self.common_random_numbers}
+        if self.event_log is not None:  # only added when used, so the keys of existing stores stay the same
+            configuration["event_log"] = self.event_log
+        return configuration
+
+    def _prepare_workers(self, executor: WorkerPool.WorkerPool = None):
+        """
+        Splits the experiment into the parts that are sent to each worker process once: a copy of the experiment
+        without the network and its simulations, and the network structure in array form. A network given as an
+        adjacency matrix or edge list file is read only once, here.
+
+        :param executor: The WorkerPool that runs the simulations, if any. If its workers already have the network,
+            the network is not sent again.
+        :returns: A tuple with the experiment for the workers and a SharedNetwork, or None if the simulations create
+            their own networks.
+        """
+        network = self.network
+        if isinstance(network, np.ndarray) or isinstance(network, (str, pathlib.Path)) and network != 'list':
+            network = network_init.read_network(network)
+        shared_network = None
+        if executor is not None and executor.shares_network(network) and not network.is_multigraph():
+            shared_network = WorkerPool.PRELOADED_NETWORK
+            network = None
+        elif isinstance(network, nx.Graph) and not network.is_multigraph():
+            shared_network = SharedNetwork(network)
+            network = None
+        if self.initial_state_cache is not None and self._network_repr is None:
+            self._network_repr = stable_repr(self.network)  # the workers do not have the original network
+        worker_experiment = copy.copy(self)
+        worker_experiment.network = network
+        worker_experiment.simulations = None
+        worker_experiment.parameter_dict_list = []
+        worker_experiment.store = None
+        return worker_experiment, shared_network
+
+    @contextlib.contextmanager
+    def _pool(self, num_cores: int, executor: WorkerPool.WorkerPool = None, initializer=None, initargs: tuple = ()):
+        """
+        Provides a pool of worker processes for a run, in which initializer(*initargs) is called once per worker.
+        Without executor, a new pool is started and stopped when the run is done, otherwise the workers of the executor
+        are used.
+        """
+        if executor is not None:
+            with executor.bind(initializer, initargs) as pool:
+                yield pool
+        else:
+            with mp.Pool(processes=num_cores, initializer=initializer, initargs=initargs) as pool:
+                yield pool
+
+    def _create_simulation(self, parameter_dict: dict, network: nx.Graph = None,
+                           initial_state_cache: InitialStateCache = None, initial_state_key: str = None) -> Simulation:
+        """
+        Creates the simulation of a parameter combination.
+
+        :param parameter_dict: A dictionary with the parameters of the simulation.
+        :param network: A private network for the simulation. If None, the network of the experiment is copied.
+        :param initial_state_cache: The InitialStateCache of the simulation.
+        :param initial_state_key: The key of the initial condition of the simulation.
+        """
+        if network is None:
+            network = self.network.copy() if isinstance(self.network, nx.Graph) else self.network
+        return Simulation(network=network,
+                          topology=self.topology,
+                          network_modifiers=self.network_modifiers,
+                          attributes_initializer=self.attributes_initializer,
+                          focal_agent_selector=self.focal_agent_selector,
+                          neighbor_selector=self.neighbor_selector,
+                          influence_function=self.influence_function,
+                          influenceable_attributes=self.influenceable_attributes,
+                          stop_condition=self.stop_condition,
+                          max_iterations=self.max_iterations,
+                          communication_regime=parameter_dict["communication_regime"],
+                          parameter_dict=parameter_dict,
+                          dissimilarity_measure=self.dissimilarity_measure,
+                          output_realizations=self.output_realizations,
+                          tickwise=self.tickwise,
+                          tickwise_folder_path=self.tickwise_folder_path,
+                          event_log=copy.deepcopy(self.event_log),
+                          seed=parameter_dict['seed'],
+                          initial_state_cache=initial_state_cache,
+                          initial_state_key=initial_state_key)
+
+    def _create_and_run_simulation(self, parameter_dict, network: nx.Graph = None):
+        """
+        Creates and runs a simulation for a parameter combination.
+
+        :param parameter_dict: A dictionary with the parameters of the simulation.
+        :param network: A private network for the simulation. If None, the network of the experiment is copied.
+        :returns: A dataframe with the results of the simulation.
+        """
+        if network is None:
+            if isinstance(self.network, nx.Graph) and not self.network.is_multigraph():
+                # same order of agents and neighbors as in the workers of a parallel run
+                network = SharedNetwork(self.network).to_graph()
+            elif isinstance(self.network, nx.Graph):
+                network = self.network.copy()
+            else:
+                network = self.network
+        if self.initial_state_cache is not None:
+            initial_state_key = self._initial_state_key(parameter_dict)
+        else:
+            initial_state_key = None
+        start_time = time.perf_counter()
+        simulation = self._create_simulation(parameter_dict, network=network,
+                                             initial_state_cache=self.initial_state_cache,
+                                             initial_state_key=initial_state_key)
+        if self.profiler is not None and isinstance(parameter_dict, ProfiledParameters):
+            results = self.profiler.run(simulation.run, show_progress=False)
+        else:
+            results = simulation.run(show_progress=False)
+        if self.runtime_log is not None:
+            RuntimeLog(self.runtime_log).record(self._cost_parameters(parameter_dict),
+                                                time.perf_counter() - start_time)
+        return results
+
+    def _initial_state_parameters(self, parameter_dict: dict) -> dict:
+        """
+        :returns: The parameters of a parameter combination that can affect the initial state of a simulation: all
+            parameters except the seed and those that are only given as influence, focal agent, neighbor selection,
+            stop condition or communication parameters.
+        """
+        dynamics_parameters = set().union(self.influence_parameters, self.focal_agent_parameters,
+                                          self.neighbor_parameters, self.stop_condition_parameters,
+                                          self.communication_regime)
+        initial_parameters = set().union(self.network_parameters, self.attribute_parameters,
+                                         self.network_modifier_parameters)
+        return {key: value for key, value in parameter_dict.items()
+                if key != 'seed' and (key not in dynamics_parameters or key in initial_parameters)}
+
+    def _initial_state_key(self, parameter_dict: dict) -> str:
+        """
+        :returns: The key of the initial condition of a parameter combination in the initial state cache.
+        """
+        if self._network_repr is None:
+            self._network_repr = stable_repr(self.network)
+        return InitialStateCache.create_key(network=self._network_repr,
+                                            topology=self.topology,
+                                            network_modifiers=self.network_modifiers,
+                                            attributes_initializer=self.attributes_initializer,
+                                            dissimilarity_measure=self.dissimilarity_measure,
+                                            seed=parameter_dict['seed'],
+                                            parameters=self._initial_state_parameters(parameter_dict))
 
     def _create_parameter_dictionaries(self) -> List[dict]:
         """
@@ -520,7 +1051,22 @@ class Experiment:
         full_repetitions_list = [copy.copy(parameter_combination) for parameter_combination in full_repetitions_list]
 
         # add individual seeds to each parameter combination, based on experiment seed
-        if self.seed is not None:
+        if self.common_random_numbers:
+            if self.seed is not None:
+                random.seed(self.seed)
+            # the n-th repetitions of all combinations with the same initial condition share a seed
+            condition_seeds = {}
+            repetitions = {}
+            seeds = []
+            for parameter_combination in full_repetitions_list:
+                combination = stable_repr(parameter_combination)
+                repetition = repetitions.get(combination, 0)
+                repetitions[combination] = repetition + 1
+                condition = (stable_repr(self._initial_state_parameters(parameter_combination)), repetition)
+                if condition not in condition_seeds:
+                    condition_seeds[condition] = random.randint(10000, 99999)
+                seeds.append(condition_seeds[condition])
+        elif self.seed is not None:
             random.seed(self.seed)
             seeds = [random.randint(10000, 99999) for _ in range(len(full_repetitions_list))]
         else:
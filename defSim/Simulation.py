@@ -1,11 +1,10 @@
-from tqdm import tqdm
-from typing import List
+from typing import List, TYPE_CHECKING
 import inspect
 import random
+import uuid
 from math import inf  # having inf imported already is significantly faster than explicit references to math.inf
 import warnings
 import pathlib
-import pandas as pd
 import numpy as np
 import networkx as nx
 from defSim.network_init import network_init
@@ -19,9 +18,21 @@ from defSim.dissimilarity_component.dissimilarity_calculator import Dissimilarit
 from defSim.dissimilarity_component.dissimilarity_calculator import select_calculator
 from defSim.tools import OutputMeasures
 from defSim.tools import CreateOutputTable
-from defSim.tools.CreateDataFiles import create_data_files
+from defSim.tools.TickwiseRecorder import TickwiseRecorder, StreamingTickwiseRecorder, TrajectoryHistogram
+from defSim.tools.InitialStateCache import InitialStateCache, InitialState
+from defSim.tools.EventLog import EventLog
 from defSim.tools.ConvergenceChecks import ConvergenceCheck, PragmaticConvergenceCheck, OpinionDistanceConvergenceCheck
 
+if TYPE_CHECKING:
+    import pandas as pd
+
+# pandas and tqdm are imported when they are first needed, so worker processes that import defSim start quickly
+
+
+def _progress_bar(iterable):
+    from tqdm import tqdm
+    return tqdm(iterable, mininterval=1)
+
 
 class Simulation:
     """
@@ -63,7 +74,20 @@ class Simulation:
         output_folder_path (str or pathlib.Path): If not None, the output table is saved to file(s) in this location.
         output_file_name (str): The name of the output file, with file type suffix.
         tickwise (List = [str]):  A list of strings with the names of agent attributes that need to be recorded at every
-            timestep
+            timestep. Agent attributes are reported as a two-dimensional NumPy array with one row per recorded tick and
+            one column per agent. To record only the distribution of an attribute, pass a
+            :class:`~defSim.tools.TickwiseRecorder.TrajectoryHistogram`.
+        tickwise_folder_path (str or pathlib.Path): If not None, recorded agent attributes are streamed to .npy files
+            in this folder during the run, and the tickwise columns of the output contain the paths to these files.
+            Read them with :func:`~defSim.tools.TickwiseRecorder.read_tickwise`.
+        initial_state_cache (:class:`~defSim.tools.InitialStateCache.InitialStateCache` = None): If not None, the state
+            after initialization is taken from this cache if it contains it, and added to it otherwise. The simulation
+            is the same in both cases.
+        initial_state_key (str = None): The key of the initial condition in the initial_state_cache. If None, it is
+            created from the network, topology, initializers, dissimilarity measure, seed and all parameters.
+        event_log (List[str] or :class:`~defSim.tools.EventLog.EventLog` = None): The names of agent features of which
+            every change is recorded in an event log, from which the state at any tick can be reconstructed. The log is
+            reported in the EventLog column of the output.
     """
 
     def __init__(self,
@@ -84,7 +108,11 @@ class Simulation:
                  output_realizations=[],
                  output_folder_path: str or pathlib.Path = None,
                  output_file_name: str = 'defSim_output.csv',
-                 tickwise: List[str] or List[CreateOutputTable.OutputTableCreator] = []
+                 tickwise: List[str] or List[CreateOutputTable.OutputTableCreator] = [],
+                 tickwise_folder_path: str or pathlib.Path = None,
+                 initial_state_cache: InitialStateCache = None,
+                 initial_state_key: str = None,
+                 event_log: List[str] or EventLog = None
                  ):
         self.network = network
         self.topology = topology
@@ -110,6 +138,14 @@ class Simulation:
         self.output_folder_path = output_folder_path
         self.output_file_name = output_file_name
         self.tickwise = tickwise
+        self.tickwise_folder_path = tickwise_folder_path
+        self.initial_state_cache = initial_state_cache
+        self.initial_state_key = initial_state_key
+        self.tickwise_output = {}
+        self.instrumentation = None
+        self.event_log = event_log if event_log is None or isinstance(event_log, EventLog) else EventLog(event_log)
+        self.influence_hooks = []
+        self._influence_hooks = []  # the hooks and the incremental tickwise realizations of the current run
         self.initialize_tickwise_output()
 
     def initialize_tickwise_output(self):
@@ -118,30 +154,78 @@ class Simulation:
         else:
             self.tickwise_output_step_size = 1
 
+        # default realizations are evaluated together, so they are selected once rather than on every step
+        self.tickwise_defaults = [i for i in self.tickwise if i in CreateOutputTable._implemented_output_realizations]
+
+        # agent features are stored in arrays that grow geometrically, so they start small
+        expected_rows = min(-(-self.max_iterations // self.tickwise_output_step_size), 1024)
+        dtype = self._tickwise_dtype()
+
+        # files of a previous run are kept, but no longer written to
+        for recorder in self.tickwise_output.values():
+            if isinstance(recorder, StreamingTickwiseRecorder) and recorder.num_rows > 0:
+                recorder.close()
+
         self.tickwise_output = {}
+        self.tickwise_realizations = []  # tickwise realizations, with OutputTableCreator classes instantiated
+        self._influence_hooks = list(self.influence_hooks)
         for tickwise_realization in self.tickwise:
-            if tickwise_realization in CreateOutputTable._implemented_output_realizations:
+            if tickwise_realization in self.tickwise_defaults:
                 self.tickwise_output['defaults'] = []
             else:
                 if inspect.isclass(tickwise_realization):
                     if issubclass(tickwise_realization, CreateOutputTable.OutputTableCreator):
                         tickwise_realization = tickwise_realization()
+                self.tickwise_realizations.append(tickwise_realization)
+                if isinstance(tickwise_realization, OutputMeasures.IncrementalReporter):
+                    # incremental reporters start over from the network of this run, and follow its changes
+                    tickwise_realization.reset()
+                    self._influence_hooks.append(tickwise_realization.on_influence)
                 if isinstance(tickwise_realization, CreateOutputTable.OutputTableCreator):
                     if tickwise_realization.label != "":
                         self.tickwise_output[tickwise_realization.label] = []
                     else:
                         tickwise_realization.label = "CustomOutput{}".format(random.randint(1000, 9999))
                         self.tickwise_output[tickwise_realization.label] = []
+                elif isinstance(tickwise_realization, TrajectoryHistogram):
+                    # every run records into its own copy, so the same histogram can be passed to many simulations
+                    self.tickwise_output[tickwise_realization.label] = tickwise_realization.start(
+                        agents=self.agentIDs, expected_rows=expected_rows, incremental=True)
+                    self._influence_hooks.append(self.tickwise_output[tickwise_realization.label].on_influence)
+                elif self.tickwise_folder_path is not None:
+                    self.tickwise_output[tickwise_realization] = StreamingTickwiseRecorder(
+                        feature=tickwise_realization,
+                        agents=self.agentIDs,
+                        folder_path=self.tickwise_folder_path,
+                        file_name='tickwise_{}_{}_{}.npy'.format(tickwise_realization, self.seed,
+                                                                 uuid.uuid4().hex[:8]),
+                        dtype=dtype)
                 else:
-                    self.tickwise_output[tickwise_realization] = []
+                    self.tickwise_output[tickwise_realization] = TickwiseRecorder(feature=tickwise_realization,
+                                                                                  agents=self.agentIDs,
+                                                                                  expected_rows=expected_rows,
+                                                                                  dtype=dtype)
 
-    def return_values(self) -> pd.DataFrame:
+    def _tickwise_dtype(self):
+        """
+        :returns: int32 if the features of the agents are categorical, otherwise None, so numeric features are
+            recorded as floats.
+        """
+        from defSim.agents_init.RandomCategoricalInitializer import RandomCategoricalInitializer
+        initializer = self.attributes_initializer
+        if initializer == "random_categorical" or isinstance(initializer, RandomCategoricalInitializer) or (
+                inspect.isclass(initializer) and issubclass(initializer, RandomCategoricalInitializer)):
+            return np.int32
+        return None
+
+    def return_values(self) -> 'pd.DataFrame':
         """
         This method returns the values stored in the Simulation object. Both default, and user-specified values are
         returned to the console to make the Simulation object more transparent.
 
         :returns: A Pandas DataFrame with the parameter settings
         """
+        import pandas as pd
 
         parameter_df = pd.DataFrame()
         for i in self.__dict__.keys():
@@ -153,7 +237,7 @@ class Simulation:
 
         return parameter_df
 
-    def run(self, initialize: bool = True, show_progress: bool = True) -> pd.DataFrame:
+    def run(self, initialize: bool = True, show_progress: bool = True, instrument: bool = False) -> 'pd.DataFrame':
         """
         This method initializes the network if none is given, initializes the attributes of the agents, and also
         computes and sets the distances between each neighbor.
@@ -162,6 +246,10 @@ class Simulation:
         :param bool=True initialize: Initialize the simulation before running (disable if initialization was
             done separately)
         :param bool=True show_progress: Whether to show progress bar
+        :param bool=False instrument: Whether to measure the time spent in each phase of the steps and count influence
+            attempts and recomputed distances. The measurements are added to the output as extra columns, and are
+            available as self.instrumentation, see :class:`~defSim.tools.Instrumentation.Instrumentation`. Runs that
+            are not instrumented are not slowed down.
         :returns: A Pandas DataFrame that contains one row of data. To see what output the output contains see
             :func:`~create_output_table`
 
@@ -169,25 +257,44 @@ class Simulation:
         if initialize:
             self.initialize()
 
-        if self.influence_function == 'list':
-            self.influence_function = self.parameter_dict['influence_function']
+        self._start_run()
 
-        if self.stop_condition == "pragmatic_convergence":
-            self._run_until_pragmatic_convergence(show_progress)
-        elif self.stop_condition == "strict_convergence":
-            self._run_until_strict_convergence(show_progress)
-        elif isinstance(self.stop_condition, ConvergenceCheck):
-            self._run_until_convergence(show_progress)
-        elif self.stop_condition == "max_iteration":
-            self._run_until_max_iteration(show_progress)
-        else:
-            raise ValueError(
-                "Can only select from the options ['pragmatic_convergence', 'strict_convergence', 'max_iteration'] or "
-                "pass custom stop condition")
+        self.instrumentation = None
+        if instrument:
+            from defSim.tools.Instrumentation import Instrumentation
+            self.instrumentation = Instrumentation()
+            self.instrumentation.start(self)
+
+        try:
+            if self.stop_condition == "pragmatic_convergence":
+                self._run_until_pragmatic_convergence(show_progress)
+            elif self.stop_condition == "strict_convergence":
+                self._run_until_strict_convergence(show_progress)
+            elif isinstance(self.stop_condition, ConvergenceCheck):
+                self._run_until_convergence(show_progress)
+            elif self.stop_condition == "max_iteration":
+                self._run_until_max_iteration(show_progress)
+            else:
+                raise ValueError(
+                    "Can only select from the options ['pragmatic_convergence', 'strict_convergence', "
+                    "'max_iteration'] or pass custom stop condition")
+        finally:
+            if self.instrumentation is not None:
+                self.instrumentation.stop(self)
 
         return self.create_output_table()
 
-    def run_simulation(self, initialize: bool = True) -> pd.DataFrame:
+    def _start_run(self):
+        """
+        Prepares an initialized simulation for its steps, which are run by :meth:`run` or by the caller.
+        """
+        if self.influence_function == 'list':
+            self.influence_function = self.parameter_dict['influence_function']
+
+        if self.event_log is not None:
+            self.event_log.start(self.network, self.agentIDs, tick=self.time_steps)
+
+    def run_simulation(self, initialize: bool = True) -> 'pd.DataFrame':
         """
         Will be deprecated in favor of Simulation.run().
         Replace in code, will be removed at or before v1.0.0
@@ -209,9 +316,6 @@ class Simulation:
         self.time_steps = 0
         self.influence_steps = 0
 
-        # reset tickwise output
-        self.initialize_tickwise_output()
-
         if self.seed is None:
             self.seed = random.randint(10000, 99999)
         random.seed(self.seed)
@@ -228,10 +332,23 @@ class Simulation:
             else:
                 self.network_modifiers.append(MaslovSneppenModifier(rewiring_prop=self.parameter_dict['ms_rewiring']))
 
-                # read or generate network if no nx.Graph was provided, apply network modifiers
+        if self.network_provided and isinstance(self.network, str) and self.network == 'list':
+            self.network = self.parameter_dict.pop('network')
+
+        # restore the initial state if it is cached, this leaves the random number generators in the same state
+        initial_state_key = None
+        if self.initial_state_cache is not None:
+            initial_state_key = self.initial_state_key if self.initial_state_key is not None else \
+                self._create_initial_state_key()
+            initial_state = self.initial_state_cache.get(initial_state_key)
+            if initial_state is not None:
+                self.network = initial_state.restore(self.parameter_dict['np_random_generator'])
+                self.agentIDs = list(self.network)
+                self.initialize_tickwise_output()
+                return
+
+        # read or generate network if no nx.Graph was provided, apply network modifiers
         if self.network_provided:
-            if self.network == 'list':
-                self.network = self.parameter_dict.pop('network')
             if not isinstance(self.network, nx.Graph) and self.network is not None:
                 self.network = network_init.read_network(self.network)
 
@@ -246,12 +363,32 @@ class Simulation:
             # storing the indices of the agents to access them quicker
         self.agentIDs = list(self.network)
 
+        # reset tickwise output (recorders store agent values in the order of self.agentIDs)
+        self.initialize_tickwise_output()
+
         # initialize agent attributes (accepts string realizations and instances of AttributesInitializer classes)
         agents_init.initialize_attributes(self.network, self.attributes_initializer, **self.parameter_dict)
 
         # initialization of distances between neighbors
         self.dissimilarity_calculator.calculate_dissimilarity_networkwide(self.network)
 
+        if initial_state_key is not None:
+            self.initial_state_cache.put(initial_state_key,
+                                         InitialState(self.network, self.parameter_dict['np_random_generator']))
+
+    def _create_initial_state_key(self) -> str:
+        """
+        :returns: The key of the initial condition of this simulation in the initial state cache.
+        """
+        return InitialStateCache.create_key(network=self.network if self.network_provided else None,
+                                            topology=self.topology,
+                                            network_modifiers=self.network_modifiers,
+                                            attributes_initializer=self.attributes_initializer,
+                                            dissimilarity_measure=self.dissimilarity_calculator,
+                                            seed=self.seed,
+                                            parameters={key: value for key, value in self.parameter_dict.items()
+                                                        if key != 'np_random_generator'})
+
     def initialize_simulation(self):
         """
         Will be deprecated in favor of Simulation.initialize().
@@ -279,6 +416,9 @@ class Simulation:
                                                            selected_agent,
                                                            self.communication_regime, **self.parameter_dict)
 
+        if self._influence_hooks:
+            influenced_agents, attributes_before = self._attributes_before_influence(selected_agent, neighbors)
+
         success = influence_sim.spread_influence(self.network,
                                                  self.influence_function,
                                                  selected_agent,
@@ -288,23 +428,73 @@ class Simulation:
                                                  self.influenceable_attributes,
                                                  **self.parameter_dict)
 
+        if self._influence_hooks:
+            self._notify_influence(influenced_agents, attributes_before)
+
+        if self.event_log is not None:
+            self.event_log.record(self.network, self.time_steps + 1, [selected_agent] + list(neighbors))
+
         if self.tickwise and self.time_steps % self.tickwise_output_step_size == 0:  # list is not empty
-            defaults_selected = [i for i in self.tickwise if i in CreateOutputTable._implemented_output_realizations]
-            if len(defaults_selected) > 0:
-                self.tickwise_output['defaults'].append(
-                    CreateOutputTable.create_output_table(network=self.network, realizations=defaults_selected))
-            for i in self.tickwise:
-                if not i in defaults_selected:
-                    if isinstance(i, CreateOutputTable.OutputTableCreator):
-                        self.tickwise_output[i.label].append(i.create_output(network=self.network))
-                    else:
-                        self.tickwise_output[i].append(
-                            OutputMeasures.AttributeReporter(feature=i).create_output(self.network))
+            self._record_tickwise()
 
         self.time_steps += 1
         if success:
             self.influence_steps += 1
 
+    def on_influence(self, hook):
+        """
+        Registers a function that is called for every change of a feature of an agent during the influence step, as
+        hook(agent, feature, old_value, new_value). The features of the focal agent and its selected neighbors are
+        compared before and after the step, so influence functions that change other agents are not fully reported.
+        Steps are not slowed down when no hooks are registered.
+
+        :param hook: The function. It is also returned, so this method can be used as a decorator.
+        :returns: The hook.
+        """
+        self.influence_hooks.append(hook)
+        self._influence_hooks.append(hook)
+        return hook
+
+    def _attributes_before_influence(self, selected_agent, neighbors) -> tuple:
+        """
+        :returns: A list of the agents that may be influenced, and a list with a copy of their attributes.
+        """
+        nodes = self.network.nodes
+        agents = list(dict.fromkeys([selected_agent] + list(neighbors)))
+        return agents, [dict(nodes[agent]) for agent in agents]
+
+    def _notify_influence(self, agents: list, attributes_before: list):
+        """
+        Calls the influence hooks for every attribute of the agents that changed.
+        """
+        nodes = self.network.nodes
+        for agent, attributes in zip(agents, attributes_before):
+            current = nodes[agent]
+            for feature, old_value in attributes.items():
+                new_value = current[feature]
+                if new_value != old_value:
+                    for hook in self._influence_hooks:
+                        hook(agent, feature, old_value, new_value)
+
+    def _record_tickwise(self):
+        """
+        Records the tickwise output of the current step.
+        """
+        if len(self.tickwise_defaults) > 0:
+            self.tickwise_output['defaults'].append(
+                CreateOutputTable.create_output_table(network=self.network, realizations=self.tickwise_defaults))
+        context = OutputMeasures.OutputContext(self.network)  # shared by all reporters at this tick
+        for i in self.tickwise_realizations:
+            if isinstance(i, CreateOutputTable.OutputTableCreator):
+                if CreateOutputTable._accepts_context(i):
+                    self.tickwise_output[i.label].append(i.create_output(network=self.network, context=context))
+                else:
+                    self.tickwise_output[i.label].append(i.create_output(network=self.network))
+            elif isinstance(i, TrajectoryHistogram):
+                self.tickwise_output[i.label].record(self.network)
+            else:
+                self.tickwise_output[i].record(self.network)
+
     def run_simulation_step(self):
         """
         Will be deprecated in favor of Simulation.run_step().
@@ -317,7 +507,7 @@ class Simulation:
             category=FutureWarning)
         return self.run_step()
 
-    def create_output_table(self) -> pd.DataFrame:
+    def create_output_table(self) -> 'pd.DataFrame':
         """
         This method measures multiple characteristics of the network in its current state and writes them to a Pandas
         DataFrame. It contains the following columns:
@@ -342,25 +532,49 @@ class Simulation:
             parameter_settings['Topology'] = self.topology
         parameter_settings = {**parameter_settings, **self.parameter_dict}
         parameter_settings['communication_regime'] = self.communication_regime
+        if self.instrumentation is not None:
+            parameter_settings.update(self.instrumentation.columns())
+        if self.event_log is not None:
+            parameter_settings['EventLog'] = self.event_log
 
         if self.output_realizations == []:
             self.output_realizations = ["Basic"]
 
+        # streamed recordings are reported by the path to their file, so they can be read lazily
+        tickwise_output = {}
+        for key, value in self.tickwise_output.items():
+            if isinstance(value, StreamingTickwiseRecorder):
+                tickwise_output[key] = value.flush()
+            elif isinstance(value, TickwiseRecorder):
+                tickwise_output[key] = value.to_array()
+            else:
+                tickwise_output[key] = value
+
         results = CreateOutputTable.create_output_table(network=self.network,
                                                         realizations=self.output_realizations,
                                                         settings_dict=parameter_settings,
-                                                        tickwise_output=self.tickwise_output,
+                                                        tickwise_output=tickwise_output,
                                                         **self.parameter_dict)
 
+        import pandas as pd
         results_dataframe = pd.DataFrame.from_dict({k: [results[k]] for k in results.keys()})
 
         if self.output_folder_path is not None:
+            from defSim.tools.CreateDataFiles import create_data_files
             create_data_files(output_table=results_dataframe,
                               output_folder_path=self.output_folder_path,
                               output_file_name=self.output_file_name)
 
         return results_dataframe
 
+    def _convergence_check(self, check: ConvergenceCheck) -> ConvergenceCheck:
+        """
+        :returns: The convergence check, wrapped to be timed if the run is instrumented.
+        """
+        if self.instrumentation is not None:
+            return self.instrumentation.convergence_check(check)
+        return check
+
     def _run_until_pragmatic_convergence(self, show_progress: bool = False):
         """
         Pragmatic convergence means that each "step_size" time steps it is checked whether the structure of the network
@@ -375,10 +589,10 @@ class Simulation:
         except KeyError:
             step_size = 100
 
-        stop_condition = PragmaticConvergenceCheck(initial_network=self.network.copy())
+        stop_condition = self._convergence_check(PragmaticConvergenceCheck(initial_network=self.network.copy()))
 
         if show_progress:
-            for _ in tqdm(range(self.max_iterations), mininterval=1):
+            for _ in _progress_bar(range(self.max_iterations)):
                 self.run_step()
                 if self.time_steps % step_size == 0:
                     if stop_condition.check_convergence(self.network):
@@ -417,10 +631,10 @@ class Simulation:
         except KeyError:
             step_size = 100
 
-        stop_condition = OpinionDistanceConvergenceCheck(maximum=maximum, minimum=minimum)
+        stop_condition = self._convergence_check(OpinionDistanceConvergenceCheck(maximum=maximum, minimum=minimum))
 
         if show_progress:
-            for _ in tqdm(range(self.max_iterations), mininterval=1):
+            for _ in _progress_bar(range(self.max_iterations)):
                 self.run_step()
                 if self.time_steps % step_size == 0:
                     if stop_condition.check_convergence(self.network):
@@ -447,17 +661,19 @@ class Simulation:
         except KeyError:
             step_size = 100
 
+        stop_condition = self._convergence_check(self.stop_condition)
+
         if show_progress:
-            for _ in tqdm(range(self.max_iterations), mininterval=1):
+            for _ in _progress_bar(range(self.max_iterations)):
                 self.run_step()
                 if self.time_steps % step_size == 0:
-                    if self.stop_condition.check_convergence(self.network, **self.parameter_dict):
+                    if stop_condition.check_convergence(self.network, **self.parameter_dict):
                         break
         else:
             for _ in range(self.max_iterations):
                 self.run_step()
                 if self.time_steps % step_size == 0:
-                    if self.stop_condition.check_convergence(self.network, **self.parameter_dict):
+                    if stop_condition.check_convergence(self.network, **self.parameter_dict):
                         break
 
     def _run_until_max_iteration(self, show_progress: bool = False):
@@ -465,7 +681,7 @@ class Simulation:
         :param bool show_progress: bool determines whether to show progress bar
         """
         if show_progress:
-            for _ in tqdm(range(self.max_iterations), mininterval=1):
+            for _ in _progress_bar(range(self.max_iterations)):
                 self.run_step()
         else:
             for _ in range(self.max_iterations):
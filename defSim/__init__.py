@@ -11,56 +11,54 @@ __all__ = ["agents_init",
 # update this version number together with number in setup.py
 __version__ = "0.1.3"
 
-from defSim.agents_init import agents_init
-from defSim.agents_init.agents_init import initialize_attributes
-from defSim.agents_init.agents_init import set_categorical_attribute
-from defSim.agents_init.agents_init import set_continuous_attribute
-from defSim.agents_init.agents_init import AttributesInitializer
-from defSim.agents_init.CorrelatedContinuousInitializer import CorrelatedContinuousInitializer
-from defSim.agents_init.RandomCategoricalInitializer import RandomCategoricalInitializer
-from defSim.agents_init.RandomContinuousInitializer import RandomContinuousInitializer
+import importlib
+import sys
+import types
 
-from defSim.dissimilarity_component import dissimilarity_calculator
-from defSim.dissimilarity_component.dissimilarity_calculator import DissimilarityCalculator
-from defSim.dissimilarity_component.dissimilarity_calculator import select_calculator
-from defSim.dissimilarity_component.HammingDistance import HammingDistance
-from defSim.dissimilarity_component.EuclideanDistance import EuclideanDistance
-from defSim.dissimilarity_component.ManhattanDistance import ManhattanDistance
+import defSim.tools
+from defSim.core import *
 
-from defSim.focal_agent_sim import focal_agent_sim
-from defSim.focal_agent_sim.focal_agent_sim import select_focal_agent
-from defSim.focal_agent_sim.RandomSelector import RandomSelector
+# Plots, file exporters, the Experiment and the extensions import pandas, matplotlib, seaborn, tqdm or SciPy, which
+# takes seconds. They are only imported when they are first used (PEP 562), so worker processes start quickly.
+_lazy_attributes = {"Experiment": ("defSim.Experiment", "Experiment"),
+                    "NetworkPlot": ("defSim.tools.Plots", "NetworkPlot"),
+                    "DynamicsPlot": ("defSim.tools.Plots", "DynamicsPlot"),
+                    "RelPlot": ("defSim.tools.Plots", "RelPlot"),
+                    "LinePlot": ("defSim.tools.Plots", "LinePlot"),
+                    "ScatterPlot": ("defSim.tools.Plots", "ScatterPlot"),
+                    "HeatMap": ("defSim.tools.Plots", "HeatMap"),
+                    "TrajectoryHeatPlot": ("defSim.tools.Plots", "TrajectoryHeatPlot"),
+                    "create_data_files": ("defSim.tools.CreateDataFiles", "create_data_files"),
+                    "ResultStream": ("defSim.tools.CreateDataFiles", "ResultStream")}
+_lazy_modules = ["extensions", "worker"]
 
-from defSim.influence_sim import influence_sim
-from defSim.influence_sim.influence_sim import spread_influence
-from defSim.influence_sim.influence_sim import InfluenceOperator
-from defSim.influence_sim.BoundedConfidence import BoundedConfidence
-from defSim.influence_sim.Persuasion import Persuasion
-from defSim.influence_sim.SimilarityAdoption import SimilarityAdoption
-from defSim.influence_sim.WeightedLinear import WeightedLinear
 
-from defSim.neighbor_selector_sim import neighbor_selector_sim
-from defSim.neighbor_selector_sim.neighbor_selector_sim import select_neighbors
-from defSim.neighbor_selector_sim.RandomNeighborSelector import RandomNeighborSelector
+def __getattr__(name: str):
+    if name in _lazy_attributes:
+        module_name, attribute = _lazy_attributes[name]
+        value = getattr(importlib.import_module(module_name), attribute)
+    elif name in _lazy_modules:
+        value = importlib.import_module("defSim." + name)
+    else:
+        raise AttributeError("module 'defSim' has no attribute '{}'".format(name))
+    globals()[name] = value
+    return value
 
-from defSim.network_evolution_sim import network_evolution_sim
-from defSim.network_evolution_sim.network_evolution_sim import rewire_network
-from defSim.network_evolution_sim.network_evolution_sim import NetworkModifier
-from defSim.network_evolution_sim.MaslovSneppenModifier import MaslovSneppenModifier
-from defSim.network_evolution_sim.NewTiesModifier import NewTiesModifier
 
-from defSim.network_init.network_init import generate_network
-from defSim.network_init.network_init import read_network
+def __dir__():
+    return sorted(set(globals()) | set(_lazy_attributes) | set(_lazy_modules))
 
-import defSim.tools
-from defSim.tools import OutputMeasures
-from defSim.tools.OutputMeasures import ClusterFinder
-from defSim.tools.OutputMeasures import AttributeReporter
-from defSim.tools.CreateOutputTable import create_output_table
-from defSim.tools.Plots import NetworkPlot, DynamicsPlot, RelPlot, LinePlot, ScatterPlot, HeatMap, TrajectoryHeatPlot
-from defSim.tools.NetworkDistanceUpdater import update_dissimilarity
-# some tools not yet imported
 
-from defSim.Experiment import Experiment
+class _Package(types.ModuleType):
+    """
+    Importing a submodule sets it as an attribute of its package. This keeps defSim.Experiment the Experiment class
+    when the defSim.Experiment module is imported after the package, as it was when the class was imported eagerly.
+    """
+
+    def __setattr__(self, name, value):
+        if name in _lazy_attributes and isinstance(value, types.ModuleType):
+            return
+        super().__setattr__(name, value)
+
 
-from defSim.Simulation import Simulation
+sys.modules[__name__].__class__ = _Package
@@ -1,6 +1,5 @@
 import networkx as nx
 import numpy as np
-import scipy.stats as stats
 import math
 import warnings
 import random
@@ -166,6 +165,7 @@ def apply_neighbor_similarity_beta_weights(network, feature_values, feature_name
     
     # assign attribute values with weights determined by average value of network neighbors
     # on the specified feature
+    import scipy.stats as stats  # imported here, as importing scipy.stats is slow
     nodes = list(network.nodes)
 
     for node in nodes:
@@ -26,6 +26,8 @@ class RandomContinuousInitializer(AttributesInitializer):
         except KeyError:
             warnings.warn("Number of features not specified, using 1 as default")
             self.num_features = 1     
+        # the seeded generator of the simulation, so initial values can be replicated
+        self.np_random_generator = kwargs.get("np_random_generator")
 
     def initialize_attributes(self, network: nx.Graph, **kwargs):
         """
@@ -35,5 +37,7 @@ class RandomContinuousInitializer(AttributesInitializer):
         :param network: The graph object whose nodes' attributes are modified.
         """    
 
+        if self.np_random_generator is not None:
+            kwargs.setdefault("np_random_generator", self.np_random_generator)
         for i in range(self.num_features):
             set_continuous_attribute(network, 'f' + str("%02d" % (i + 1)), distribution=self.distribution, **kwargs)
\ No newline at end of file
@@ -1,6 +1,5 @@
 import networkx as nx
 import numpy as np
-import scipy.stats as stats
 from abc import ABC, abstractmethod
 import random
 import math
@@ -94,6 +93,7 @@ def generate_correlated_continuous_attributes(n_attributes: int, n_values: int,
     if distribution == "gaussian":
         final_attributes = np.apply_along_axis(rescale_attribute, axis=0, arr=base_data)
     elif distribution == "uniform":
+        import scipy.stats as stats  # imported here, as importing scipy.stats is slow
         final_attributes = np.apply_along_axis(stats.norm.cdf, axis=0, arr=base_data)
 
     return final_attributes
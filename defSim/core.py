@@ -0,0 +1,68 @@
+"""
+The core of defSim: the components of simulations, network generation, the output measures and the Simulation class.
+Importing this module only imports NumPy and NetworkX, so worker processes that only run simulations start quickly.
+Modules that need pandas, SciPy or tqdm import them when they are first used.
+"""
+from defSim.agents_init import agents_init
+from defSim.agents_init.agents_init import initialize_attributes
+from defSim.agents_init.agents_init import set_categorical_attribute
+from defSim.agents_init.agents_init import set_continuous_attribute
+from defSim.agents_init.agents_init import AttributesInitializer
+from defSim.agents_init.CorrelatedContinuousInitializer import CorrelatedContinuousInitializer
+from defSim.agents_init.RandomCategoricalInitializer import RandomCategoricalInitializer
+from defSim.agents_init.RandomContinuousInitializer import RandomContinuousInitializer
+
+from defSim.dissimilarity_component import dissimilarity_calculator
+from defSim.dissimilarity_component.dissimilarity_calculator import DissimilarityCalculator
+from defSim.dissimilarity_component.dissimilarity_calculator import select_calculator
+from defSim.dissimilarity_component.HammingDistance import HammingDistance
+from defSim.dissimilarity_component.EuclideanDistance import EuclideanDistance
+from defSim.dissimilarity_component.ManhattanDistance import ManhattanDistance
+
+from defSim.focal_agent_sim import focal_agent_sim
+from defSim.focal_agent_sim.focal_agent_sim import select_focal_agent
+from defSim.focal_agent_sim.RandomSelector import RandomSelector
+
+from defSim.influence_sim import influence_sim
+from defSim.influence_sim.influence_sim import spread_influence
+from defSim.influence_sim.influence_sim import InfluenceOperator
+from defSim.influence_sim.BoundedConfidence import BoundedConfidence
+from defSim.influence_sim.Persuasion import Persuasion
+from defSim.influence_sim.SimilarityAdoption import SimilarityAdoption
+from defSim.influence_sim.WeightedLinear import WeightedLinear
+
+from defSim.neighbor_selector_sim import neighbor_selector_sim
+from defSim.neighbor_selector_sim.neighbor_selector_sim import select_neighbors
+from defSim.neighbor_selector_sim.RandomNeighborSelector import RandomNeighborSelector
+
+from defSim.network_evolution_sim import network_evolution_sim
+from defSim.network_evolution_sim.network_evolution_sim import rewire_network
+from defSim.network_evolution_sim.network_evolution_sim import NetworkModifier
+from defSim.network_evolution_sim.MaslovSneppenModifier import MaslovSneppenModifier
+from defSim.network_evolution_sim.NewTiesModifier import NewTiesModifier
+
+from defSim.network_init.network_init import generate_network
+from defSim.network_init.network_init import read_network
+from defSim.network_init.network_init import read_edge_list
+
+from defSim.tools import OutputMeasures
+from defSim.tools.OutputMeasures import ClusterFinder
+from defSim.tools.OutputMeasures import AttributeReporter
+from defSim.tools.CreateOutputTable import create_output_table
+from defSim.tools.NetworkDistanceUpdater import update_dissimilarity
+
+from defSim.Simulation import Simulation
+
+__all__ = ["agents_init", "initialize_attributes", "set_categorical_attribute", "set_continuous_attribute",
+           "AttributesInitializer", "CorrelatedContinuousInitializer", "RandomCategoricalInitializer",
+           "RandomContinuousInitializer",
+           "dissimilarity_calculator", "DissimilarityCalculator", "select_calculator", "HammingDistance",
+           "EuclideanDistance", "ManhattanDistance",
+           "focal_agent_sim", "select_focal_agent", "RandomSelector",
+           "influence_sim", "spread_influence", "InfluenceOperator", "BoundedConfidence", "Persuasion",
+           "SimilarityAdoption", "WeightedLinear",
+           "neighbor_selector_sim", "select_neighbors", "RandomNeighborSelector",
+           "network_evolution_sim", "rewire_network", "NetworkModifier", "MaslovSneppenModifier", "NewTiesModifier",
+           "generate_network", "read_network", "read_edge_list",
+           "OutputMeasures", "ClusterFinder", "AttributeReporter", "create_output_table", "update_dissimilarity",
+           "Simulation"]
@@ -1,3 +1,8 @@
+import gc
+import hashlib
+import os
+import pathlib
+import shutil
 import numpy as np
 import networkx as nx
 import warnings
@@ -51,20 +56,193 @@ def generate_network(name: str, network_modifiers=None, **kwargs) -> nx.Graph:
     return network
 
 
-def read_network(network_input: np.ndarray or str):
+def read_network(network_input, directed: bool = False, weighted: bool = False, cache_folder: str = None,
+                 return_labels: bool = False):
     """
-    This function takes the structure of an empirically measured network, provided as an adjacency matrix,
-    and creates a network graph object out of it.
+    This function takes the structure of an empirically measured network, provided as an adjacency matrix or an edge
+    list, and creates a network graph object out of it. Edge lists are parsed in bulk, and the agents are numbered
+    0, 1, ... in the sorted order of their labels in the file.
 
     :param network_input: Either an adjacency matrix where the entry (i,j) represents whether an edge between
-        i and j exists or if applicable, its strength,
-        or the path to a file containing an edge list
+        i and j exists or if applicable, its strength (a NumPy array or a SciPy sparse matrix), or the path to a file
+        containing an edge list, with one tie per line between two agents separated by whitespace. Lines starting with
+        '#' are skipped.
+    :param bool=False directed: If True, a DiGraph is created, otherwise a Graph.
+    :param bool=False weighted: If True, the third column of an edge list is read as the 'weight' of the ties. The
+        ties of an adjacency matrix always get the entry of the matrix as weight.
+    :param cache_folder: A folder in which the arrays of edge lists are stored, see :func:`read_edge_list`.
+    :param bool=False return_labels: If True, the labels of the agents in the file are returned as well.
+    :returns: A NetworkX Graph or DiGraph, or a tuple with the graph and an array with the label of each agent if
+        return_labels is True. The agents of an adjacency matrix are labelled by their row.
     """
-    if isinstance(network_input, np.ndarray):
-        return nx.from_numpy_matrix(network_input)
+    if isinstance(network_input, (str, pathlib.Path)):
+        indptr, indices, weights, labels = read_edge_list(network_input, directed=directed, weighted=weighted,
+                                                          cache_folder=cache_folder)
     else:
-        with open(network_input, "rb") as edge_list:
-            return nx.read_edgelist(edge_list)
+        if hasattr(network_input, "tocoo"):  # a SciPy sparse matrix, which is detected without importing SciPy
+            matrix = network_input.tocoo()
+            sources, targets, weights = matrix.row, matrix.col, matrix.data
+        else:
+            matrix = np.asarray(network_input)
+            sources, targets = np.nonzero(matrix)
+            weights = matrix[sources, targets]
+        if matrix.shape[0] != matrix.shape[1]:
+            raise ValueError("An adjacency matrix must be square, got shape {}".format(matrix.shape))
+        labels = np.arange(matrix.shape[0])
+        indptr, indices, weights = _csr_from_edges(sources, targets, weights, matrix.shape[0], directed)
+    network = _graph_from_csr(indptr, indices, weights, directed)
+    return (network, labels) if return_labels else network
+
+
+def read_edge_list(path: str or pathlib.Path, directed: bool = False, weighted: bool = False,
+                   cache_folder: str or pathlib.Path = None) -> tuple:
+    """
+    Reads an edge list into a compressed sparse row (CSR) layout, in which the neighbors of agent i are
+    indices[indptr[i]:indptr[i + 1]]. The file is parsed with the C parser of pandas, the agents are relabelled to
+    0, 1, ... with NumPy, and ties that occur more than once are kept once.
+
+    If a cache folder is given, the arrays are stored there as .npy files, under a hash of the contents of the file and
+    the arguments. Later reads of the same file skip parsing and map the arrays into memory, so they are nearly
+    instant, also in other processes. A changed file gets a new hash and is parsed again.
+
+    :param path: The path to the edge list.
+    :param bool=False directed: If False, every tie is stored in both directions.
+    :param bool=False weighted: If True, the third column is read as the weight of the ties.
+    :param cache_folder: Path to a folder for the cached arrays. If None, the file is parsed on every call.
+    :returns: A tuple with the arrays indptr, indices, weights (None if not weighted) and labels, which holds the label
+        in the file of each agent.
+    """
+    cache_path = None
+    if cache_folder is not None:
+        key = "{}-{}-{}".format(_file_hash(path), "directed" if directed else "undirected",
+                                "weighted" if weighted else "unweighted")
+        cache_path = pathlib.Path(cache_folder) / key
+        if cache_path.exists():
+            arrays = {name: np.load(cache_path / "{}.npy".format(name), mmap_mode="r", allow_pickle=False)
+                      for name in ["indptr", "indices", "labels"]}
+            weights = np.load(cache_path / "weights.npy", mmap_mode="r", allow_pickle=False) if weighted else None
+            return arrays["indptr"], arrays["indices"], weights, arrays["labels"]
+
+    sources, targets, weights = _parse_edge_list(path, weighted)
+    labels, endpoints = np.unique(np.concatenate((sources, targets)), return_inverse=True)
+    if labels.dtype == object:
+        labels = labels.astype(str)  # string arrays can be mapped into memory, object arrays cannot
+    indptr, indices, weights = _csr_from_edges(endpoints[:len(sources)], endpoints[len(sources):], weights,
+                                               len(labels), directed)
+
+    if cache_path is not None:
+        arrays = {"indptr": indptr, "indices": indices, "labels": labels}
+        if weighted:
+            arrays["weights"] = weights
+        # the arrays are written to a temporary folder first, so other processes never see a partial cache
+        temporary_path = cache_path.with_name("{}.{}.tmp".format(cache_path.name, os.getpid()))
+        temporary_path.mkdir(parents=True, exist_ok=True)
+        for name, array in arrays.items():
+            np.save(temporary_path / "{}.npy".format(name), array, allow_pickle=False)
+        try:
+            temporary_path.rename(cache_path)
+        except OSError:  # another process stored the same file first
+            shutil.rmtree(temporary_path, ignore_errors=True)
+    return indptr, indices, weights, labels
+
+
+def _file_hash(path: str or pathlib.Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as network_file:
+        for block in iter(lambda: network_file.read(2 ** 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _parse_edge_list(path: str or pathlib.Path, weighted: bool) -> tuple:
+    """
+    :returns: Arrays with the labels of the sources and targets of the ties, and their weights (or None).
+    """
+    import pandas as pd  # imported here, so importing defSim does not import pandas
+
+    columns = [0, 1, 2] if weighted else [0, 1]
+    try:
+        edges = pd.read_csv(path, sep=r"\s+", header=None, comment="#", usecols=columns, engine="c")
+    except pd.errors.EmptyDataError:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0) if weighted else None
+    sources, targets = edges[0].to_numpy(), edges[1].to_numpy()
+    if sources.dtype.kind not in "iu" or targets.dtype.kind not in "iu":
+        # labels that are not all integers are compared as text, as nx.read_edgelist does
+        sources, targets = edges[0].astype(str).to_numpy(dtype=object), edges[1].astype(str).to_numpy(dtype=object)
+    weights = edges[2].to_numpy(dtype=float) if weighted else None
+    return sources, targets, weights
+
+
+def _csr_from_edges(sources: np.ndarray, targets: np.ndarray, weights: np.ndarray or None, num_nodes: int,
+                    directed: bool) -> tuple:
+    """
+    Creates the CSR arrays of a network from the positions of the agents at both ends of every tie. The ties of an
+    undirected network are stored in both directions. Of a tie that is listed more than once, the first is kept.
+
+    :returns: A tuple with the arrays indptr, indices and weights (None if weights is None).
+    """
+    sources = np.asarray(sources, dtype=np.int64)
+    targets = np.asarray(targets, dtype=np.int64)
+    if not directed:
+        sources, targets = np.concatenate((sources, targets)), np.concatenate((targets, sources))
+        if weights is not None:
+            weights = np.concatenate((weights, weights))
+    keys, first = np.unique(sources * num_nodes + targets, return_index=True)
+    rows, indices = np.divmod(keys, max(num_nodes, 1))
+    indptr = np.zeros(num_nodes + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=num_nodes), out=indptr[1:])
+    return indptr, indices, None if weights is None else np.asarray(weights, dtype=float)[first]
+
+
+def _graph_from_csr(indptr: np.ndarray, indices: np.ndarray, weights: np.ndarray or None, directed: bool) -> nx.Graph:
+    """
+    Creates a graph from CSR arrays with agents 0, 1, ... The adjacency dictionaries are filled in directly, which is
+    considerably faster than adding the ties one by one. Both directions of a tie share one attribute dictionary, as
+    in every NetworkX graph.
+    """
+    # the garbage collector is paused, as it would otherwise scan the growing graph many times while it is built
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        return _build_graph(indptr, indices, weights, directed)
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+
+def _build_graph(indptr: np.ndarray, indices: np.ndarray, weights: np.ndarray or None, directed: bool) -> nx.Graph:
+    num_nodes = len(indptr) - 1
+    indptr, indices = np.asarray(indptr, dtype=np.int64), np.asarray(indices, dtype=np.int64)
+    rows = np.repeat(np.arange(num_nodes), np.diff(indptr))
+    # the entries ordered by column, at position k the reverse (j, i) of the entry (i, j) at position k
+    by_column = np.lexsort((rows, indices))
+    # in an undirected network, the entries (i, j) and (j, i) share the attribute dictionary of the first
+    owners = np.arange(len(indices)) if directed else np.minimum(np.arange(len(indices)), by_column)
+    created = np.flatnonzero(owners == np.arange(len(indices)))
+    data = np.empty(len(indices), dtype=object)
+    if weights is None:
+        data[created] = [{} for _ in range(len(created))]
+    else:
+        data[created] = [{"weight": weight} for weight in np.asarray(weights)[created].tolist()]
+    data = data[owners]
+
+    graph = nx.DiGraph() if directed else nx.Graph()
+    graph._node = {agent: {} for agent in range(num_nodes)}
+    successors = _adjacency_from_csr(indptr, indices, data)
+    if directed:
+        column_indptr = np.zeros(num_nodes + 1, dtype=np.int64)
+        np.cumsum(np.bincount(indices, minlength=num_nodes), out=column_indptr[1:])
+        graph._succ = graph._adj = successors
+        graph._pred = _adjacency_from_csr(column_indptr, rows[by_column], data[by_column])
+    else:
+        graph._adj = successors
+    return graph
+
+
+def _adjacency_from_csr(indptr: np.ndarray, indices: np.ndarray, data: np.ndarray) -> dict:
+    indptr, indices, data = indptr.tolist(), indices.tolist(), data.tolist()
+    return {agent: dict(zip(indices[indptr[agent]:indptr[agent + 1]], data[indptr[agent]:indptr[agent + 1]]))
+            for agent in range(len(indptr) - 1)}
 
 
 def _produce_grid_network(**kwargs) -> nx.Graph:
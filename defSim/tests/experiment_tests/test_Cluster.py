@@ -1,6 +1,15 @@
+from unittest import TestCase, skipIf
+import shutil
 from defSim.Experiment import Experiment
 
-experiment = Experiment(stop_condition="strict_convergence",
-                        repetitions=2,
-                        attribute_parameters={"num_traits": [i for i in range(5,10)]})
-experiment.run_on_cluster()
\ No newline at end of file
+
+@skipIf(shutil.which("sbatch") is None, "run_on_cluster needs a SLURM cluster")
+class TestCluster(TestCase):
+
+    def test_run_on_cluster(self):
+        experiment = Experiment(stop_condition="strict_convergence",
+                                repetitions=2,
+                                attribute_parameters={"num_traits": [i for i in range(5, 10)]})
+        # waits until the job array has finished, and returns the merged results
+        results = experiment.run_on_cluster()
+        self.assertEqual(len(results), 10)
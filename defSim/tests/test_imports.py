@@ -0,0 +1,54 @@
+from unittest import TestCase
+import json
+import statistics
+import subprocess
+import sys
+import pathlib
+
+_heavy_packages = ["pandas", "scipy", "matplotlib", "seaborn", "tqdm"]
+_package_root = str(pathlib.Path(__file__).resolve().parents[2])
+
+
+def measure_import(statement: str, repeats: int = 5) -> dict:
+    """
+    Runs an import statement in fresh interpreters, as a worker process would.
+
+    :returns: A dictionary with the median import time in seconds and the heavy packages that were imported.
+    """
+    script = ("import sys, time, json\n"
+              "start = time.perf_counter()\n"
+              "{}\n"
+              "seconds = time.perf_counter() - start\n"
+              "packages = sorted({{name.split('.')[0] for name in sys.modules}} & set({!r}))\n"
+              "print(json.dumps({{'seconds': seconds, 'packages': packages}}))").format(statement, _heavy_packages)
+    runs = [json.loads(subprocess.check_output([sys.executable, "-c", script], cwd=_package_root,
+                                               stderr=subprocess.DEVNULL).decode().splitlines()[-1])
+            for _ in range(repeats)]
+    return {'seconds': statistics.median(run['seconds'] for run in runs), 'packages': runs[0]['packages']}
+
+
+class TestImports(TestCase):
+
+    def test_core(self):
+        self.assertEqual(measure_import("import defSim.core", repeats=1)['packages'], [])
+
+    def test_lazy_package(self):
+        self.assertEqual(measure_import("import defSim", repeats=1)['packages'], [])
+        self.assertIn("matplotlib", measure_import("import defSim; defSim.NetworkPlot", repeats=1)['packages'])
+
+    def test_lazy_attributes(self):
+        import defSim
+        from defSim.Experiment import Experiment
+        self.assertIs(defSim.Experiment, Experiment)
+        self.assertIs(defSim.tools.Plots.NetworkPlot, defSim.NetworkPlot)
+        self.assertIn("Experiment", dir(defSim))
+        with self.assertRaises(AttributeError):
+            defSim.NotAnAttribute
+
+
+if __name__ == '__main__':
+    # import-time benchmark: python defSim/tests/test_imports.py
+    for statement in ["import numpy, networkx", "import defSim.core", "import defSim",
+                      "from defSim import Experiment", "from defSim import NetworkPlot"]:
+        result = measure_import(statement)
+        print("{:<35} {:6.3f} s  {}".format(statement, result['seconds'], ", ".join(result['packages'])))
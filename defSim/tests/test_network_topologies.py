@@ -1,4 +1,8 @@
 from unittest import TestCase
+import tempfile
+import pathlib
+import numpy as np
+import scipy.sparse
 from defSim.network_init import network_init
 import networkx as nx
 
@@ -19,3 +23,45 @@ class TestGenerate_network(TestCase):
 
 
 
+
+
+class TestRead_network(TestCase):
+    def test_adjacency_matrix(self):
+        graph = nx.gnm_random_graph(30, 60, seed=1)
+        matrix = nx.to_numpy_array(graph)
+        for network_input in [matrix, scipy.sparse.csr_matrix(matrix)]:
+            network = network_init.read_network(network_input)
+            self.assertEqual(type(network), nx.Graph)
+            self.assertEqual(set(map(frozenset, network.edges())), set(map(frozenset, graph.edges())))
+            agent, neighbor = next(iter(network.edges()))
+            self.assertIs(network[agent][neighbor], network[neighbor][agent])
+            self.assertEqual(network[agent][neighbor], {'weight': 1.0})
+
+        network = network_init.read_network(matrix, directed=True)
+        self.assertEqual(network.number_of_edges(), 120)
+        self.assertIs(network.pred[neighbor][agent], network.succ[agent][neighbor])
+
+    def test_edge_list(self):
+        with tempfile.TemporaryDirectory() as folder:
+            path = pathlib.Path(folder) / 'edges.txt'
+            path.write_text("# a comment\nb c 2\na b 1\nc a 0.5\nb a 1\n")
+            network, labels = network_init.read_network(path, return_labels=True)
+            self.assertEqual(labels.tolist(), ['a', 'b', 'c'])
+            self.assertEqual(sorted(network.edges()), [(0, 1), (0, 2), (1, 2)])
+
+            cache_folder = pathlib.Path(folder) / 'cache'
+            network = network_init.read_network(path, weighted=True, cache_folder=cache_folder)
+            self.assertEqual(network[1][2], {'weight': 2.0})
+            self.assertEqual(len(list(cache_folder.iterdir())), 1)
+            # the second read maps the stored arrays into memory
+            indptr, indices, weights, labels = network_init.read_edge_list(path, weighted=True,
+                                                                           cache_folder=cache_folder)
+            self.assertIsInstance(indices, np.memmap)
+            self.assertEqual(indptr.tolist(), [0, 2, 4, 6])
+            self.assertEqual(indices.tolist(), [1, 2, 0, 2, 0, 1])
+            self.assertEqual(weights.tolist(), [1, 0.5, 1, 2, 0.5, 2])
+
+            path.write_text("1 2\n2 3\n")
+            network = network_init.read_network(path, directed=True, cache_folder=cache_folder)
+            self.assertEqual(sorted(network.edges()), [(0, 1), (1, 2)])
+            self.assertEqual(len(list(cache_folder.iterdir())), 2)
@@ -0,0 +1,58 @@
+from unittest import TestCase
+import tempfile
+import pathlib
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import numpy as np
+from defSim.Simulation import Simulation
+from defSim.tools.Animation import simulation_frames, event_log_frames, NetworkAnimation, DynamicsAnimation
+
+
+class TestAnimation(TestCase):
+
+    def setUp(self):
+        self.simulation = Simulation(topology='grid',
+                                     attributes_initializer='random_continuous',
+                                     influence_function='weighted_linear',
+                                     dissimilarity_measure='euclidean',
+                                     parameter_dict={'num_features': 1, 'convergence_rate': 0.5, 'homophily': 0},
+                                     max_iterations=200,
+                                     seed=3,
+                                     event_log=['f01'])
+
+    def tearDown(self):
+        plt.close('all')
+
+    def test_frames(self):
+        frames = list(simulation_frames(self.simulation, 'f01', every=50))
+        self.assertEqual([tick for tick, _ in frames], [0, 50, 100, 150, 200])
+        results = self.simulation.run(show_progress=False)
+        event_log = results['EventLog'][0]
+        replayed = list(event_log_frames(event_log, 'f01', every=50, network=self.simulation.network))
+        self.assertEqual([tick for tick, _ in replayed], [0, 50, 100, 150, 200])
+        # the replay of a run with the same seed gives the same frames
+        for (tick, values), (_, replayed_values) in zip(frames, replayed):
+            np.testing.assert_allclose(values, replayed_values)
+
+    def test_network_animation(self):
+        with tempfile.TemporaryDirectory() as folder:
+            self.simulation.initialize()
+            animation = NetworkAnimation(self.simulation.network, layout='grid')
+            written = animation.save(simulation_frames(self.simulation, 'f01', every=100), folder, dpi=20)
+            self.assertEqual(written, 3)
+            self.assertEqual(sorted(path.name for path in pathlib.Path(folder).iterdir()),
+                             ['frame_000000.png', 'frame_000001.png', 'frame_000002.png'])
+            np.testing.assert_allclose(animation.nodes.get_array(),
+                                       [self.simulation.network.nodes[agent]['f01']
+                                        for agent in self.simulation.network])
+            self.assertEqual(animation.ax.get_title(), 'Tick 200')
+
+    def test_dynamics_animation(self):
+        animation = DynamicsAnimation(num_agents=49, window=3)
+        for tick, values in simulation_frames(self.simulation, 'f01', every=20, ticks=100):
+            animation.update(tick, values)
+        segments = animation.lines.get_segments()
+        self.assertEqual(len(segments), 49)
+        self.assertEqual(segments[0][:, 0].tolist(), [60, 80, 100])
+        self.assertEqual(animation.ax.get_xlim(), (60, 100))
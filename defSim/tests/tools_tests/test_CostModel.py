@@ -0,0 +1,82 @@
+from unittest import TestCase
+import pathlib
+import tempfile
+import numpy as np
+from defSim.Experiment import Experiment
+from defSim.tools.CostModel import CostModel, RuntimeEstimate, RuntimeLog, RuntimeModel
+
+
+class TestCostModel(TestCase):
+
+    def test_fit(self):
+        parameter_dicts = [{'num_agents': num_agents, 'regime': regime, 'seed': 1}
+                           for num_agents in [10, 20, 40, 80] for regime in ['one-to-one', 'one-to-many']]
+        seconds = [.001 * parameter_dict['num_agents'] ** 2 * (3 if parameter_dict['regime'] == 'one-to-many' else 1)
+                   for parameter_dict in parameter_dicts]
+        model = CostModel().fit(parameter_dicts, seconds)
+        predictions = model.predict([{'num_agents': 160, 'regime': 'one-to-one'},
+                                     {'num_agents': 160, 'regime': 'one-to-many'}])
+        np.testing.assert_allclose(predictions, [25.6, 76.8], rtol=.05)
+
+        # zero and one are different values of a parameter
+        model = CostModel().fit([{'homophily': 0}, {'homophily': 1}] * 2, [1, 2] * 2)
+        np.testing.assert_allclose(model.predict([{'homophily': 0}, {'homophily': 1}]), [1, 2], rtol=.01)
+
+    def test_runtime_log(self):
+        with tempfile.TemporaryDirectory() as folder:
+            log = RuntimeLog(pathlib.Path(folder) / 'runtimes.jsonl')
+            log.record({'num_agents': 10, 'network': object()}, .5)
+            log.record({'num_agents': np.int64(20)}, 1.5)
+            self.assertEqual(log.read(), ([{'num_agents': 10}, {'num_agents': 20}], [.5, 1.5]))
+
+    def test_longest_first(self):
+        with tempfile.TemporaryDirectory() as folder:
+            settings = dict(topology='ring',
+                            network_parameters={'num_agents': [10, 40, 20]},
+                            influence_parameters={'homophily': 1},
+                            max_iterations=100,
+                            output_realizations=['Regions'],
+                            seed=4,
+                            runtime_log=pathlib.Path(folder) / 'runtimes.jsonl')
+            expected = Experiment(**settings).run(show_progress=False)
+            self.assertEqual(len(RuntimeLog(settings['runtime_log']).read()[1]), 3)
+
+            experiment = Experiment(scheduling='longest_first', **settings)
+            experiment.estimate_runtime()
+            self.assertEqual(len(experiment.runtime_samples), 3)
+            experiment.cost_model = None
+            results = experiment.run(parallel=True, num_cores=2, show_progress=False)
+            self.assertIsNotNone(experiment.cost_model)
+            # results keep the order of the parameter_dict_list
+            self.assertEqual(results[['num_agents', 'Regions']].values.tolist(),
+                             expected[['num_agents', 'Regions']].values.tolist())
+
+    def test_runtime_model(self):
+        parameter_dicts = [{'num_agents': num_agents} for num_agents in [10, 20, 40, 80]]
+        pilots = [{'setup_seconds': .01, 'step_seconds': 1e-4 * num_agents, 'steps': 10 * num_agents,
+                   'censored': False, 'max_iterations': 10000} for num_agents in [10, 20, 40, 80]]
+        pilots[-1].update(steps=400, censored=True)
+        estimate = RuntimeModel().fit(parameter_dicts, pilots).estimate(parameter_dicts, num_cores=2)
+        self.assertIsInstance(estimate, RuntimeEstimate)
+        self.assertLess(estimate.lower, estimate)
+        self.assertLess(estimate, estimate.upper)
+        # the longest simulation takes longer than half of the total runtime
+        self.assertAlmostEqual(estimate, estimate.predictions.max())
+        self.assertAlmostEqual(estimate.cpu_seconds, estimate.predictions.sum())
+
+    def test_estimate_runtime(self):
+        experiment = Experiment(topology='grid',
+                                network_parameters={'num_agents': [16, 36]},
+                                influence_parameters={'homophily': 1},
+                                stop_condition='pragmatic_convergence',
+                                max_iterations=20000,
+                                output_realizations=['Regions'],
+                                repetitions=2,
+                                seed=1)
+        estimate = experiment.estimate_runtime(sample_runs=4, time_budget=30)
+        self.assertEqual(len(estimate.predictions), 4)
+        self.assertLessEqual(estimate.lower, estimate)
+        self.assertLessEqual(estimate, estimate.upper)
+        self.assertEqual(len(experiment.runtime_samples), 4)
+        self.assertGreater(experiment.runtime_model.steps_model.predict([experiment._cost_parameters(
+            {'num_agents': 36, 'homophily': 1})])[0], 100)
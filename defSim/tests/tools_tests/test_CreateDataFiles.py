@@ -1,6 +1,8 @@
-from defSim.tools.CreateDataFiles import create_data_files
+from defSim.tools.CreateDataFiles import create_data_files, ResultStream
 from defSim import Simulation, Experiment
 import pandas as pd
+import pathlib
+import tempfile
 from unittest import TestCase
 
 
@@ -73,3 +75,39 @@ class TestCreateDataFilesWithExperimentData(TestCase):
                                 tickwise=['f01'],
                                 attribute_parameters={'num_features': [1, 2]})
         experiment.run()
+
+
+class TestResultStream(TestCase):
+
+    def test_append(self):
+        with tempfile.TemporaryDirectory() as folder:
+            stream = ResultStream(output_folder_path=folder, output_file_name='streamed.csv', buffer_size=2)
+            for value in range(5):
+                stream.append(pd.DataFrame({'value': [value], 'Tickwise_f01': [[[value, value]]]}))
+            # full buffers are written right away, the last row is still in memory
+            self.assertEqual(len(pd.read_csv(stream.output_path, index_col=0)), 4)
+            output = stream.read()
+            self.assertEqual(output['value'].tolist(), list(range(5)))
+            self.assertNotIn('Tickwise_f01', output.columns)
+            tickwise = pd.read_csv(pathlib.Path(folder) / 'outputfile_Tickwise_f01_4.csv', index_col=0)
+            self.assertEqual(tickwise.values.tolist(), [[4, 4]])
+            self.assertEqual(pd.read_csv(stream.output_path).columns.tolist(), ['Unnamed: 0', 'value'])
+
+            with self.assertRaises(ValueError):
+                ResultStream(output_folder_path=folder, output_file_name='streamed.pickle')
+
+    def test_streaming_experiment(self):
+        with tempfile.TemporaryDirectory() as folder:
+            settings = dict(topology='grid',
+                            attribute_parameters={'num_features': 3, 'num_traits': 3},
+                            influence_parameters={'homophily': 1},
+                            max_iterations=100,
+                            output_realizations=['Regions'],
+                            output_folder_path=folder,
+                            repetitions=6,
+                            seed=2)
+            serial = Experiment(**settings).run(show_progress=False, streaming=True, buffer_size=4)
+            parallel = Experiment(**settings).run(parallel=True, num_cores=2, show_progress=False, streaming=True)
+            self.assertEqual(len(serial), 6)
+            self.assertEqual(serial.sort_values('seed')[['seed', 'Regions']].values.tolist(),
+                             parallel.sort_values('seed')[['seed', 'Regions']].values.tolist())
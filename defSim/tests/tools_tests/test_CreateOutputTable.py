@@ -0,0 +1,56 @@
+from unittest import TestCase
+import networkx as nx
+import defSim as ds
+from defSim.tools.CreateOutputTable import create_output_table
+
+
+class TestCreateOutputTable(TestCase):
+
+    def setUp(self):
+        self.network = ds.generate_network('complete_graph', n=4)
+        ds.agents_init.initialize_attributes(self.network, 'random_categorical', num_features=3, num_traits=2)
+        self.network.nodes[0].update(dict(zip(['f01', 'f02', 'f03'], (1, 1, 1))))
+        self.network.nodes[1].update(dict(zip(['f01', 'f02', 'f03'], (1, 1, 1))))
+        self.network.nodes[2].update(dict(zip(['f01', 'f02', 'f03'], (1, 0, 0))))
+        self.network.nodes[3].update(dict(zip(['f01', 'f02', 'f03'], (0, 0, 0))))
+        ds.dissimilarity_calculator.select_calculator('hamming').calculate_dissimilarity_networkwide(self.network)
+
+    def test_basic_output(self):
+        output = create_output_table(self.network, realizations=['Basic', 'RegionsList', 'ZonesList'])
+        self.assertEqual(output['Regions'], 3)
+        self.assertEqual(output['RegionsList'], [2, 1, 1])
+        self.assertEqual(output['ZonesList'], [4])
+        self.assertEqual(output['Homogeneity'], 0.5)
+
+    def test_agent_subset(self):
+        output = create_output_table(self.network, realizations=['RegionsList', 'Graph'], agents=[0, 1, 3])
+        self.assertEqual(output['RegionsList'], [2, 1])
+        self.assertEqual(output['Graph'].number_of_nodes(), 3)
+        # the network itself is left untouched
+        self.assertEqual(self.network.number_of_nodes(), 4)
+        self.assertEqual(self.network.number_of_edges(), 6)
+
+    def test_read_only(self):
+        class RemovingReporter(ds.tools.CreateOutputTable.OutputTableCreator):
+            label = "Removing"
+
+            def create_output(self, network, **kwargs):
+                network.remove_node(0)
+
+        with self.assertRaises(nx.NetworkXError):
+            create_output_table(self.network, realizations=[RemovingReporter()])
+        self.assertEqual(self.network.number_of_nodes(), 4)
+
+    def test_shared_context(self):
+        context = ds.OutputMeasures.OutputContext(self.network)
+        context.prepare([ds.OutputMeasures.SpreadReporter('f01'), ds.OutputMeasures.ClusterFinder()])
+        self.assertEqual(list(context.feature_values('f01')), [1, 1, 1, 0])
+        self.assertEqual(context.cluster_sizes(), [2, 1, 1])
+        self.assertIs(context.edge_distances(), context.edge_distances())
+
+        output = create_output_table(self.network, realizations=['Basic', 'Spread', 'Dispersion', 'Coverage'])
+        self.assertEqual(output['Spreadf01'], 1)
+        self.assertEqual(output['AverageOpinionf01'], 0.75)
+        self.assertAlmostEqual(output['Dispersionf01'], 0.75)
+        self.assertAlmostEqual(output['AverageDistance'], 11 / 18)
+        self.assertEqual(output['Zones'], 1)
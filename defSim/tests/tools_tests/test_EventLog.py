@@ -0,0 +1,62 @@
+from unittest import TestCase
+import pickle
+import tempfile
+import pathlib
+import numpy as np
+from defSim.Simulation import Simulation
+from defSim.Experiment import Experiment
+from defSim.tools.EventLog import EventLog
+
+
+class TestEventLog(TestCase):
+
+    def run_simulation(self, event_log, **settings):
+        simulation = Simulation(topology='ring',
+                                max_iterations=400,
+                                parameter_dict={'num_agents': 20, 'num_features': 2, 'num_traits': 3},
+                                tickwise=['f01', 'f02'],
+                                event_log=event_log,
+                                seed=12345,
+                                **settings)
+        return simulation.run(show_progress=False)
+
+    def assert_same_states(self, results):
+        event_log = results['EventLog'][0]
+        # the tickwise row of a step holds the state after it (continuous features with float32 precision)
+        tickwise = np.stack([results['Tickwise_f01'][0], results['Tickwise_f02'][0]], axis=2)
+        self.assertEqual(event_log.last_tick, len(tickwise))
+        for tick in [1, 7, 150, 399, 400]:
+            self.assertTrue(np.array_equal(event_log.state_at(tick).astype(tickwise.dtype), tickwise[tick - 1]))
+        for tick, state in event_log.iter_states(1, step=3):
+            self.assertTrue(np.array_equal(state.astype(tickwise.dtype), tickwise[tick - 1]))
+        return event_log
+
+    def test_categorical(self):
+        event_log = self.assert_same_states(self.run_simulation(EventLog(['f01', 'f02'], keyframe_interval=5)))
+        self.assertGreater(len(event_log.keyframes), 2)
+        self.assertEqual(event_log.num_events, len(event_log.events()))
+        ticks, values = event_log.trajectory('f01', event_log.agents[0])
+        self.assertEqual(ticks[0], 0)
+        self.assertEqual(len(ticks), len(values))
+
+    def test_continuous(self):
+        results = self.run_simulation(['f01', 'f02'], attributes_initializer='random_continuous',
+                                      influence_function='weighted_linear', dissimilarity_measure='euclidean')
+        event_log = self.assert_same_states(results)
+        # a copy and a saved log give the same states
+        with tempfile.TemporaryDirectory() as folder:
+            path = pathlib.Path(folder) / 'events.npz'
+            event_log.save(path)
+            for other in [pickle.loads(pickle.dumps(event_log)), EventLog.load(path)]:
+                self.assertTrue(np.array_equal(other.state_at(123), event_log.state_at(123)))
+                self.assertEqual(other.num_events, event_log.num_events)
+
+    def test_experiment(self):
+        results = Experiment(topology='ring',
+                             network_parameters={'num_agents': 20},
+                             max_iterations=100,
+                             repetitions=2,
+                             event_log=['f01'],
+                             seed=1).run(show_progress=False)
+        self.assertIsNot(results['EventLog'][0], results['EventLog'][1])
+        self.assertEqual(results['EventLog'][0].last_tick, 100)
@@ -0,0 +1,94 @@
+from unittest import TestCase
+import functools
+import pathlib
+import tempfile
+import numpy as np
+import defSim as ds
+from defSim.Experiment import Experiment
+from defSim.tools.ExperimentStore import ExperimentStore, stable_repr
+
+
+class CountingExperiment(Experiment):
+    simulations_run = 0
+
+    def _create_and_run_simulation(self, parameter_dict, network=None):
+        CountingExperiment.simulations_run += 1
+        return super()._create_and_run_simulation(parameter_dict, network=network)
+
+
+class TestExperimentStore(TestCase):
+
+    def test_stable_repr(self):
+        self.assertEqual(stable_repr({'b': [1, 2], 'a': np.int64(3)}), stable_repr({'a': 3, 'b': [1, 2]}))
+        self.assertEqual(stable_repr(ds.HammingDistance()), stable_repr(ds.HammingDistance()))
+        self.assertNotEqual(stable_repr(ds.generate_network('ring', num_agents=5)),
+                            stable_repr(ds.generate_network('ring', num_agents=6)))
+
+    def test_stable_repr_functions(self):
+        self.assertEqual(stable_repr(np.mean), "numpy.mean")
+        self.assertNotEqual(stable_repr(np.mean), stable_repr(np.median))
+        self.assertNotEqual(stable_repr(max), stable_repr(min))
+        self.assertNotEqual(stable_repr(functools.partial(np.mean, axis=0)),
+                            stable_repr(functools.partial(np.mean, axis=1)))
+        self.assertNotEqual(stable_repr(ds.HammingDistance().calculate_dissimilarity),
+                            stable_repr(ds.EuclideanDistance().calculate_dissimilarity))
+
+        def local_function():
+            pass
+
+        for function in [lambda: 0, local_function]:
+            with self.assertRaises(ValueError):
+                stable_repr({'key': function})
+
+    def test_resume_and_extend(self):
+        with tempfile.TemporaryDirectory() as folder:
+            store_path = pathlib.Path(folder) / 'store.sqlite'
+            settings = dict(topology='grid',
+                            influence_parameters={'homophily': 1},
+                            max_iterations=50,
+                            output_realizations=['Regions'],
+                            repetitions=2,
+                            seed=3,
+                            store=store_path,
+                            output_folder_path=folder)
+
+            CountingExperiment.simulations_run = 0
+            first = CountingExperiment(attribute_parameters={'num_features': [2, 3]}, **settings).run(
+                show_progress=False)
+            self.assertEqual(CountingExperiment.simulations_run, 4)
+            with ExperimentStore(store_path) as store:
+                self.assertEqual(len(store), 4)
+
+            # nothing is run again, and the stored results are returned
+            CountingExperiment.simulations_run = 0
+            resumed = CountingExperiment(attribute_parameters={'num_features': [2, 3]}, **settings).run(
+                show_progress=False)
+            self.assertEqual(CountingExperiment.simulations_run, 0)
+            self.assertEqual(resumed[['seed', 'Regions']].values.tolist(), first[['seed', 'Regions']].values.tolist())
+
+            # only the new parameter value is run when the sweep is extended
+            extended = CountingExperiment(attribute_parameters={'num_features': [2, 3, 4]}, **settings).run(
+                show_progress=False, streaming=True)
+            self.assertEqual(CountingExperiment.simulations_run, 2)
+            self.assertEqual(len(extended), 6)
+            self.assertEqual(sorted(extended['num_features'].tolist()), [2, 2, 3, 3, 4, 4])
+
+    def test_rerun_same_experiment(self):
+        # the random generators that simulations add to the parameter dictionaries are not part of the keys
+        with tempfile.TemporaryDirectory() as folder:
+            store_path = pathlib.Path(folder) / 'store.sqlite'
+            experiment = CountingExperiment(topology='grid',
+                                            attribute_parameters={'num_features': [2, 3]},
+                                            max_iterations=50,
+                                            output_realizations=['Regions'],
+                                            repetitions=2,
+                                            seed=3,
+                                            store=store_path,
+                                            output_folder_path=folder)
+            CountingExperiment.simulations_run = 0
+            first = experiment.run(show_progress=False)
+            second = experiment.run(show_progress=False)
+            self.assertEqual(CountingExperiment.simulations_run, 4)
+            self.assertEqual(second['Regions'].tolist(), first['Regions'].tolist())
+            with ExperimentStore(store_path) as store:
+                self.assertEqual(len(store), 4)
@@ -0,0 +1,54 @@
+from unittest import TestCase
+import tempfile
+import defSim as ds
+from defSim.Experiment import Experiment
+from defSim.Simulation import Simulation
+from defSim.tools.InitialStateCache import InitialStateCache
+
+
+class TestInitialStateCache(TestCase):
+
+    def create_simulation(self, cache=None):
+        return Simulation(topology='ring',
+                          attributes_initializer='random_continuous',
+                          influence_function='weighted_linear',
+                          dissimilarity_measure='euclidean',
+                          max_iterations=200,
+                          parameter_dict={'num_agents': 20, 'num_features': 2},
+                          output_realizations=['AverageDistance', 'Dispersion'],
+                          seed=12345,
+                          initial_state_cache=cache)
+
+    def test_same_results(self):
+        expected = self.create_simulation().run(show_progress=False)
+        with tempfile.TemporaryDirectory() as folder:
+            cache = InitialStateCache(folder_path=folder)
+            first = self.create_simulation(cache).run(show_progress=False)
+            second = self.create_simulation(cache).run(show_progress=False)
+            # a new cache that shares the folder finds the stored state
+            third = self.create_simulation(InitialStateCache(folder_path=folder)).run(show_progress=False)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        for results in [first, second, third]:
+            self.assertEqual(results['AverageDistance'][0], expected['AverageDistance'][0])
+            self.assertEqual(results['Dispersionf01'][0], expected['Dispersionf01'][0])
+
+    def test_common_random_numbers(self):
+        experiment = Experiment(topology='ring',
+                                network_parameters={'num_agents': 20},
+                                attributes_initializer='random_continuous',
+                                attribute_parameters={'num_features': 1},
+                                influence_function='bounded_confidence',
+                                influence_parameters={'confidence_level': [.1, .2, .3], 'convergence_rate': .5},
+                                dissimilarity_measure='euclidean',
+                                max_iterations=100,
+                                output_realizations=['AverageOpinion'],
+                                repetitions=2,
+                                seed=1,
+                                initial_state_cache=True,
+                                common_random_numbers=True)
+        results = experiment.run(show_progress=False)
+        # each confidence level is run with the same two seeds, and starts from the same two initial states
+        self.assertEqual(len(set(results['seed'])), 2)
+        self.assertEqual(sorted(results.groupby('confidence_level')['seed'].apply(sorted).tolist()),
+                         [sorted(set(results['seed']))] * 3)
+        self.assertEqual((experiment.initial_state_cache.hits, experiment.initial_state_cache.misses), (4, 2))
@@ -0,0 +1,49 @@
+from unittest import TestCase
+from defSim.Simulation import Simulation
+
+
+class TestInstrumentation(TestCase):
+
+    def create_simulation(self):
+        return Simulation(topology='ring',
+                          attributes_initializer='random_continuous',
+                          influence_function='weighted_linear',
+                          dissimilarity_measure='euclidean',
+                          stop_condition='pragmatic_convergence',
+                          max_iterations=500,
+                          parameter_dict={'num_agents': 20, 'num_features': 2, 'step_size': 50},
+                          tickwise=['f01'],
+                          seed=12345)
+
+    def test_same_results(self):
+        expected = self.create_simulation().run(show_progress=False)
+        simulation = self.create_simulation()
+        results = simulation.run(show_progress=False, instrument=True)
+        self.assertEqual(results['Ticks'][0], expected['Ticks'][0])
+        self.assertEqual(results['SuccessfulInfluence'][0], expected['SuccessfulInfluence'][0])
+        self.assertTrue((results['Tickwise_f01'][0] == expected['Tickwise_f01'][0]).all())
+        # the components of the simulation are restored after the run
+        self.assertEqual(simulation.focal_agent_selector, 'random')
+        self.assertEqual(simulation.neighbor_selector, 'random')
+        self.assertEqual(simulation.influence_function, 'weighted_linear')
+        self.assertNotIn('_record_tickwise', vars(simulation))
+
+    def test_measurements(self):
+        simulation = self.create_simulation()
+        results = simulation.run(show_progress=False, instrument=True)
+        instrumentation = simulation.instrumentation
+        self.assertEqual(instrumentation.steps, results['Ticks'][0])
+        self.assertEqual(instrumentation.influence_attempts, results['Ticks'][0])
+        self.assertEqual(results['InfluenceSuccesses'][0], results['SuccessfulInfluence'][0])
+        self.assertEqual(results['ConvergenceChecks'][0], results['Ticks'][0] // 50)
+        self.assertEqual(results['MeanSelectedNeighbors'][0], 1)
+        self.assertGreater(results['DistanceUpdates'][0], 0)
+        for phase in ['FocalAgent', 'NeighborSelection', 'Influence', 'Dissimilarity', 'Tickwise', 'Convergence']:
+            self.assertGreater(results[phase + 'Seconds'][0], 0)
+        self.assertGreater(results['RunSeconds'][0], results['InfluenceSeconds'][0])
+        self.assertIn("convergence checks", instrumentation.summary())
+
+        # runs that are not instrumented have no extra columns
+        results = simulation.run(show_progress=False)
+        self.assertIsNone(simulation.instrumentation)
+        self.assertNotIn('InfluenceSeconds', results.columns)
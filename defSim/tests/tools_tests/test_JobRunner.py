@@ -0,0 +1,94 @@
+from unittest import TestCase
+import tempfile
+import pathlib
+from defSim.Experiment import Experiment
+from defSim.tools.JobRunner import JobRunner, LocalLauncher, SlurmLauncher
+
+
+class FlakyLauncher(LocalLauncher):
+    """
+    Leaves out the first chunk the first time, as if it failed.
+    """
+
+    def __init__(self):
+        super().__init__(num_workers=2)
+        self.launched = []
+
+    def launch(self, runner, chunks):
+        self.launched.append(list(chunks))
+        super().launch(runner, chunks[1:] if len(self.launched) == 1 else chunks)
+
+
+class TestJobRunner(TestCase):
+
+    def setUp(self):
+        self.experiment_settings = dict(topology='ring',
+                                        network_parameters={'num_agents': [10, 20]},
+                                        influence_parameters={'homophily': 1},
+                                        max_iterations=200,
+                                        output_realizations=['Regions'],
+                                        repetitions=3,
+                                        seed=7)
+
+    def test_local_run(self):
+        expected = Experiment(**self.experiment_settings).run(show_progress=False)
+        with tempfile.TemporaryDirectory() as folder:
+            launcher = FlakyLauncher()
+            results = Experiment(**self.experiment_settings).run_jobs(folder=folder, launcher=launcher, chunk_size=4)
+            self.assertEqual(launcher.launched, [[0, 1], [0]])
+            self.assertEqual(results[['num_agents', 'seed', 'Regions']].values.tolist(),
+                             expected[['num_agents', 'seed', 'Regions']].values.tolist())
+
+            # a second run of the same experiment uses the stored results
+            launcher = FlakyLauncher()
+            Experiment(**self.experiment_settings).run_jobs(folder=folder, launcher=launcher, chunk_size=4)
+            self.assertEqual(launcher.launched, [])
+
+    def test_resume_unseeded(self):
+        # without seed, the simulations of an experiment are in another order every time it is created
+        settings = dict(self.experiment_settings, seed=None)
+        with tempfile.TemporaryDirectory() as folder:
+            with self.assertRaises(RuntimeError):
+                Experiment(**settings).run_jobs(folder=folder, launcher=FlakyLauncher(), chunk_size=4, max_retries=0)
+            finished = (pathlib.Path(folder) / "results" / "chunk_1.pickle").read_bytes()
+
+            launcher = FlakyLauncher()
+            experiment = Experiment(**settings)
+            results = experiment.run_jobs(folder=folder, launcher=launcher, chunk_size=4)
+            # only the chunk that did not finish is launched again (and left out once more by the launcher)
+            self.assertEqual(launcher.launched, [[0], [0]])
+            self.assertEqual((pathlib.Path(folder) / "results" / "chunk_1.pickle").read_bytes(), finished)
+            self.assertEqual(results['num_agents'].tolist(),
+                             [parameter_dict['num_agents'] for parameter_dict in experiment.parameter_dict_list])
+
+    def test_other_experiment(self):
+        with tempfile.TemporaryDirectory() as folder:
+            Experiment(**self.experiment_settings).run_jobs(folder=folder, launcher=LocalLauncher(num_workers=2))
+            other_settings = dict(self.experiment_settings, max_iterations=100)
+            with self.assertRaises(FileExistsError):
+                Experiment(**other_settings).run_jobs(folder=folder, launcher=LocalLauncher(num_workers=2))
+            self.assertTrue(any((pathlib.Path(folder) / "results").iterdir()))
+            results = Experiment(**other_settings).run_jobs(folder=folder, launcher=LocalLauncher(num_workers=2),
+                                                            overwrite=True)
+            self.assertEqual(len(results), 6)
+
+    def test_failed_chunks(self):
+        class FailingLauncher(LocalLauncher):
+            def launch(self, runner, chunks):
+                pass
+
+        with tempfile.TemporaryDirectory() as folder:
+            runner = JobRunner(Experiment(**self.experiment_settings), folder=folder, launcher=FailingLauncher(),
+                               chunk_size=5, max_retries=1)
+            with self.assertRaises(RuntimeError):
+                runner.run()
+            self.assertEqual(runner.pending(), [0, 1])
+
+    def test_slurm_script(self):
+        with tempfile.TemporaryDirectory() as folder:
+            runner = JobRunner(Experiment(**self.experiment_settings), folder=folder, chunk_size=2)
+            runner.prepare()
+            script = SlurmLauncher(cpus_per_task=4, num_workers=2).write_script(runner, runner.pending()).read_text()
+            self.assertIn("#SBATCH --array=0,1,2%2", script)
+            self.assertIn("$SLURM_ARRAY_TASK_ID --processes 4", script.replace('"', ''))
+            self.assertTrue((pathlib.Path(folder) / "tasks" / "chunk_2.pickle").exists())
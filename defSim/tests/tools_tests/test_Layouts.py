@@ -0,0 +1,74 @@
+from unittest import TestCase
+import tempfile
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import networkx as nx
+import numpy as np
+import defSim as ds
+from defSim.network_init import network_init
+from defSim.tools.Layouts import LayoutCache, grid_layout, ring_layout, structure_hash, edge_indices
+from defSim.tools.Plots import NetworkPlot
+
+
+class TestLayouts(TestCase):
+
+    def tearDown(self):
+        plt.close('all')
+
+    def test_grid_layout(self):
+        # small Moore grids are labelled by row and column, other grids row by row
+        positions = grid_layout(ds.generate_network('grid', num_agents=49))
+        self.assertEqual(positions[:8].tolist(), [[0, 0], [0, 1], [0, 2], [0, 3], [0, 4], [0, 5], [0, 6], [1, 0]])
+        network = ds.generate_network('grid', num_agents=144, neighborhood='von_neumann')
+        positions = grid_layout(network)
+        for agent, neighbor in network.edges():
+            difference = np.abs(positions[agent] - positions[neighbor])
+            self.assertIn(sorted(difference.tolist()), [[0, 1], [0, 11]])
+
+    def test_ring_layout(self):
+        positions = ring_layout(ds.generate_network('ring', num_agents=8))
+        np.testing.assert_allclose(positions[2], [0, 1], atol=1e-12)
+        np.testing.assert_allclose(np.linalg.norm(positions, axis=1), 1)
+
+    def test_structure_hash(self):
+        network = ds.generate_network('ring', num_agents=20)
+        reordered = nx.Graph()
+        reordered.add_nodes_from(network.nodes)
+        reordered.add_edges_from(reversed([(v, u) for u, v in network.edges()]))
+        self.assertEqual(structure_hash(network), structure_hash(reordered))
+        ds.agents_init.initialize_attributes(network, 'random_continuous', num_features=1)
+        self.assertEqual(structure_hash(network), structure_hash(reordered))
+        reordered.remove_edge(0, 1)
+        self.assertNotEqual(structure_hash(network), structure_hash(reordered))
+
+        labelled = nx.relabel_nodes(network, {node: str(node) for node in network})
+        self.assertEqual(edge_indices(labelled).tolist(), edge_indices(network).tolist())
+
+    def test_cache(self):
+        network = nx.fast_gnp_random_graph(30, 0.2, seed=1)
+        with tempfile.TemporaryDirectory() as folder:
+            cache = LayoutCache(folder)
+            positions = cache.positions(network, nx.spring_layout, seed=3)
+            self.assertIs(cache.positions(network, nx.spring_layout, seed=3), positions)
+            self.assertEqual((cache.hits, cache.misses), (1, 1))
+            # a new cache reads the layout from the folder
+            np.testing.assert_array_equal(LayoutCache(folder).positions(network, nx.spring_layout, seed=3), positions)
+            cache.positions(network, nx.spring_layout, seed=4)
+            self.assertEqual(cache.misses, 2)
+
+    def test_network_plot(self):
+        network, positions = network_init._produce_spatial_random_graph(num_agents=30, min_neighbors=2,
+                                                                        return_positions=True,
+                                                                        np_random_generator=np.random.default_rng(1))
+        ds.agents_init.initialize_attributes(network, 'random_continuous', num_features=1)
+        plot = NetworkPlot(node_size=5)
+        plot.plot(network, feature='f01', pos=positions)
+        nodes = plt.gca().collections[-1]
+        np.testing.assert_array_equal(nodes.get_offsets(), positions)
+        self.assertEqual(sum(np.isfinite(path.vertices[:, 0]).sum() for path in plt.gca().collections[0].get_paths()),
+                         2 * network.number_of_edges())
+
+        plot.plot(network)
+        plot.plot(network)
+        self.assertEqual((plot.layout_cache.hits, plot.layout_cache.misses), (1, 1))
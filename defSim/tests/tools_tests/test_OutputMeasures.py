@@ -0,0 +1,103 @@
+from unittest import TestCase
+import numpy as np
+import networkx as nx
+import defSim as ds
+from defSim.Simulation import Simulation
+from defSim.tools import OutputMeasures
+
+
+class TestIncrementalReporters(TestCase):
+
+    def _simulation(self, tickwise, influence_function='weighted_linear', communication_regime='one-to-one'):
+        return Simulation(topology='grid',
+                          attributes_initializer='random_continuous',
+                          influence_function=influence_function,
+                          communication_regime=communication_regime,
+                          dissimilarity_measure='euclidean',
+                          parameter_dict={'num_agents': 64, 'num_features': 2, 'neighborhood': 'von_neumann'},
+                          max_iterations=1500,
+                          seed=5,
+                          tickwise=tickwise)
+
+    def test_equal_to_reporters(self):
+        pairs = [(OutputMeasures.AverageOpinionReporter(), OutputMeasures.IncrementalAverageOpinionReporter()),
+                 (OutputMeasures.DispersionReporter(), OutputMeasures.IncrementalDispersionReporter(window_size=4)),
+                 (OutputMeasures.SpreadReporter(), OutputMeasures.IncrementalSpreadReporter()),
+                 (OutputMeasures.AverageDistanceReporter(), OutputMeasures.IncrementalAverageDistanceReporter())]
+        for _, incremental in pairs:
+            incremental.label = 'Incremental' + incremental.label
+        for influence_function, communication_regime in [('weighted_linear', 'one-to-one'),
+                                                         ('bounded_confidence', 'one-to-many')]:
+            simulation = self._simulation([reporter for pair in pairs for reporter in pair],
+                                          influence_function, communication_regime)
+            results = simulation.run(show_progress=False)
+            for reporter, incremental in pairs:
+                np.testing.assert_allclose(results['Tickwise_' + incremental.label][0],
+                                           results['Tickwise_' + reporter.label][0], rtol=0, atol=1e-12)
+
+    def test_create_output(self):
+        # outside a simulation, the reporters compute their value from the network
+        network = ds.generate_network('ring', num_agents=10)
+        ds.agents_init.initialize_attributes(network, 'random_continuous', num_features=1)
+        for reporter, incremental in [(OutputMeasures.DispersionReporter(),
+                                       OutputMeasures.IncrementalDispersionReporter(window_size=2)),
+                                      (OutputMeasures.AverageDistanceReporter(),
+                                       OutputMeasures.IncrementalAverageDistanceReporter())]:
+            self.assertAlmostEqual(incremental.create_output(network), reporter.create_output(network))
+            incremental.on_influence(3, 'f01', network.nodes[3]['f01'], 0.9)
+            network.nodes[3]['f01'] = 0.9
+            self.assertAlmostEqual(incremental.create_output(network), reporter.create_output(network))
+
+    def test_directed(self):
+        network = nx.gnp_random_graph(20, 0.2, seed=3, directed=True)
+        ds.agents_init.initialize_attributes(network, 'random_continuous', num_features=1)
+        reporter = OutputMeasures.IncrementalAverageDistanceReporter()
+        reporter.create_output(network)
+        for agent in [0, 7, 7, 12]:
+            old_value = network.nodes[agent]['f01']
+            network.nodes[agent]['f01'] = old_value / 2
+            reporter.on_influence(agent, 'f01', old_value, old_value / 2)
+        self.assertAlmostEqual(reporter.create_output(network),
+                               OutputMeasures.AverageDistanceReporter().create_output(network))
+
+    def test_no_edges(self):
+        network = nx.empty_graph(5)
+        ds.agents_init.initialize_attributes(network, 'random_continuous', num_features=1)
+        self.assertTrue(np.isnan(OutputMeasures.AverageDistanceReporter().create_output(network)))
+        reporter = OutputMeasures.IncrementalAverageDistanceReporter()
+        self.assertTrue(np.isnan(reporter.create_output(network)))
+        reporter.on_influence(2, 'f01', network.nodes[2]['f01'], 0.5)
+        self.assertTrue(np.isnan(reporter.create_output(network)))
+
+    def test_abstract(self):
+        class IncompleteReporter(OutputMeasures.IncrementalReporter):
+            label = "Incomplete"
+
+        with self.assertRaises(TypeError):
+            IncompleteReporter()
+
+
+class TestInfluenceHooks(TestCase):
+
+    def test_on_influence(self):
+        simulation = Simulation(topology='grid',
+                                attributes_initializer='random_continuous',
+                                influence_function='weighted_linear',
+                                dissimilarity_measure='euclidean',
+                                parameter_dict={'num_agents': 25, 'num_features': 1, 'neighborhood': 'von_neumann'},
+                                max_iterations=200,
+                                seed=1)
+        changes = []
+        simulation.on_influence(lambda agent, feature, old_value, new_value:
+                                changes.append((agent, feature, old_value, new_value)))
+        simulation.initialize()
+        values = {agent: simulation.network.nodes[agent]['f01'] for agent in simulation.network}
+        simulation.run(initialize=False, show_progress=False)
+        self.assertTrue(changes)
+        # replaying the changes from the initial opinions gives the final opinions
+        for agent, feature, old_value, new_value in changes:
+            self.assertEqual(feature, 'f01')
+            self.assertEqual(values[agent], old_value)
+            self.assertNotEqual(old_value, new_value)
+            values[agent] = new_value
+        self.assertEqual(values, {agent: simulation.network.nodes[agent]['f01'] for agent in simulation.network})
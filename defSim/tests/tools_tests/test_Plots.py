@@ -0,0 +1,39 @@
+from unittest import TestCase
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+from defSim.tools.Plots import DynamicsPlot, decimate_min_max
+
+
+class TestDynamicsPlot(TestCase):
+
+    def tearDown(self):
+        plt.close('all')
+
+    def test_decimate_min_max(self):
+        values = np.cumsum(np.random.default_rng(1).normal(size=(1001, 7)), axis=0)
+        ticks, extremes = decimate_min_max(values, num_buckets=10, chunk_bytes=1000)
+        self.assertEqual(ticks.shape, (20, 7))
+        np.testing.assert_array_equal(extremes, np.take_along_axis(values, ticks, axis=0))
+        np.testing.assert_array_equal(extremes.max(axis=0), values.max(axis=0))
+        np.testing.assert_array_equal(extremes.min(axis=0), values.min(axis=0))
+        self.assertTrue((np.diff(ticks, axis=0) >= 0).all())
+
+        # short trajectories are kept as they are
+        ticks, extremes = decimate_min_max(values[:15], num_buckets=10)
+        np.testing.assert_array_equal(extremes, values[:15])
+
+    def test_scalable_plot(self):
+        values = np.random.default_rng(2).random((500, 4)).astype(np.float32)
+        data = pd.DataFrame({'Tickwise_f01': [values]})
+        DynamicsPlot(scalable=True, resolution=50, colors=None).plot(data, hue=['a', 'b', 'a', 'b'])
+        lines = plt.gca().collections[0]
+        self.assertEqual(len(lines.get_segments()), 4)
+        self.assertEqual(len(lines.get_segments()[0]), 100)
+        self.assertEqual(lines.get_colors()[0].tolist(), lines.get_colors()[2].tolist())
+
+    def test_long_form(self):
+        values = np.arange(12).reshape(4, 3)
+        DynamicsPlot(colors=None).plot(pd.DataFrame({'Tickwise_f01': [values]}), hue=['a', 'b', 'a'])
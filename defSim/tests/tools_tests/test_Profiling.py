@@ -0,0 +1,48 @@
+from unittest import TestCase
+import pstats
+import tempfile
+import pathlib
+from defSim.Experiment import Experiment
+from defSim.tools.Profiling import Profiler, ProfiledParameters
+
+
+class TestProfiling(TestCase):
+
+    def create_experiment(self, profile=None):
+        return Experiment(topology='ring',
+                          network_parameters={'num_agents': 20},
+                          influence_parameters={'homophily': [0.5, 1]},
+                          max_iterations=300,
+                          repetitions=4,
+                          seed=1,
+                          profile=profile)
+
+    def test_select(self):
+        with tempfile.TemporaryDirectory() as folder:
+            profiler = Profiler(folder, sample=0.5, seed=3)
+            parameter_dicts = self.create_experiment()._create_parameter_dictionaries()
+            selected = [parameter_dict for parameter_dict in profiler.select(parameter_dicts)
+                        if isinstance(parameter_dict, ProfiledParameters)]
+        # the sample is spread over the parameter combinations in proportion to their simulations
+        self.assertEqual(len(selected), 4)
+        self.assertEqual(sorted(parameter_dict['homophily'] for parameter_dict in selected), [0.5, 0.5, 1, 1])
+        self.assertEqual(Profiler(sample=3).sample_size(8), 3)
+
+    def test_profile(self):
+        expected = self.create_experiment().run(show_progress=False)
+        for parallel in [False, True]:
+            with tempfile.TemporaryDirectory() as folder:
+                experiment = self.create_experiment(profile=Profiler(folder, sample=0.25))
+                results = experiment.run(parallel=parallel, num_cores=2, show_progress=False)
+                folder = pathlib.Path(folder)
+                self.assertEqual(len(list(folder.glob("simulation_*.prof"))), 2)
+                stats = pstats.Stats(str(folder / "combined.prof"))
+                self.assertTrue(any(name == 'run_step' for _, _, name in stats.stats))
+                collapsed = (folder / "combined.collapsed").read_text().splitlines()
+                self.assertTrue(any('run_step (Simulation.py' in line for line in collapsed))
+                self.assertTrue(all(int(line.rsplit(' ', 1)[1]) > 0 for line in collapsed))
+            # profiling does not change the results, and the parameter dictionaries are restored
+            self.assertEqual(list(results.columns), list(expected.columns))
+            self.assertEqual(sorted(results['Seed']), sorted(expected['Seed']))
+            self.assertFalse(any(isinstance(parameter_dict, ProfiledParameters)
+                                 for parameter_dict in experiment.parameter_dict_list))
@@ -0,0 +1,53 @@
+from unittest import TestCase
+import networkx as nx
+import defSim as ds
+from defSim.Experiment import Experiment
+from defSim.tools.SharedNetwork import SharedNetwork
+
+
+class TestSharedNetwork(TestCase):
+
+    def test_to_graph(self):
+        network = nx.relabel_nodes(ds.generate_network('ring', num_agents=10), lambda agent: 'agent{}'.format(agent))
+        network.nodes['agent0']['f01'] = 1
+        network.edges['agent0', 'agent1']['weight'] = .5
+        shared = SharedNetwork(network)
+        graph = shared.to_graph()
+        self.assertEqual(list(graph.nodes(data=True)), list(network.nodes(data=True)))
+        self.assertEqual(list(graph.edges(data=True)), list(network.edges(data=True)))
+        for agent in network:
+            self.assertEqual(list(graph.neighbors(agent)), list(network.neighbors(agent)))
+
+        # attributes of the private graph are independent of the original and of other private graphs
+        graph.nodes['agent0']['f01'] = 2
+        graph.edges['agent0', 'agent1']['dist'] = .1
+        self.assertIs(graph.edges['agent1', 'agent0'], graph.edges['agent0', 'agent1'])
+        self.assertEqual(network.nodes['agent0']['f01'], 1)
+        self.assertEqual(shared.to_graph().edges['agent0', 'agent1'], {'weight': .5})
+
+    def test_neighbor_order(self):
+        # copying a network with NetworkX can change the order of neighbors, a shared network keeps it
+        network = nx.random_regular_graph(4, 30, seed=1)
+        graph = SharedNetwork(network).to_graph()
+        for agent in network:
+            self.assertEqual(list(graph.neighbors(agent)), list(network.neighbors(agent)))
+
+    def test_directed(self):
+        network = nx.gn_graph(20, seed=1)
+        graph = SharedNetwork(network).to_graph()
+        self.assertTrue(graph.is_directed())
+        self.assertEqual(sorted(graph.edges()), sorted(network.edges()))
+        self.assertEqual(sorted(graph.predecessors(0)), sorted(network.predecessors(0)))
+
+    def test_parallel_experiment(self):
+        settings = dict(network=ds.generate_network('grid', num_agents=16),
+                        attribute_parameters={'num_features': 3, 'num_traits': 3},
+                        max_iterations=200,
+                        output_realizations=['Regions', 'AverageDistance'],
+                        repetitions=4,
+                        seed=1)
+        serial = Experiment(**settings).run(show_progress=False)
+        parallel = Experiment(**settings).run(parallel=True, num_cores=2, show_progress=False)
+        columns = ['seed', 'Regions', 'AverageDistance']
+        self.assertEqual(serial[columns].sort_values('seed').values.tolist(),
+                         parallel[columns].sort_values('seed').values.tolist())
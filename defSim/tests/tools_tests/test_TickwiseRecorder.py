@@ -0,0 +1,121 @@
+from unittest import TestCase
+import tempfile
+import pathlib
+import numpy as np
+import pandas as pd
+import defSim as ds
+from defSim.Simulation import Simulation
+from defSim.tools.CreateDataFiles import create_data_files
+from defSim.tools.TickwiseRecorder import TickwiseRecorder, StreamingTickwiseRecorder, read_tickwise
+from defSim.tools.TickwiseRecorder import TrajectoryHistogram, histogram_rows
+from defSim.tools.Plots import TrajectoryHeatPlot
+
+
+class TestTickwiseRecorder(TestCase):
+
+    def test_growth_and_dtype(self):
+        network = ds.generate_network('ring', num_agents=10)
+        ds.agents_init.initialize_attributes(network, 'random_categorical', num_features=1, num_traits=3)
+        recorder = TickwiseRecorder(feature='f01', agents=list(network), expected_rows=2, dtype=np.int32)
+        for _ in range(5):
+            recorder.record(network)
+        values = recorder.to_array()
+        self.assertEqual(values.shape, (5, 10))
+        self.assertEqual(values.dtype, np.int32)
+        self.assertEqual(list(values[-1]), [network.nodes[i]['f01'] for i in network])
+
+        # a feature that holds whole numbers at the first tick is still stored as floats
+        recorder = TickwiseRecorder(feature='f01', agents=list(network))
+        recorder.record(network)
+        network.nodes[0]['f01'] = 0.5
+        recorder.record(network)
+        self.assertEqual(recorder.to_array()[-1, 0], 0.5)
+
+        simulation = Simulation(network=network, attributes_initializer='random_categorical', max_iterations=20,
+                                parameter_dict={'num_features': 1}, tickwise=['f01'])
+        self.assertEqual(simulation.run(show_progress=False)['Tickwise_f01'][0].dtype, np.int32)
+
+    def test_simulation_output(self):
+        simulation = Simulation(attributes_initializer='random_continuous',
+                                influence_function='weighted_linear',
+                                dissimilarity_measure='euclidean',
+                                max_iterations=50,
+                                parameter_dict={'num_features': 1, 'output_step_size': 10},
+                                tickwise=['f01', 'Regions'])
+        results = simulation.run(show_progress=False)
+        tickwise = results['Tickwise_f01'][0]
+        self.assertEqual(tickwise.shape, (5, 49))
+        self.assertEqual(tickwise.dtype, np.float32)
+        self.assertEqual(len(results['Tickwise_defaults'][0]), 5)
+
+    def test_streaming(self):
+        network = ds.generate_network('ring', num_agents=10)
+        ds.agents_init.initialize_attributes(network, 'random_continuous', num_features=1)
+        with tempfile.TemporaryDirectory() as folder:
+            recorder = StreamingTickwiseRecorder(feature='f01', agents=list(network), folder_path=folder, chunk_rows=3)
+            for _ in range(7):
+                recorder.record(network)
+            values = read_tickwise(recorder.close())
+            self.assertEqual(values.shape, (7, 10))
+            np.testing.assert_array_equal(values[-1], np.array([network.nodes[i]['f01'] for i in network],
+                                                               dtype=np.float32))
+            del values
+
+    def test_streaming_write_error(self):
+        network = ds.generate_network('ring', num_agents=10)
+        ds.agents_init.initialize_attributes(network, 'random_continuous', num_features=1)
+        with tempfile.TemporaryDirectory() as folder:
+            recorder = StreamingTickwiseRecorder(feature='f01', agents=list(network), folder_path=folder, chunk_rows=1)
+            recorder.record(network)
+            recorder._file.close()  # the next write of the writer thread fails, as on a full disk
+            with self.assertRaises(ValueError):
+                for _ in range(100):
+                    recorder.record(network)
+            with self.assertRaises(ValueError):
+                recorder.close()
+            self.assertIsNone(recorder._writer)
+
+    def test_streaming_simulation_output(self):
+        with tempfile.TemporaryDirectory() as folder:
+            simulation = Simulation(attributes_initializer='random_continuous',
+                                    influence_function='weighted_linear',
+                                    dissimilarity_measure='euclidean',
+                                    max_iterations=50,
+                                    parameter_dict={'num_features': 1},
+                                    tickwise=['f01'],
+                                    tickwise_folder_path=folder)
+            results = simulation.run(show_progress=False)
+            self.assertEqual(read_tickwise(results['Tickwise_f01'][0]).shape, (50, 49))
+
+            create_data_files(output_table=results, output_folder_path=folder, output_file_name='streamed.csv')
+            written = pd.read_csv(pathlib.Path(folder) / 'outputfile_Tickwise_f01_0.csv', index_col=0)
+            self.assertEqual(written.shape, (50, 49))
+
+    def test_histogram_rows(self):
+        edges = np.linspace(0, 1, 5)
+        values = np.array([[0, 0.1, 0.25, 0.99, 1], [0.5, 0.5, 0.5, -1, 2]])
+        np.testing.assert_array_equal(histogram_rows(values, edges), [[2, 1, 0, 2], [1, 0, 3, 1]])
+        np.testing.assert_array_equal(histogram_rows(values[0], edges), [2, 1, 0, 2])
+        np.testing.assert_array_equal(histogram_rows(values[0], edges)[:-1],
+                                      np.histogram(values[0], edges)[0][:-1])
+
+    def test_trajectory_histogram(self):
+        histogram = TrajectoryHistogram('f01', bins=10)
+        simulation = Simulation(attributes_initializer='random_continuous',
+                                influence_function='weighted_linear',
+                                dissimilarity_measure='euclidean',
+                                max_iterations=50,
+                                parameter_dict={'num_features': 1, 'output_step_size': 5},
+                                tickwise=['f01', histogram])
+        results = simulation.run(show_progress=False)
+        counts = read_tickwise(results['Tickwise_f01Histogram'][0])
+        self.assertEqual(counts.shape, (10, 10))
+        self.assertEqual(histogram.num_rows, 0)  # the simulation recorded into a copy
+        np.testing.assert_array_equal(counts.sum(axis=1), 49)
+
+        values = results['Tickwise_f01'][0]
+        np.testing.assert_array_equal(counts, histogram_rows(values, histogram.edges))
+        plot = TrajectoryHeatPlot(results, y='Tickwise_f01', bins=10)
+        np.testing.assert_array_equal(plot.prep_data(), counts)
+        plot = TrajectoryHeatPlot(results['Tickwise_f01Histogram'][0])
+        np.testing.assert_array_equal(plot.prep_data(), counts)
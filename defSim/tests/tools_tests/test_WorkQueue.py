@@ -0,0 +1,77 @@
+from unittest import TestCase
+import os
+import tempfile
+import time
+from defSim.Experiment import Experiment
+from defSim.tools.WorkQueue import WorkQueue, work
+
+
+class TestWorkQueue(TestCase):
+
+    def setUp(self):
+        self.experiment_settings = dict(topology='ring',
+                                        network_parameters={'num_agents': [10, 20]},
+                                        influence_parameters={'homophily': 1},
+                                        max_iterations=200,
+                                        output_realizations=['Regions'],
+                                        repetitions=2,
+                                        seed=3)
+
+    def test_claim(self):
+        with tempfile.TemporaryDirectory() as folder:
+            queue = WorkQueue(folder, lease_seconds=60)
+            self.assertEqual(queue.submit(Experiment(**self.experiment_settings), tasks_per_file=3), 2)
+            first, second = queue.claim('a'), queue.claim('b')
+            self.assertNotEqual(first, second)
+            self.assertIsNone(queue.claim('c'))
+            self.assertEqual(len(queue.read(first, 'a')), 3)
+
+            # the lease of a worker without heartbeat expires, and its task is run by another worker
+            self.assertTrue(queue.heartbeat(second, 'b'))
+            claimed_path = queue.folder / "claimed" / "{}.a".format(first)
+            os.utime(claimed_path, (time.time() - 120, time.time() - 120))
+            self.assertEqual(queue.reclaim_expired(), 1)
+            self.assertFalse(queue.heartbeat(first, 'a'))
+            self.assertEqual(queue.status(), {'pending': 1, 'claimed': 1, 'done': 0, 'failed': 0})
+
+            queue.complete(second, 'b', queue.read(second, 'b'))
+            self.assertEqual(work(folder, worker_id='d'), 1)
+            self.assertEqual(queue.status(), {'pending': 0, 'claimed': 0, 'done': 2, 'failed': 0})
+
+    def test_claim_after_lease(self):
+        # a task that was submitted longer than a lease ago gets a new lease when it is claimed
+        with tempfile.TemporaryDirectory() as folder:
+            queue = WorkQueue(folder, lease_seconds=1)
+            queue.submit(Experiment(**self.experiment_settings))
+            for path in (queue.folder / "pending").iterdir():
+                os.utime(path, (time.time() - 10, time.time() - 10))
+            name = queue.claim('a')
+            self.assertEqual(queue.reclaim_expired(), 0)
+            self.assertEqual(queue.status(), {'pending': 3, 'claimed': 1, 'done': 0, 'failed': 0})
+            self.assertEqual(len(queue.read(name, 'a')), 1)
+
+    def test_submit_again(self):
+        with tempfile.TemporaryDirectory() as folder:
+            # without seed, the simulations of an experiment are in another order every time it is created
+            settings = dict(self.experiment_settings, seed=None)
+            queue = WorkQueue(folder)
+            self.assertEqual(queue.submit(Experiment(**settings), tasks_per_file=2), 2)
+            self.assertEqual(work(folder, worker_id='a', max_tasks=1), 1)
+            self.assertEqual(queue.submit(Experiment(**settings), tasks_per_file=2), 2)
+            self.assertEqual(queue.status(), {'pending': 1, 'claimed': 0, 'done': 1, 'failed': 0})
+
+            # the results of another experiment are only removed when asked for
+            other_settings = dict(settings, max_iterations=100)
+            with self.assertRaises(FileExistsError):
+                queue.submit(Experiment(**other_settings))
+            self.assertEqual(queue.status()['done'], 1)
+            self.assertEqual(queue.submit(Experiment(**other_settings), overwrite=True), 4)
+            self.assertEqual(queue.status(), {'pending': 4, 'claimed': 0, 'done': 0, 'failed': 0})
+
+    def test_run_with_queue(self):
+        expected = Experiment(**self.experiment_settings).run(show_progress=False)
+        with tempfile.TemporaryDirectory() as folder:
+            results = Experiment(**self.experiment_settings).run_with_queue(folder=folder, num_workers=2,
+                                                                            poll_interval=.1, timeout=120)
+        self.assertEqual(results[['num_agents', 'seed', 'Regions']].values.tolist(),
+                         expected[['num_agents', 'seed', 'Regions']].values.tolist())
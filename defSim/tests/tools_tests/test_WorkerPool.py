@@ -0,0 +1,51 @@
+from unittest import TestCase
+import os
+import pathlib
+import tempfile
+import defSim as ds
+from defSim.Experiment import Experiment
+from defSim.tools.WorkerPool import WorkerPool
+
+
+def _worker_pid(_):
+    return os.getpid()
+
+
+class TestWorkerPool(TestCase):
+
+    def setUp(self):
+        self.network = ds.generate_network('grid', num_agents=16)
+        self.settings = dict(network=self.network,
+                             attribute_parameters={'num_features': 3, 'num_traits': 3},
+                             max_iterations=300,
+                             output_realizations=['Regions'],
+                             repetitions=3,
+                             seed=5)
+
+    def test_reuse(self):
+        expected = [Experiment(influence_parameters={'homophily': homophily}, **self.settings).run(
+            show_progress=False)['Regions'].tolist() for homophily in [0, 1]]
+        with WorkerPool(num_workers=2, network=self.network) as pool:
+            pids = pool.pids()
+            self.assertLessEqual(set(pool.bind().map(_worker_pid, range(4))), set(pids))
+            for homophily, expected_regions in zip([0, 1], expected):
+                experiment = Experiment(influence_parameters={'homophily': homophily}, **self.settings)
+                self.assertEqual(experiment._prepare_workers(pool)[1], "preloaded network")
+                results = experiment.run(executor=pool, show_progress=False)
+                self.assertEqual(results['Regions'].tolist(), expected_regions)
+            # the same workers ran all experiments
+            self.assertEqual(pool.pids(), pids)
+            # results of the reused workers are also streamed to the output file
+            with tempfile.TemporaryDirectory() as folder:
+                streamed = Experiment(influence_parameters={'homophily': 1}, output_folder_path=folder,
+                                      scheduling='random', **self.settings).run(executor=pool, show_progress=False,
+                                                                                streaming=True)
+                self.assertTrue(any(pathlib.Path(folder).glob("*.csv")))
+            self.assertEqual(sorted(streamed['Regions'].tolist()), sorted(expected[1]))
+            self.assertEqual(pool.pids(), pids)
+
+    def test_spawn(self):
+        expected = Experiment(**self.settings).run(show_progress=False)['Regions'].tolist()
+        with WorkerPool(num_workers=2, start_method='spawn') as pool:
+            results = Experiment(**self.settings).run(executor=pool, show_progress=False)
+        self.assertEqual(results['Regions'].tolist(), expected)
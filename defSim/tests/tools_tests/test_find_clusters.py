@@ -1,4 +1,5 @@
 from unittest import TestCase
+import networkx as nx
 import defSim as ds
 
 class test_find_clusters(TestCase):
@@ -19,4 +20,16 @@ class test_find_clusters(TestCase):
     # the list of sizes of clusters in which influence is still possible:
     assert ds.OutputMeasures.ClusterFinder(strict_zones=True).create_output(G) == [4]
     # the list of sizes of clusters with reasonably similar attribute profiles
-    assert ds.OutputMeasures.ClusterFinder(cluster_dissimilarity_threshold=.5).create_output(G) == [2, 2]
\ No newline at end of file
+    assert ds.OutputMeasures.ClusterFinder(cluster_dissimilarity_threshold=.5).create_output(G) == [2, 2]
+
+class test_find_clusters_directed(TestCase):
+
+    def test_directed(self):
+        G = nx.DiGraph([(0, 1), (1, 2), (2, 0), (2, 3)])
+        nx.set_node_attributes(G, 1, 'f01')
+        nx.set_edge_attributes(G, 0, 'dist')
+        self.assertEqual(ds.OutputMeasures.ClusterFinder().create_output(G), [4])
+        self.assertEqual(ds.OutputMeasures.ClusterFinder(connection='strong').create_output(G), [3, 1])
+        # ties with too much dissimilarity are not followed
+        G.edges[2, 0]['dist'] = 1
+        self.assertEqual(ds.OutputMeasures.ClusterFinder(connection='strong').create_output(G), [1, 1, 1, 1])
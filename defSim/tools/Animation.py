@@ -0,0 +1,238 @@
+"""
+
+Requires:
+- matplotlib >= 3.3.4
+
+"""
+import pathlib
+from typing import Iterator
+import numpy as np
+import networkx as nx
+import matplotlib.pyplot as plt
+from matplotlib.animation import AbstractMovieWriter, FFMpegWriter
+from matplotlib.collections import LineCollection
+from defSim.tools.Layouts import LayoutCache
+from defSim.tools.Plots import NetworkPlot
+
+
+def simulation_frames(simulation, feature: str = 'f01', every: int = 1, ticks: int = None) -> Iterator[tuple]:
+    """
+    Runs a simulation step by step and yields the values of a feature of all agents every few steps, so the frames of
+    an animation are created while the simulation runs, without recording its tickwise output. The simulation is
+    initialized first if it has no network yet.
+
+    :param simulation: A :class:`~defSim.Simulation.Simulation`.
+    :param str='f01' feature: The name of the feature.
+    :param int=1 every: The number of steps between two frames.
+    :param int=None ticks: The number of steps to run. If None, the maximum number of iterations of the simulation.
+        The stop condition of the simulation is not checked.
+    :returns: An iterator over (tick, values) tuples, starting with the state at tick 0, in which values is an array
+        with the values of the agents in the order of simulation.network.nodes.
+    """
+    if simulation.network is None or not simulation.agentIDs:
+        simulation.initialize()
+    simulation._start_run()
+    ticks = simulation.max_iterations if ticks is None else ticks
+    nodes = simulation.network.nodes
+    num_agents = simulation.network.number_of_nodes()
+    yield 0, np.fromiter((nodes[agent][feature] for agent in nodes), dtype=float, count=num_agents)
+    for tick in range(1, ticks + 1):
+        simulation.run_step()
+        if tick % every == 0:
+            yield tick, np.fromiter((nodes[agent][feature] for agent in nodes), dtype=float, count=num_agents)
+
+
+def event_log_frames(event_log, feature: str = 'f01', start: int = 0, stop: int = None, every: int = 1,
+                     network: nx.Graph = None) -> Iterator[tuple]:
+    """
+    Replays an :class:`~defSim.tools.EventLog.EventLog` and yields the values of a feature of all agents every few
+    ticks. Only the events between two frames are applied, so replaying takes memory for one state.
+
+    :param event_log: The EventLog.
+    :param str='f01' feature: The name of the feature, which must be one of the recorded features.
+    :param int=0 start: The tick of the first frame.
+    :param int=None stop: The last tick. If None, the last recorded tick.
+    :param int=1 every: The number of ticks between two frames.
+    :param network: If given, the values are ordered as network.nodes instead of as event_log.agents.
+    :returns: An iterator over (tick, values) tuples.
+    """
+    column = event_log.features.index(feature)
+    order = None
+    if network is not None:
+        rows = {agent: row for row, agent in enumerate(event_log.agents)}
+        order = np.array([rows[agent] for agent in network.nodes])
+    for tick, state in event_log.iter_states(start, stop, step=every):
+        values = state[:, column]
+        yield tick, values[order] if order is not None else values.copy()
+
+
+class ImageSequenceWriter(AbstractMovieWriter):
+    """
+    Writes every frame of an animation to a separate image file, with the interface of the matplotlib movie writers.
+    Every frame is written when it is grabbed, so no frames are kept in memory.
+
+    :param str='frame_{:06d}.png' file_name: The name of the image files, formatted with the number of the frame.
+        The extension sets the image format.
+    """
+
+    def __init__(self, file_name: str = 'frame_{:06d}.png', fps: int = 25):
+        super().__init__(fps=fps)
+        self.file_name = file_name
+        self.folder = None
+        self.frames = 0
+
+    def setup(self, fig, outfile, dpi=None):
+        """
+        :param fig: The figure of the animation.
+        :param outfile: The folder of the image files. It is created if it does not exist.
+        :param dpi: The resolution of the images.
+        """
+        super().setup(fig, outfile, dpi=dpi)
+        self.folder = pathlib.Path(outfile)
+        self.folder.mkdir(parents=True, exist_ok=True)
+        self.frames = 0
+
+    def grab_frame(self, **savefig_kwargs):
+        self.fig.savefig(self.folder / self.file_name.format(self.frames), dpi=self.dpi, **savefig_kwargs)
+        self.frames += 1
+
+    def finish(self):
+        pass
+
+
+class _Animation:
+    """
+    The figure of an animation, whose artists are created once and updated for every frame.
+    """
+
+    def __init__(self, figure=None, ax=None, title: str = "Tick {}"):
+        if figure is None:
+            figure = plt.figure() if ax is None else ax.figure
+        self.figure = figure
+        self.ax = ax if ax is not None else figure.gca()
+        self.title = title
+        self._title = self.ax.set_title(title.format(0) if title else "")
+
+    def update(self, tick: int, values: np.ndarray):
+        """
+        Shows a frame.
+
+        :param tick: The tick of the frame.
+        :param values: The values of the agents.
+        """
+        if self.title:
+            self._title.set_text(self.title.format(tick))
+
+    def save(self, frames, path: str or pathlib.Path, writer: AbstractMovieWriter = None, fps: int = 25,
+             dpi: int = 100) -> int:
+        """
+        Writes the frames one by one. Only the artists of the figure are updated for a frame, and every frame is handed
+        to the writer before the next is created, so memory use does not grow with the number of frames.
+
+        :param frames: An iterable of (tick, values) tuples, such as :func:`simulation_frames` or
+            :func:`event_log_frames`.
+        :param path: The output. A folder for an image sequence, or a video file such as 'dynamics.mp4'.
+        :param writer: A matplotlib movie writer. If None, an :class:`ImageSequenceWriter` if path has no extension,
+            and an FFMpegWriter (which pipes the frames to a local ffmpeg) otherwise.
+        :param int=25 fps: The frames per second of a video.
+        :param int=100 dpi: The resolution of the frames.
+        :returns: The number of frames written.
+        """
+        if writer is None:
+            writer = ImageSequenceWriter(fps=fps) if pathlib.Path(path).suffix == '' else FFMpegWriter(fps=fps)
+        written = 0
+        with writer.saving(self.figure, str(path), dpi):
+            for tick, values in frames:
+                self.update(tick, values)
+                writer.grab_frame()
+                written += 1
+        return written
+
+
+class NetworkAnimation(_Animation):
+    """
+    This class animates the opinion dynamics on a network by coloring the agents by a feature. The network is drawn
+    once with a :class:`~defSim.tools.Plots.NetworkPlot`, and only the colors of the agents change between frames::
+
+        simulation.initialize()
+        animation = NetworkAnimation(simulation.network, layout='grid')
+        animation.save(simulation_frames(simulation, 'f01', every=100, ticks=20000), 'frames')
+
+    :param network: The network, whose agents are colored in the order of network.nodes.
+    :param layout: The layout of the network, see :meth:`~defSim.tools.Plots.NetworkPlot.plot`.
+    :param pos: The positions of the agents. If given, layout is ignored.
+    :param tuple=(0, 1) value_range: The values of the lowest and highest color of the color map.
+    :param float=100 node_size: The size of the agents.
+    :param cmap: The matplotlib color map.
+    :param float=0.2 edge_alpha: The opacity of the edges.
+    :param layout_cache: A :class:`~defSim.tools.Layouts.LayoutCache`, shared with other plots.
+    :param figure: The matplotlib figure. If None, a new figure is created.
+    :param ax: The axes to draw on. If None, the current axes of the figure.
+    :param str='Tick {}' title: The title of the frames, formatted with the tick.
+    """
+
+    def __init__(self, network: nx.Graph, layout=nx.spring_layout, pos=None, value_range: tuple = (0, 1),
+                 node_size: float = 100, cmap=plt.cm.winter, edge_alpha: float = 0.2, layout_cache: LayoutCache = None,
+                 figure=None, ax=None, title: str = "Tick {}"):
+        super().__init__(figure=figure, ax=ax, title=title)
+        plt.sca(self.ax)
+        plot = NetworkPlot(node_size=node_size, cmap=cmap, edge_alpha=edge_alpha, layout_cache=layout_cache)
+        plot.plot(network, colors=np.zeros(network.number_of_nodes()), pos=pos, layout=layout)
+        self.nodes = self.ax.collections[-1]
+        self.nodes.set_cmap(cmap)
+        self.nodes.set_clim(*value_range)
+        self.figure.colorbar(self.nodes, ax=self.ax)
+
+    def update(self, tick: int, values: np.ndarray):
+        super().update(tick, values)
+        self.nodes.set_array(np.asarray(values))
+
+
+class DynamicsAnimation(_Animation):
+    """
+    This class animates the trajectories of the agents on a feature, like a
+    :class:`~defSim.tools.Plots.DynamicsPlot` that is drawn while the simulation runs. The last frames are kept in a
+    buffer of fixed size, which is drawn as a single LineCollection, so memory use does not depend on the length of the
+    animation.
+
+    :param int num_agents: The number of agents.
+    :param int=500 window: The number of frames shown, the earlier frames scroll out of view.
+    :param tuple=(0, 1) value_range: The limits of the y-axis.
+    :param colors: A color, or a list with the color of each agent.
+    :param float=0.8 linewidth: The width of the lines.
+    :param figure: The matplotlib figure. If None, a new figure is created.
+    :param ax: The axes to draw on. If None, the current axes of the figure.
+    :param str='Tick {}' title: The title of the frames, formatted with the tick.
+    """
+
+    def __init__(self, num_agents: int, window: int = 500, value_range: tuple = (0, 1), colors='blue',
+                 linewidth: float = .8, figure=None, ax=None, title: str = "Tick {}"):
+        super().__init__(figure=figure, ax=ax, title=title)
+        self.window = window
+        self.frames = 0
+        self._ticks = np.zeros(window)
+        self._values = np.zeros((window, num_agents))
+        self.lines = LineCollection([], colors=colors, linewidths=linewidth)
+        self.ax.add_collection(self.lines)
+        self.ax.set(ylim=value_range, xlabel='step', ylabel='value')
+
+    def update(self, tick: int, values: np.ndarray):
+        super().update(tick, values)
+        # the buffer is shifted by one frame rather than reallocated
+        if self.frames < self.window:
+            row = self.frames
+        else:
+            self._ticks[:-1] = self._ticks[1:]
+            self._values[:-1] = self._values[1:]
+            row = self.window - 1
+        self._ticks[row] = tick
+        self._values[row] = values
+        self.frames += 1
+
+        shown = row + 1
+        segments = np.empty((self._values.shape[1], shown, 2))
+        segments[:, :, 0] = self._ticks[:shown]
+        segments[:, :, 1] = self._values[:shown].T
+        self.lines.set_segments(segments)
+        first, last = self._ticks[0], self._ticks[row]
+        self.ax.set_xlim(first, last if last > first else first + 1)
@@ -17,6 +17,9 @@ class parallelSimulation:
         The path to the folder with the pickle files from which the Simulation parameters are read.
         The path to where the output shall be written.
 
+    Chunks written by Experiment.run_on_cluster are now run by :mod:`defSim.tools.JobRunner`. This script is kept to
+    run chunk files of the older format.
+
     """
     def main(self):
         args = sys.argv
@@ -31,11 +34,12 @@ class parallelSimulation:
         self.focal_agent_selector = meta_parameter_dict["focal_agent_selector"]
         self.neighbor_selector = meta_parameter_dict["neighbor_selector"]
         self.influence_function = meta_parameter_dict["influence_function"]
-        self.influencable_attributes = meta_parameter_dict["influencable_attributes"]
-        self.network_modifier = meta_parameter_dict["network_modifier"]
+        self.influenceable_attributes = meta_parameter_dict["influenceable_attributes"]
+        self.network_modifiers = meta_parameter_dict["network_modifiers"]
         self.dissimilarity_measure = meta_parameter_dict["dissimilarity_measure"]
         self.stop_condition = meta_parameter_dict["stop_condition"]
         self.max_iterations = meta_parameter_dict["max_iterations"]
+        self.output_realizations = meta_parameter_dict["output_realizations"]
         parameter_dicts = meta_parameter_dict["parameter_dicts"]
 
         pool = mp.Pool(mp.cpu_count())
@@ -61,15 +65,17 @@ class parallelSimulation:
                                 focal_agent_selector=self.focal_agent_selector,
                                 neighbor_selector=self.neighbor_selector,
                                 influence_function=self.influence_function,
-                                influenceable_attributes= self.influencable_attributes,
+                                influenceable_attributes=self.influenceable_attributes,
                                 stop_condition=self.stop_condition,
                                 max_iterations=self.max_iterations,
-                                network_modifier= self.network_modifier,
-                                dissimilarity_measure= self.dissimilarity_measure,
+                                network_modifiers=self.network_modifiers,
+                                dissimilarity_measure=self.dissimilarity_measure,
                                 communication_regime=parameter_dict["communication_regime"],
-                                parameter_dict=parameter_dict
+                                parameter_dict=parameter_dict,
+                                output_realizations=self.output_realizations,
+                                seed=parameter_dict.get("seed")
                                 )
-        return simulation.run()
+        return simulation.run(show_progress=False)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,267 @@
+import json
+import math
+import numbers
+import os
+import pathlib
+import statistics
+import numpy as np
+from typing import List
+
+
+class CostModel:
+    """
+    This class predicts the runtime of simulations from their parameters, so the longest simulations of an experiment
+    can be started first. It fits a log-linear model: the logarithm of the runtime is a linear function of every
+    numeric parameter x and of log(x) (so runtimes can scale as a power of e.g. num_agents), and an indicator for each
+    value of the other parameters. Values below 0.001 use the logarithm of 0.001, so parameters that can be zero are
+    encoded in the same way as other parameters. A small ridge penalty keeps the model stable when there are few
+    samples.
+
+    :param float=1e-3 ridge: The strength of the ridge penalty.
+    """
+
+    def __init__(self, ridge: float = 1e-3):
+        self.ridge = ridge
+        self.feature_names = []
+        self.coefficients = None
+        self.num_samples = 0
+        self.residual_std = 0.0
+
+    def fit(self, parameter_dicts: List[dict], seconds: List[float]) -> 'CostModel':
+        """
+        Fits the model to measured runtimes.
+
+        :param parameter_dicts: The parameters of the measured simulations.
+        :param seconds: The runtime of each simulation in seconds.
+        :returns: The fitted model itself.
+        """
+        samples = [(parameter_dict, runtime) for parameter_dict, runtime in zip(parameter_dicts, seconds)
+                   if runtime > 0]
+        if not samples:
+            raise ValueError("At least one positive runtime is needed to fit a cost model")
+        features = [_features(parameter_dict) for parameter_dict, _ in samples]
+        self.feature_names = sorted({name for sample_features in features for name in sample_features})
+        design = self._design_matrix(features)
+        target = np.log([runtime for _, runtime in samples])
+
+        penalty = self.ridge * np.eye(design.shape[1])
+        penalty[0, 0] = 0  # the intercept is not penalized
+        self.coefficients = np.linalg.solve(design.T @ design + penalty, design.T @ target)
+
+        # spread of the logarithm of the runtimes around the model, from the residuals if there are enough samples
+        self.num_samples = len(target)
+        degrees_of_freedom = len(target) - design.shape[1]
+        if degrees_of_freedom > 0:
+            residuals = target - design @ self.coefficients
+            self.residual_std = float(np.sqrt(np.sum(residuals ** 2) / degrees_of_freedom))
+        else:
+            self.residual_std = float(np.std(target, ddof=1)) if len(target) > 1 else 0.0
+        return self
+
+    def predict(self, parameter_dicts: List[dict]) -> np.ndarray:
+        """
+        :param parameter_dicts: The parameters of simulations.
+        :returns: An array with the predicted runtime of each simulation in seconds.
+        """
+        if self.coefficients is None:
+            raise ValueError("The cost model has not been fitted")
+        return np.exp(self._design_matrix([_features(parameter_dict) for parameter_dict in parameter_dicts]) @
+                      self.coefficients)
+
+    def _design_matrix(self, features: List[dict]) -> np.ndarray:
+        design = np.zeros((len(features), len(self.feature_names) + 1))
+        design[:, 0] = 1
+        columns = {name: column for column, name in enumerate(self.feature_names, start=1)}
+        for row, sample_features in enumerate(features):
+            for name, value in sample_features.items():
+                if name in columns:  # parameter values that were not seen in the samples are ignored
+                    design[row, columns[name]] = value
+        return design
+
+
+class RuntimeEstimate(float):
+    """
+    The estimated runtime of an experiment in seconds, as returned by Experiment.estimate_runtime. Its value is the
+    expected wall-clock time on num_cores cores, and it can be used as a number. It also holds a confidence interval and
+    the expected total CPU time.
+
+    :param seconds: The expected wall-clock time in seconds.
+    :param lower: The lower bound of the confidence interval of the wall-clock time.
+    :param upper: The upper bound of the confidence interval of the wall-clock time.
+    :param num_cores: The number of cores the estimate is for.
+    :param cpu_seconds: The expected total CPU time in seconds.
+    :param confidence: The confidence level of the interval.
+    :param predictions: The expected runtime of each simulation in seconds.
+    """
+
+    def __new__(cls, seconds: float, lower: float, upper: float, num_cores: int = 1, cpu_seconds: float = None,
+                confidence: float = .9, predictions: np.ndarray = None):
+        estimate = super().__new__(cls, seconds)
+        estimate.lower = lower
+        estimate.upper = upper
+        estimate.num_cores = num_cores
+        estimate.cpu_seconds = cpu_seconds if cpu_seconds is not None else seconds * num_cores
+        estimate.confidence = confidence
+        estimate.predictions = predictions
+        return estimate
+
+    def __str__(self):
+        return "{:.1f} seconds on {} core(s) ({:.0%} interval {:.1f} to {:.1f} seconds)".format(
+            float(self), self.num_cores, self.confidence, self.lower, self.upper)
+
+    def __reduce__(self):
+        return (RuntimeEstimate, (float(self), self.lower, self.upper, self.num_cores, self.cpu_seconds,
+                                  self.confidence, self.predictions))
+
+
+class RuntimeModel:
+    """
+    This class predicts the runtime of simulations from pilot runs: one :class:`CostModel` for the setup time, one for
+    the time per step, and one for the number of steps until the simulation stops. Pilot runs that were stopped early
+    (e.g. by a time budget) only give a lower bound for their number of steps. For them, max_iterations is used as the
+    upper bound, and the number of steps is modelled at the geometric mean of both bounds.
+
+    :param float=1e-3 ridge: The strength of the ridge penalty of the cost models.
+    """
+
+    def __init__(self, ridge: float = 1e-3):
+        self.setup_model = CostModel(ridge=ridge)
+        self.step_model = CostModel(ridge=ridge)
+        self.steps_model = CostModel(ridge=ridge)
+        self.lower_steps_model = CostModel(ridge=ridge)
+        self.upper_steps_model = CostModel(ridge=ridge)
+
+    def fit(self, parameter_dicts: List[dict], pilots: List[dict]) -> 'RuntimeModel':
+        """
+        Fits the models to pilot runs.
+
+        :param parameter_dicts: The parameters of the pilot runs.
+        :param pilots: For each pilot run a dictionary with the setup time ('setup_seconds'), the time per step
+            ('step_seconds'), the number of steps ('steps'), whether the run was stopped early ('censored') and the
+            maximum number of steps ('max_iterations').
+        :returns: The fitted model itself.
+        """
+        lower_steps = [max(1, pilot['steps']) for pilot in pilots]
+        upper_steps = [max(lower, pilot['max_iterations']) if pilot['censored'] else lower
+                       for lower, pilot in zip(lower_steps, pilots)]
+        self.setup_model.fit(parameter_dicts, [max(pilot['setup_seconds'], 1e-9) for pilot in pilots])
+        self.step_model.fit(parameter_dicts, [max(pilot['step_seconds'], 1e-9) for pilot in pilots])
+        self.steps_model.fit(parameter_dicts, [math.sqrt(lower * upper)
+                                               for lower, upper in zip(lower_steps, upper_steps)])
+        self.lower_steps_model.fit(parameter_dicts, lower_steps)
+        self.upper_steps_model.fit(parameter_dicts, upper_steps)
+        return self
+
+    def predict(self, parameter_dicts: List[dict], max_iterations: int = None) -> tuple:
+        """
+        :param parameter_dicts: The parameters of simulations.
+        :param max_iterations: The maximum number of steps of the simulations, which caps the predicted steps.
+        :returns: A tuple of three arrays with the expected runtime of each simulation in seconds, and its value with
+            the lower and upper number of steps.
+        """
+        setup = self.setup_model.predict(parameter_dicts)
+        step = self.step_model.predict(parameter_dicts)
+        steps = [model.predict(parameter_dicts) for model in [self.steps_model, self.lower_steps_model,
+                                                                self.upper_steps_model]]
+        if max_iterations is not None:
+            steps = [np.minimum(predicted_steps, max_iterations) for predicted_steps in steps]
+        return tuple(setup + step * predicted_steps for predicted_steps in steps)
+
+    def estimate(self, parameter_dicts: List[dict], num_cores: int = 1, confidence: float = .9,
+                 max_iterations: int = None) -> RuntimeEstimate:
+        """
+        Estimates the runtime of a set of simulations. The wall-clock time on num_cores cores is the total runtime
+        divided by the number of cores, but at least the runtime of the longest simulation. The confidence interval
+        combines the uncertainty of the models, which shrinks with the number of pilot runs, with the range of steps
+        of pilot runs that were stopped early.
+
+        :param parameter_dicts: The parameters of the simulations.
+        :param int=1 num_cores: The number of cores the simulations run on.
+        :param float=.9 confidence: The confidence level of the interval.
+        :param max_iterations: The maximum number of steps of the simulations.
+        :returns: A RuntimeEstimate.
+        """
+        expected, lower, upper = self.predict(parameter_dicts, max_iterations=max_iterations)
+        z = statistics.NormalDist().inv_cdf((1 + confidence) / 2)
+        model_std = math.sqrt(self.step_model.residual_std ** 2 + self.steps_model.residual_std ** 2)
+        spread = math.exp(z * model_std / math.sqrt(max(1, self.step_model.num_samples)))
+
+        def wall_clock(runtimes):
+            return max(np.sum(runtimes) / num_cores, np.max(runtimes, initial=0))
+
+        return RuntimeEstimate(wall_clock(expected), lower=wall_clock(lower) / spread, upper=wall_clock(upper) * spread,
+                               num_cores=num_cores, cpu_seconds=float(np.sum(expected)), confidence=confidence,
+                               predictions=expected)
+
+
+class RuntimeLog:
+    """
+    This class appends the runtimes of simulations to a file with one JSON record per line, so cost models can be
+    fitted on the timings of previous runs. Each record is written at once, so worker processes can share a log.
+    Only parameters with numbers, strings, booleans or None as values are recorded.
+
+    :param path: Path to the log file. It is created if it does not exist.
+    """
+
+    def __init__(self, path: str or pathlib.Path):
+        self.path = pathlib.Path(path).resolve()
+
+    def record(self, parameter_dict: dict, seconds: float):
+        """
+        Adds the runtime of a simulation to the log.
+
+        :param parameter_dict: The parameters of the simulation.
+        :param seconds: The runtime of the simulation in seconds.
+        """
+        parameters = {str(key): value for key, value in parameter_dict.items() if _is_scalar(value)}
+        line = json.dumps({'parameters': parameters, 'seconds': seconds}, default=float) + '\n'
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        file_descriptor = os.open(str(self.path), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(file_descriptor, line.encode('utf-8'))
+        finally:
+            os.close(file_descriptor)
+
+    def read(self) -> tuple:
+        """
+        :returns: A tuple with a list of the recorded parameter dictionaries and a list of the recorded runtimes.
+            Lines that cannot be read (e.g. from an interrupted write) are skipped.
+        """
+        parameter_dicts, seconds = [], []
+        if not self.path.exists():
+            return parameter_dicts, seconds
+        with open(self.path) as log_file:
+            for line in log_file:
+                try:
+                    record = json.loads(line)
+                    parameter_dicts.append(record['parameters'])
+                    seconds.append(float(record['seconds']))
+                except (ValueError, KeyError, TypeError):
+                    continue
+        return parameter_dicts, seconds
+
+
+def _is_scalar(value) -> bool:
+    return value is None or isinstance(value, (numbers.Number, str, bool, np.generic))
+
+
+_min_log_value = 1e-3  # the logarithm of smaller values (and of zero and negative values) is that of this value
+
+
+def _features(parameter_dict: dict) -> dict:
+    """
+    Turns the parameters of a simulation into the features of the cost model.
+    """
+    features = {}
+    for key, value in parameter_dict.items():
+        if key in ('seed', 'np_random_generator') or not _is_scalar(value):
+            continue
+        if isinstance(value, np.generic):
+            value = value.item()
+        if isinstance(value, numbers.Real) and not isinstance(value, bool):
+            # every value is encoded in the same way, so 0 and 1 differ although log(1) = 0
+            features['{}'.format(key)] = float(value)
+            features['log({})'.format(key)] = math.log(max(value, _min_log_value))
+        else:
+            features['{}={!r}'.format(key, value)] = 1.0
+    return features
@@ -1,7 +1,9 @@
+import numpy as np
 import pandas as pd
 import pathlib
 from pathlib import Path
 from abc import ABC, abstractmethod
+from defSim.tools.TickwiseRecorder import read_tickwise, TrajectoryHistogram
 
 
 class DataFileCreator(ABC):
@@ -24,6 +26,18 @@ class DataFileCreator(ABC):
 
         pass
 
+    def create_file_from_chunks(self, chunks, output_path: str or Path, **kwargs):
+        """
+        This method receives an iterable of Pandas DataFrames which together form the output table, and generates an
+        output file. By default, the chunks are combined and passed to create_file. File types that can be appended to
+        override this method to write the chunks one by one.
+
+        :param chunks: An iterable of Pandas DataFrames.
+        :param output_path: ...
+        """
+
+        self.create_file(output_table=pd.concat(chunks), output_path=output_path, **kwargs)
+
 
 class PickleFileCreator(DataFileCreator):
     def create_file(self, output_table: pd.DataFrame, output_path: str or pathlib.Path, **kwargs):
@@ -46,6 +60,17 @@ class CSVFileCreator(DataFileCreator):
         # create new output file
         output_table.to_csv(path_or_buf=output_path, **kwargs)
 
+    def create_file_from_chunks(self, chunks, output_path: str or pathlib.Path, **kwargs):
+        # file path for output type
+        output_path = output_path.with_suffix('.csv')
+        # remove file if output file already exists at given path
+        if output_path.exists():
+            output_path.unlink()
+        # create new output file, append every chunk after the first
+        for chunk_index, chunk in enumerate(chunks):
+            chunk.to_csv(path_or_buf=output_path, mode='w' if chunk_index == 0 else 'a', header=chunk_index == 0,
+                         **kwargs)
+
 
 class HDF5FileCreator(DataFileCreator):
     def create_file(self, output_table: pd.DataFrame, output_path: str or pathlib.Path, **kwargs):
@@ -121,11 +146,87 @@ class MarkdownFileCreator(DataFileCreator):
             output_table.to_markdown(buf=outfile, **kwargs)
 
 
+class ResultStream:
+    """
+    This class writes the output table of an experiment to a CSV file while the simulations are still running.
+    Results are collected in a buffer of at most buffer_size rows, which is appended to the file whenever it is full, so
+    memory usage does not grow with the number of simulations and finished work is kept on disk if the experiment stops
+    early. Tickwise columns are written to separate files, named as by :func:`create_data_files`.
+
+    :param output_folder_path: Path to folder where output files are stored. If None, a folder 'output' in the current
+        working directory is used.
+    :param output_file_name: Name of the output file, which must be a CSV file.
+    :raises: ValueError if the output file has another suffix than '.csv'.
+    :param int=1000 buffer_size: The maximum number of rows that is kept in memory before writing them to the file.
+    """
+
+    def __init__(self, output_folder_path: str or Path = None, output_file_name: str = 'outputfile.csv',
+                 buffer_size: int = 1000, **kwargs):
+        if output_folder_path is not None:
+            self.output_folder = Path(output_folder_path).resolve()
+        else:
+            self.output_folder = Path('.', 'output').resolve()
+        if Path(output_file_name).suffix.lower() not in ('', '.csv'):
+            raise ValueError("Results can only be streamed to a CSV file, not to {}".format(output_file_name))
+        self.output_folder.mkdir(parents=True, exist_ok=True)
+        self.output_path = self.output_folder / Path(output_file_name).with_suffix('.csv').name
+        if self.output_path.exists():
+            self.output_path.unlink()
+        self.buffer_size = max(1, int(buffer_size))
+        self.kwargs = kwargs
+        self.rows_written = 0
+        self._buffer = []
+        self._buffered_rows = 0
+
+    def append(self, output_table: pd.DataFrame):
+        """
+        Adds rows to the output table, and writes the buffer to the file if it is full.
+
+        :param output_table: A Pandas DataFrame with one or more rows of results.
+        """
+        self._buffer.append(output_table)
+        self._buffered_rows += len(output_table)
+        if self._buffered_rows >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        """
+        Appends all buffered rows to the file.
+        """
+        if not self._buffer:
+            return
+        output_table = pd.concat(self._buffer).reset_index(drop=True)
+        output_table.index = range(self.rows_written, self.rows_written + len(output_table))
+        self._buffer = []
+        self._buffered_rows = 0
+
+        tickwise_columns = [column for column in output_table.columns if str(column).startswith('Tickwise_')]
+        tickwise_dataframes = unpack_tickwise_columns(output_table, tickwise_columns)
+        create_tickwise_files(tickwise_dataframes=tickwise_dataframes, output_folder=self.output_folder,
+                              realization=CSVFileCreator(), **self.kwargs)
+
+        output_table.drop(tickwise_columns, axis='columns').to_csv(
+            path_or_buf=self.output_path, mode='w' if self.rows_written == 0 else 'a', header=self.rows_written == 0,
+            **self.kwargs)
+        self.rows_written += len(output_table)
+
+    def read(self) -> pd.DataFrame:
+        """
+        Flushes the buffer and reads the complete output table from the file.
+
+        :returns: A Pandas DataFrame without the tickwise columns.
+        """
+        self.flush()
+        if not self.output_path.exists():
+            return pd.DataFrame()
+        return pd.read_csv(self.output_path, index_col=0)
+
+
 def unpack_tickwise_column(tickwise_column):
     """
     This function turns a column containing tickwise data into its own dataframe. 
-    In output from simulations, columns of tickwise data contain a list of lists.
-    Each sub-list represents values from one tick.
+    In output from simulations, columns of tickwise data contain a two-dimensional array (or a list of lists).
+    Each row represents values from one tick.
 
     :param tickwise_column: Pandas dataframe consisting of a single column with tickwise data.
 
@@ -137,17 +238,53 @@ def unpack_tickwise_column(tickwise_column):
     output_dataframes = {}
 
     for index, row in tickwise_column.iterrows():
-        output_dataframes[index] = pd.DataFrame(row[0])
+        output_dataframes[index] = pd.DataFrame(row.iloc[0])
 
     return output_dataframes
 
 
+def unpack_tickwise_columns(output_table: pd.DataFrame, tickwise_columns: list) -> dict:
+    """
+    This function unpacks the tickwise columns of an output table. Agent features are kept as (possibly memory mapped)
+    arrays, so they can be written in chunks, other tickwise data is turned into a dataframe.
+
+    :param output_table: Pandas dataframe with the tickwise columns.
+    :param tickwise_columns: The names of the tickwise columns.
+
+    :returns: A dictionary indexed first by the name of the tickwise column and then by the index of the row.
+    """
+
+    tickwise_dataframes = {}
+    for column in tickwise_columns:
+        tickwise_dataframes[column] = {}
+        for index, value in output_table[column].items():
+            if isinstance(value, (str, Path, np.ndarray, TrajectoryHistogram)):
+                tickwise_dataframes[column][index] = read_tickwise(value)
+            else:
+                tickwise_dataframes[column][index] = pd.DataFrame(value)
+    return tickwise_dataframes
+
+
+def iterate_tickwise_chunks(tickwise_array: np.ndarray, chunk_rows: int = 10000):
+    """
+    This function turns a two-dimensional array of tickwise data into dataframes of at most chunk_rows ticks each.
+    Memory mapped arrays (such as tickwise data that was streamed to disk) are only read one chunk at a time.
+
+    :param tickwise_array: Array where columns represent values and rows represent ticks.
+    :param int=10000 chunk_rows: The maximum number of ticks per dataframe.
+    """
+
+    for start in range(0, max(1, tickwise_array.shape[0]), chunk_rows):
+        stop = min(start + chunk_rows, tickwise_array.shape[0])
+        yield pd.DataFrame(np.asarray(tickwise_array[start:stop]), index=range(start, stop))
+
+
 def create_tickwise_files(tickwise_dataframes, output_folder: Path, realization: DataFileCreator, **kwargs):
     """
     This function takes a dictionary of tickwise dataframes and stores them in files indexed by
     name of the tickwise column and simulation number.
 
-    :param tickwise_dataframes: Dictionary containing dataframes indexed first by
+    :param tickwise_dataframes: Dictionary containing dataframes (or two-dimensional arrays) indexed first by
         column name and then by simulation number.
     :param output_folder: Path to folder where output files are stored.
     :param realization: DataFileCreator to apply to each dataframe. Set output path on initialization
@@ -157,7 +294,11 @@ def create_tickwise_files(tickwise_dataframes, output_folder: Path, realization:
     for column_name, rows in tickwise_dataframes.items():
         for row_index, row_data in rows.items():
             output_path = output_folder / 'outputfile_{}_{}'.format(column_name, row_index)
-            realization.create_file(output_table=row_data, output_path=output_path, **kwargs)
+            if isinstance(row_data, np.ndarray):
+                realization.create_file_from_chunks(chunks=iterate_tickwise_chunks(row_data), output_path=output_path,
+                                                    **kwargs)
+            else:
+                realization.create_file(output_table=row_data, output_path=output_path, **kwargs)
 
 
 def create_data_files(output_table: pd.DataFrame,
@@ -195,10 +336,7 @@ def create_data_files(output_table: pd.DataFrame,
     tickwise_output_table = output_table.filter(tickwise_columns, axis='columns')
     output_table = output_table.drop(tickwise_columns, axis='columns')
 
-    # unpack tickwise data
-    tickwise_dataframes = {}
-    for column in tickwise_columns:
-        tickwise_dataframes[column] = unpack_tickwise_column(tickwise_output_table[[column]])
+    tickwise_dataframes = unpack_tickwise_columns(tickwise_output_table, tickwise_columns)
 
     realizations = [i.lower() for i in pathlib.Path(output_file_name).suffixes]
     if not realizations:  # when list is empty
@@ -13,9 +13,12 @@ class OutputTableCreator(ABC):
     Inherit from this class and implement the create_output method to generate the desired output cell for the output table.
     If you want the output cell to have a descriptive column name, overwrite the class variable 'label'. Otherwise, 
     column names are autogenerated.
+    Intermediate results that are shared between realizations (such as the values of agents on a feature) can be
+    declared in 'requires' and read from the OutputContext that is passed to create_output as 'context'.
     """
 
     label = ""
+    requires = []
 
     def __init__(self, **kwargs):
         pass
@@ -44,7 +47,9 @@ def create_output_table(network: nx.Graph, realizations=None, colnames=None,
 
         * Basic: Returns the realizations Regions, Zones, Isolates, Homogeneity, AverageDistance
         * ClusterFinder: Method to find clusters based on minimal allowed distance between network neighbors as
-          defined by the user in the kwargs dictionary. Default is to return the same output as the Regions realization
+          defined by the user in the kwargs dictionary. Default is to return the same output as the Regions realization.
+          In directed networks, clusters are weakly connected unless 'cluster_connection' is set to 'strong' in the
+          kwargs dictionary.
         * Regions: Returns the number of regions (i.e. the number of connected components in the graph after preserving
           only the links with perfect similarity)
         * RegionsList: Returns a list with the sizes of all regions (i.e. the number of agents in each connected
@@ -70,15 +75,13 @@ def create_output_table(network: nx.Graph, realizations=None, colnames=None,
     :param agents: A list of the indices of all agents that will be considered by the output table.
     :param settings_dict: A dictionary of column names and values that will be added to the output table. Can be used
         to merge output with parameter setting values.
-    :param tickwise_output: A dictionary with a list of lists with values of agents on some given feature at each tick
-        during the simulation run. This function will create a column for each key in the dictionary.
+    :param tickwise_output: A dictionary with a two-dimensional array (or list of lists) with values of agents on some
+        given feature at each recorded tick during the simulation run. This function will create a column for each key
+        in the dictionary.
 
     :returns: A dictionary.
     """
 
-    # work on a copy of the network, to avoid permanently altering anything
-    network = network.copy()
-
     if colnames is None:
         colnames = []
     if realizations is None:
@@ -90,73 +93,89 @@ def create_output_table(network: nx.Graph, realizations=None, colnames=None,
     if agents is None:
         agents = []
 
+    # work on a read-only view of the network, to avoid permanently altering anything without copying it
     if len(agents) > 0:
-        removenodes = list(set(list(network.nodes())) - set(agents))
-        for i in removenodes:
-            network.remove_node(i)
+        network = network.subgraph(agents)
+    else:
+        network = nx.graphviews.generic_graph_view(network)
 
-    from .OutputMeasures import ClusterFinder, AverageDistanceReporter, AverageOpinionReporter, SpreadReporter, DispersionReporter, CoverageReporter
+    from .OutputMeasures import OutputContext, ClusterFinder, AverageDistanceReporter, AverageOpinionReporter, SpreadReporter, DispersionReporter, CoverageReporter
 
     # Initialize output dictionary by including settings for the simulation run
     output = settings_dict
 
     # Create default outputs (called by name)
-    ## workaround to call the ClusterFinder method only once
+    ## all reporters share one context, so intermediate results (clusters, feature values, distances) are computed once
     cluster_dissimilarity_threshold = kwargs.get('cluster_dissimilarity_threshold', 0)
     strict_zones = kwargs.get('strict_zones', False)
-    if any([i in realizations for i in ["Clusters", "ClusterList", "Basic", "Isolates", "Homogeneity"]]):
-        clusterlist = ClusterFinder(cluster_dissimilarity_threshold=cluster_dissimilarity_threshold, strict_zones=strict_zones).create_output(network, **kwargs)
+    cluster_connection = kwargs.get('cluster_connection', 'weak')
+    context = OutputContext(network)
+    reporters = {}
+    clusters = ClusterFinder(cluster_dissimilarity_threshold=cluster_dissimilarity_threshold, strict_zones=strict_zones, connection=cluster_connection)
+    if any([i in realizations for i in ["ClusterFinder", "ClusterFinderList", "ClusterList", "Basic", "Isolates", "Homogeneity"]]):
+        reporters['Clusters'] = clusters
+    if any([i in realizations for i in ["RegionsList", "Regions", "Basic"]]):
+        reporters['Regions'] = ClusterFinder(connection=cluster_connection)
+    if any([i in realizations for i in ["ZonesList", "Zones", "Basic"]]):
+        reporters['Zones'] = ClusterFinder(strict_zones=True, connection=cluster_connection)
+    if any([i in realizations for i in ["AverageDistance", "Basic"]]):
+        reporters['AverageDistance'] = AverageDistanceReporter()
+    if any([i in realizations for i in ["AverageOpinion", "Basic"]]):
+        for i in kwargs.get("AverageOpinionFeatures", ['f01']):
+            reporters['AverageOpinion{}'.format(i)] = AverageOpinionReporter(feature=i)
+    if "Spread" in realizations:
+        for i in kwargs.get("SpreadOpinionFeatures", ['f01']):
+            reporters['Spread{}'.format(i)] = SpreadReporter(feature=i)
+    if "Dispersion" in realizations:
+        for i in kwargs.get("DispersionOpinionFeatures", ['f01']):
+            reporters['Dispersion{}'.format(i)] = DispersionReporter(feature=i)
+    if "Coverage" in realizations:
+        for i in kwargs.get("CoverageOpinionFeatures", ['f01']):
+            reporters['Coverage{}'.format(i)] = CoverageReporter(feature=i)
+    context.prepare(reporters.values())
 
     # Output related to clustering
-    if "ClusterList" in realizations:
+    if 'Clusters' in reporters:
+        clusterlist = clusters.create_output(network, context=context)
+    if any([i in realizations for i in ["ClusterList", "ClusterFinderList"]]):
         output['ClusterList'] = clusterlist
     if "ClusterFinder" in realizations:
         output['Clusters'] = len(clusterlist)
     if "RegionsList" in realizations:
-        output['RegionsList'] = ClusterFinder().create_output(network)
+        output['RegionsList'] = reporters['Regions'].create_output(network, context=context)
     if any([i in realizations for i in ["Regions", "Basic"]]):
-        output['Regions'] = len(ClusterFinder().create_output(network))
+        output['Regions'] = len(reporters['Regions'].create_output(network, context=context))
     if "ZonesList" in realizations:
-        output['ZonesList'] = ClusterFinder(strict_zones=True).create_output(network)
+        output['ZonesList'] = reporters['Zones'].create_output(network, context=context)
     if any([i in realizations for i in ["Zones", "Basic"]]):
-        output['Zones'] = len(ClusterFinder(strict_zones=True).create_output(network))
+        output['Zones'] = len(reporters['Zones'].create_output(network, context=context))
     if "Isolates" in realizations:
         output['Isolates'] = clusterlist.count(1)
     if any([i in realizations for i in ["Homogeneity", "Basic"]]):
         output['Homogeneity'] = clusterlist[0] / len(network.nodes())
 
     # Output related to opinions and opinion distances
-    if any([i in realizations for i in ["AverageDistance", "Basic"]]):
-        output['AverageDistance'] = AverageDistanceReporter().create_output(network)
-    if any([i in realizations for i in ["AverageOpinion", "Basic"]]):
-        opinionfeatures = kwargs.get("AverageOpinionFeatures", ['f01'])
-        for i in opinionfeatures:
-            output['AverageOpinion{}'.format(i)] = AverageOpinionReporter(feature = i).create_output(network)
-    if "Spread" in realizations:
-        opinionfeatures = kwargs.get("SpreadOpinionFeatures", ['f01'])
-        for i in opinionfeatures:
-            output['Spread{}'.format(i)] = SpreadReporter(feature=i).create_output(network)
-    if "Dispersion" in realizations:
-        opinionfeatures = kwargs.get("DispersionOpinionFeatures", ['f01'])
-        for i in opinionfeatures:
-            output['Dispersion{}'.format(i)] = DispersionReporter(feature=i).create_output(network)
-    if "Coverage" in realizations:
-        opinionfeatures = kwargs.get("CoverageOpinionFeatures", ['f01'])
-        for i in opinionfeatures:
-            output['Coverage{}'.format(i)] = CoverageReporter(feature=i).create_output(network)
+    for name, reporter in reporters.items():
+        if not isinstance(reporter, ClusterFinder):
+            output[name] = reporter.create_output(network, context=context)
 
     # Output the entire networkX Graph object
     if "Graph" in realizations:
-        output['Graph'] = network
+        output['Graph'] = network.copy()
 
     # Create custom outputs (by calling implementations of OutputTableCreator)
     ## Select only those realizations which are classes (not instances of a class) and of those only if they are a subclass of OutputTableCreator
     custom_realizations = [realization for realization in realizations if (inspect.isclass(realization) and issubclass(realization, OutputTableCreator)) or isinstance(realization, OutputTableCreator)]
     for realization in custom_realizations:
+        if _accepts_context(realization):
+            context.prepare([realization])
+            realization_output = realization.create_output(network, context=context)
+        else:
+            realization_output = realization.create_output(network)
         if realization.label != "":
-            output[realization.label] = realization.create_output(network)
+            output[realization.label] = realization_output
         else:
-            output["CustomOutput{}".format(custom_realizations.index(realization))] = realization.create_output(network)
+            output["CustomOutput{}".format(custom_realizations.index(realization))] = realization_output
 
     # Add tickwise output if applicable
     if tickwise_output:
@@ -167,4 +186,16 @@ def create_output_table(network: nx.Graph, realizations=None, colnames=None,
         for i in colnames:
             output[i] = output.pop(realizations[colnames.index(i)])
 
-    return output
\ No newline at end of file
+    return output
+
+
+def _accepts_context(realization) -> bool:
+    """
+    Checks whether the create_output method of a custom realization can receive the shared OutputContext.
+    """
+    try:
+        parameters = inspect.signature(realization.create_output).parameters.values()
+    except (TypeError, ValueError):
+        return False
+    return any(parameter.name == 'context' or parameter.kind == inspect.Parameter.VAR_KEYWORD
+               for parameter in parameters)
@@ -0,0 +1,259 @@
+import pathlib
+import numpy as np
+import networkx as nx
+from typing import List, Iterator
+from defSim.tools.TickwiseRecorder import _infer_dtype
+
+
+class EventLog:
+    """
+    This class records the trajectory of agent features as a log of changes rather than as the full state at every
+    tick. Every change of a feature of an agent is stored as an event (tick, agent, feature, new value) in typed arrays,
+    and the full state is stored as a keyframe at the start and after every keyframe_interval events. Any state can be
+    reconstructed by replaying the events after the nearest keyframe, so full-resolution trajectories take memory in
+    proportion to the number of successful influence events instead of the number of ticks times the number of agents.
+
+    Pass the names of the features to record to a :class:`~defSim.Simulation.Simulation` (or an
+    :class:`~defSim.Experiment.Experiment`) as event_log, and read the log from the EventLog column of the output::
+
+        results = Simulation(..., event_log=['f01', 'f02']).run()
+        event_log = results['EventLog'][0]
+        for tick, state in event_log.iter_states(0, event_log.last_tick, step=100):
+            ...
+
+    After each step, the features of the focal agent and its selected neighbors are compared to their last recorded
+    values, so influence functions that change other agents are not fully recorded. The state at tick t is the state
+    after t steps, and the state at tick 0 is the initial state.
+
+    :param features: The names of the agent features to record.
+    :param int=None keyframe_interval: The number of events between two keyframes. If None, it is the number of values
+        in a keyframe (agents times features), so keyframes take at most as much memory as the events and any state is
+        reconstructed from at most that many events.
+    :param int=1024 expected_events: The number of events to allocate memory for when recording starts. The arrays grow
+        geometrically if more events are recorded.
+    """
+
+    growth_factor = 2
+
+    def __init__(self, features: List[str], keyframe_interval: int = None, expected_events: int = 1024):
+        self.features = list(features)
+        self.keyframe_interval = keyframe_interval
+        self.expected_events = max(1, int(expected_events))
+        self.agents = []
+        self.dtype = None
+        self.num_events = 0
+        self.last_tick = 0
+        self.keyframe_ticks = []
+        self.keyframe_events = []  # the number of events before each keyframe
+        self.keyframes = []
+        self._ticks = self._agents = self._features = self._values = None
+        self._state = None
+        self._agent_indices = {}
+        self._events_since_keyframe = 0
+
+    def start(self, network: nx.Graph, agents: List[int], tick: int = 0):
+        """
+        Removes all recorded events and stores the current state of the network as the first keyframe.
+
+        :param network: The network in which the agents exist.
+        :param agents: A list of the indices of all agents, in the order of the columns of reconstructed states.
+        :param int=0 tick: The current tick of the simulation.
+        """
+        self.agents = list(agents)
+        self._agent_indices = {agent: index for index, agent in enumerate(self.agents)}
+        nodes = network.nodes
+        values = [nodes[agent][feature] for agent in self.agents for feature in self.features]
+        self.dtype = _infer_dtype(values) if self.dtype is None else self.dtype
+        if self.dtype == object:
+            raise TypeError("Only numeric features can be recorded in an event log")
+        if np.dtype(self.dtype).kind == 'f':
+            self.dtype = np.float64  # changes smaller than float32 precision are still recorded exactly
+        self._state = np.array(values, dtype=self.dtype).reshape(len(self.agents), len(self.features))
+        if self.keyframe_interval is None:
+            self.keyframe_interval = max(1, self._state.size)
+
+        self._ticks = np.empty(self.expected_events, dtype=np.int64)
+        self._agents = np.empty(self.expected_events, dtype=np.int32)
+        self._features = np.empty(self.expected_events, dtype=np.int16)
+        self._values = np.empty(self.expected_events, dtype=self.dtype)
+        self.num_events = 0
+        self.last_tick = tick
+        self.keyframe_ticks, self.keyframe_events, self.keyframes = [], [], []
+        self._add_keyframe(tick)
+
+    def record(self, network: nx.Graph, tick: int, agents):
+        """
+        Records the changes of the features of some agents.
+
+        :param network: The network in which the agents exist.
+        :param tick: The tick after the step in which the agents may have changed.
+        :param agents: The agents that may have changed, as an index or a list of indices.
+        """
+        nodes = network.nodes
+        state = self._state
+        if not isinstance(agents, (list, tuple, set)):
+            agents = [agents]
+        for agent in agents:
+            row = self._agent_indices[agent]
+            attributes = nodes[agent]
+            for column, feature in enumerate(self.features):
+                value = attributes[feature]
+                if value != state[row, column]:
+                    state[row, column] = value
+                    self._append(tick, row, column, value)
+        self.last_tick = tick
+        if self._events_since_keyframe >= self.keyframe_interval:
+            self._add_keyframe(tick)
+
+    def events(self) -> np.ndarray:
+        """
+        :returns: A structured array with the fields tick, agent, feature and value, with one element per event in the
+            order in which they happened. Agents and features are given by their index in self.agents and
+            self.features.
+        """
+        events = np.empty(self.num_events, dtype=[('tick', np.int64), ('agent', np.int32), ('feature', np.int16),
+                                                  ('value', self.dtype if self.dtype is not None else np.float64)])
+        if self.num_events > 0:
+            events['tick'] = self._ticks[:self.num_events]
+            events['agent'] = self._agents[:self.num_events]
+            events['feature'] = self._features[:self.num_events]
+            events['value'] = self._values[:self.num_events]
+        return events
+
+    def state_at(self, tick: int) -> np.ndarray:
+        """
+        :param tick: The number of steps after which the state is reconstructed.
+        :returns: An array with one row per agent (in the order of self.agents) and one column per feature.
+        """
+        if not self.keyframes:
+            raise ValueError("The event log has not been started")
+        keyframe = max(0, int(np.searchsorted(self.keyframe_ticks, tick, side='right')) - 1)
+        state = self.keyframes[keyframe].copy()
+        end = int(np.searchsorted(self._ticks[:self.num_events], tick, side='right'))
+        self._apply(state, self.keyframe_events[keyframe], end)
+        return state
+
+    def iter_states(self, start: int = 0, stop: int = None, step: int = 1) -> Iterator[tuple]:
+        """
+        Iterates over the states at the ticks range(start, stop + 1, step). The first state is reconstructed from the
+        nearest keyframe, the following states by applying the events in between.
+
+        :param int=0 start: The first tick.
+        :param int=None stop: The last tick. If None, the last recorded tick.
+        :param int=1 step: The number of ticks between two states.
+        :returns: An iterator over (tick, state) tuples. The same array is updated in place for every state, so copy it
+            to keep a state.
+        """
+        stop = self.last_tick if stop is None else stop
+        ticks = self._ticks[:self.num_events]
+        state = self.state_at(start)
+        position = int(np.searchsorted(ticks, start, side='right'))
+        for tick in range(start, stop + 1, step):
+            end = int(np.searchsorted(ticks, tick, side='right'))
+            self._apply(state, position, end)
+            position = end
+            yield tick, state
+
+    def trajectory(self, feature: str, agent: int) -> tuple:
+        """
+        :returns: A tuple of two arrays with the ticks at which the feature of the agent changed and its new values,
+            starting with its value at the first keyframe.
+        """
+        row, column = self._agent_indices[agent], self.features.index(feature)
+        selected = np.flatnonzero((self._agents[:self.num_events] == row) &
+                                  (self._features[:self.num_events] == column))
+        ticks = np.concatenate(([self.keyframe_ticks[0]], self._ticks[selected]))
+        values = np.concatenate(([self.keyframes[0][row, column]], self._values[selected]))
+        return ticks, values
+
+    @property
+    def nbytes(self) -> int:
+        """
+        The memory used by the recorded events and keyframes in bytes.
+        """
+        event_bytes = sum(array.itemsize for array in [self._ticks, self._agents, self._features, self._values]
+                          if array is not None)
+        return self.num_events * event_bytes + sum(keyframe.nbytes for keyframe in self.keyframes)
+
+    def save(self, path: str or pathlib.Path):
+        """
+        Saves the log to a .npz file, which can be read with :meth:`load`.
+        """
+        np.savez_compressed(path, features=np.array(self.features), agents=np.array(self.agents),
+                            keyframe_ticks=np.array(self.keyframe_ticks, dtype=np.int64),
+                            keyframe_events=np.array(self.keyframe_events, dtype=np.int64),
+                            keyframes=np.array(self.keyframes), events=self.events(),
+                            info=np.array([self.keyframe_interval, self.last_tick], dtype=np.int64))
+
+    @classmethod
+    def load(cls, path: str or pathlib.Path) -> 'EventLog':
+        """
+        :returns: The EventLog saved to a .npz file.
+        """
+        with np.load(path) as data:
+            keyframe_interval, last_tick = (int(value) for value in data['info'])
+            event_log = cls(features=[str(feature) for feature in data['features']],
+                            keyframe_interval=keyframe_interval)
+            event_log.agents = data['agents'].tolist()
+            event_log._agent_indices = {agent: index for index, agent in enumerate(event_log.agents)}
+            event_log.keyframe_ticks = data['keyframe_ticks'].tolist()
+            event_log.keyframe_events = data['keyframe_events'].tolist()
+            event_log.keyframes = list(data['keyframes'])
+            events = data['events']
+        event_log.dtype = events.dtype['value']
+        event_log._ticks, event_log._agents = events['tick'].copy(), events['agent'].copy()
+        event_log._features, event_log._values = events['feature'].copy(), events['value'].copy()
+        event_log.num_events = len(events)
+        event_log.last_tick = last_tick
+        event_log._state = event_log.state_at(last_tick)
+        return event_log
+
+    def _append(self, tick: int, row: int, column: int, value):
+        if self.num_events == len(self._ticks):
+            self._grow()
+        index = self.num_events
+        self._ticks[index] = tick
+        self._agents[index] = row
+        self._features[index] = column
+        self._values[index] = value
+        self.num_events += 1
+        self._events_since_keyframe += 1
+
+    def _grow(self):
+        size = max(self.expected_events, len(self._ticks) * self.growth_factor)
+        for name in ['_ticks', '_agents', '_features', '_values']:
+            array = getattr(self, name)
+            new_array = np.empty(size, dtype=array.dtype)
+            new_array[:self.num_events] = array[:self.num_events]
+            setattr(self, name, new_array)
+
+    def _add_keyframe(self, tick: int):
+        self.keyframe_ticks.append(tick)
+        self.keyframe_events.append(self.num_events)
+        self.keyframes.append(self._state.copy())
+        self._events_since_keyframe = 0
+
+    def _apply(self, state: np.ndarray, start: int, end: int):
+        """
+        Applies the events with indices start to end (exclusive) to a state.
+        """
+        if end <= start:
+            return
+        rows, columns = self._agents[start:end], self._features[start:end]
+        # only the last change of each value counts
+        flat = rows.astype(np.int64) * state.shape[1] + columns
+        _, last = np.unique(flat[::-1], return_index=True)
+        last = end - start - 1 - last
+        state[rows[last], columns[last]] = self._values[start:end][last]
+
+    def __getstate__(self):
+        # only the recorded part of the arrays is copied
+        state = self.__dict__.copy()
+        for name in ['_ticks', '_agents', '_features', '_values']:
+            if state[name] is not None:
+                state[name] = state[name][:self.num_events].copy()
+        return state
+
+    def __repr__(self):
+        return "EventLog({} events, {} keyframes, ticks {} to {})".format(
+            self.num_events, len(self.keyframes), self.keyframe_ticks[0] if self.keyframes else 0, self.last_tick)
@@ -0,0 +1,165 @@
+import functools
+import hashlib
+import pathlib
+import pickle
+import sqlite3
+import time
+import types
+import numpy as np
+import networkx as nx
+from typing import List, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+class ExperimentStore:
+    """
+    This class stores the results of simulations in an append-only SQLite database, so an experiment can be resumed
+    after a crash or extended with new parameter values without running completed simulations again.
+
+    Each result is stored under a key that is a hash of its parameter combination (without the simulation seed and the
+    random generator that simulations add to it), the configuration of the components of the experiment, the seed of
+    the experiment and the repetition of the parameter combination. The simulation seeds of an experiment depend on
+    the number of simulations in it, so they are not part of the key: when a sweep is extended, the stored
+    repetitions of a combination are reused as they are.
+
+    The store can be used as a context manager, which closes the database connection at the end of the block.
+
+    :param path: Path to the database file. It is created if it does not exist.
+    """
+
+    def __init__(self, path: str or pathlib.Path):
+        self.path = pathlib.Path(path).resolve()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._connection = sqlite3.connect(str(self.path))
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, result BLOB NOT NULL, "
+                                 "created REAL NOT NULL)")
+        self._connection.commit()
+
+    def create_keys(self, parameter_dicts: List[dict], configuration: dict = None, seed: int = None) -> List[str]:
+        """
+        Creates the keys of a list of parameter combinations. Repeated combinations are numbered in the order in which
+        they appear in the list.
+
+        :param parameter_dicts: A list of parameter dictionaries, as created by the Experiment.
+        :param configuration: A dictionary that describes the components of the experiment.
+        :param seed: The seed of the experiment.
+        :returns: A list with one key per parameter combination.
+        """
+        configuration_repr = stable_repr(configuration if configuration is not None else {})
+        repetitions = {}
+        keys = []
+        for parameter_dict in parameter_dicts:
+            parameters_repr = stable_repr({key: value for key, value in parameter_dict.items()
+                                           if key not in ('seed', 'np_random_generator')})
+            repetition = repetitions.get(parameters_repr, 0)
+            repetitions[parameters_repr] = repetition + 1
+            key_repr = "{}|{}|{!r}|{}".format(parameters_repr, configuration_repr, seed, repetition)
+            keys.append(hashlib.sha256(key_repr.encode('utf-8')).hexdigest())
+        return keys
+
+    def completed(self, keys: List[str]) -> set:
+        """
+        :param keys: A list of keys.
+        :returns: The set of the given keys for which a result is stored.
+        """
+        completed = set()
+        keys = list(keys)
+        for start in range(0, len(keys), 500):  # stay below the maximum number of SQL variables
+            batch = keys[start:start + 500]
+            rows = self._connection.execute("SELECT key FROM results WHERE key IN ({})".format(
+                ", ".join("?" * len(batch))), batch)
+            completed.update(row[0] for row in rows)
+        return completed
+
+    def get(self, key: str) -> 'pd.DataFrame':
+        """
+        :param key: The key of a stored result.
+        :returns: The stored output table of the simulation.
+        """
+        row = self._connection.execute("SELECT result FROM results WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            raise KeyError(key)
+        return pickle.loads(row[0])
+
+    def put(self, key: str, result: 'pd.DataFrame'):
+        """
+        Stores the output table of a simulation. Results that are already stored are never replaced.
+
+        :param key: The key of the simulation.
+        :param result: The output table of the simulation.
+        """
+        self._connection.execute("INSERT OR IGNORE INTO results (key, result, created) VALUES (?, ?, ?)",
+                                 (key, pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL), time.time()))
+        self._connection.commit()
+
+    def __len__(self):
+        return self._connection.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    def close(self):
+        """
+        Closes the database connection.
+        """
+        self._connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __getstate__(self):
+        # the connection cannot be pickled, it is opened again when the store is unpickled
+        return {'path': self.path}
+
+    def __setstate__(self, state):
+        self.__init__(state['path'])
+
+
+def stable_repr(value) -> str:
+    """
+    Creates a text representation of a value that is the same in every Python session, to use in hashes. Unlike the
+    default representation, it does not contain memory addresses, and dictionaries are represented independent of
+    their order. Networks and arrays are represented by a hash of their contents, functions by their module and name,
+    and other objects by their class and attributes.
+
+    :param value: Any value used to configure an experiment.
+    :returns: A string.
+    :raises ValueError: For lambdas and functions defined inside other functions, which cannot be told apart by name.
+    """
+    if value is None or isinstance(value, (bool, int, float, complex, str, bytes)):
+        return repr(value)
+    if isinstance(value, np.generic):
+        return repr(value.item())
+    if isinstance(value, dict):
+        items = sorted((stable_repr(key), stable_repr(item)) for key, item in value.items())
+        return "{" + ", ".join("{}: {}".format(key, item) for key, item in items) + "}"
+    if isinstance(value, (list, tuple)):
+        return "[" + ", ".join(stable_repr(item) for item in value) + "]"
+    if isinstance(value, (set, frozenset)):
+        return "{" + ", ".join(sorted(stable_repr(item) for item in value)) + "}"
+    if isinstance(value, np.ndarray):
+        return "ndarray({}, {}, {})".format(value.dtype.str, value.shape,
+                                            hashlib.sha256(np.ascontiguousarray(value).tobytes()).hexdigest())
+    if isinstance(value, nx.Graph):
+        contents = stable_repr([type(value).__name__, value.graph, list(value.nodes(data=True)),
+                                list(value.edges(data=True))])
+        return "Graph({})".format(hashlib.sha256(contents.encode('utf-8')).hexdigest())
+    if isinstance(value, type):
+        return "{}.{}".format(value.__module__, value.__qualname__)
+    if isinstance(value, functools.partial):
+        return "functools.partial({})".format(stable_repr([value.func, value.args, value.keywords]))
+    if isinstance(value, (types.MethodType, types.BuiltinMethodType)) \
+            and not isinstance(value.__self__, (types.ModuleType, type(None))):
+        return "{}.{}".format(stable_repr(value.__self__), value.__name__)
+    if callable(value) and isinstance(getattr(value, '__qualname__', None), str):
+        # functions, also when wrapped by a decorator, and builtin functions
+        if '<' in value.__qualname__:  # <lambda> or <locals>
+            raise ValueError("Cannot create a key for {}: use a function defined at the top level of a module "
+                             "instead".format(value.__qualname__))
+        return "{}.{}".format(value.__module__, value.__qualname__)
+    if hasattr(value, '__dict__'):
+        return "{}({})".format(stable_repr(type(value)), stable_repr(vars(value)))
+    return "{}({!r})".format(stable_repr(type(value)), value)
@@ -0,0 +1,118 @@
+import collections
+import hashlib
+import os
+import pathlib
+import pickle
+import random
+import numpy as np
+import networkx as nx
+from defSim.tools.ExperimentStore import stable_repr
+from defSim.tools.SharedNetwork import SharedNetwork
+
+
+class InitialState:
+    """
+    This class stores the state of a simulation right after initialization: the network with the initial attributes
+    of the agents and the distances between them, and the states of the random number generators. Restoring it gives
+    exactly the same simulation as initializing it again.
+
+    :param network: The initialized network.
+    :param numpy_generator: The NumPy Generator of the simulation.
+    """
+
+    def __init__(self, network: nx.Graph, numpy_generator: np.random.Generator):
+        self.network = SharedNetwork(network)
+        self.random_state = random.getstate()
+        self.numpy_generator_state = numpy_generator.bit_generator.state
+        self.numpy_global_state = np.random.get_state()
+
+    def restore(self, numpy_generator: np.random.Generator) -> nx.Graph:
+        """
+        Sets the random number generators to their state after initialization.
+
+        :param numpy_generator: The NumPy Generator of the simulation.
+        :returns: A private copy of the initialized network.
+        """
+        random.setstate(self.random_state)
+        numpy_generator.bit_generator.state = self.numpy_generator_state
+        np.random.set_state(self.numpy_global_state)
+        return self.network.to_graph()
+
+
+class InitialStateCache:
+    """
+    This class caches the initial states of simulations, so simulations that start from the same initial condition
+    (the same network, initial attributes and seed) only generate it once. States are kept in memory, and optionally
+    also written to a folder, so they can be shared between worker processes and between runs.
+
+    :param folder_path: Path to a folder in which initial states are stored as pickle files. If None, states are only
+        kept in memory.
+    :param int=32 max_items: The maximum number of initial states that is kept in memory. The least recently used
+        state is removed first.
+    """
+
+    def __init__(self, folder_path: str or pathlib.Path = None, max_items: int = 32):
+        self.folder = pathlib.Path(folder_path).resolve() if folder_path is not None else None
+        if self.folder is not None:
+            self.folder.mkdir(parents=True, exist_ok=True)
+        self.max_items = max_items
+        self.hits = 0
+        self.misses = 0
+        self._states = collections.OrderedDict()
+
+    @staticmethod
+    def create_key(**components) -> str:
+        """
+        Creates the key of an initial condition.
+
+        :param components: All settings that determine the initial state, such as the network, topology, parameters,
+            initializers and seed.
+        :returns: A hash of the settings.
+        """
+        return hashlib.sha256(stable_repr(components).encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> InitialState or None:
+        """
+        :param key: The key of an initial condition.
+        :returns: The cached InitialState, or None if it is not in the cache.
+        """
+        state = self._states.get(key)
+        if state is None and self.folder is not None:
+            path = self.folder / '{}.pickle'.format(key)
+            if path.exists():
+                with open(path, 'rb') as state_file:
+                    state = pickle.load(state_file)
+                self._remember(key, state)
+        if state is None:
+            self.misses += 1
+            return None
+        self._states.move_to_end(key)
+        self.hits += 1
+        return state
+
+    def put(self, key: str, state: InitialState):
+        """
+        Adds an initial state to the cache.
+
+        :param key: The key of the initial condition.
+        :param state: The InitialState.
+        """
+        self._remember(key, state)
+        if self.folder is not None:
+            path = self.folder / '{}.pickle'.format(key)
+            temporary_path = path.with_suffix('.{}.tmp'.format(os.getpid()))
+            with open(temporary_path, 'wb') as state_file:
+                pickle.dump(state, state_file, protocol=pickle.HIGHEST_PROTOCOL)
+            temporary_path.replace(path)  # other processes never see a partially written state
+
+    def _remember(self, key: str, state: InitialState):
+        self._states[key] = state
+        self._states.move_to_end(key)
+        while len(self._states) > self.max_items:
+            self._states.popitem(last=False)
+
+    def __getstate__(self):
+        # worker processes start with an empty memory tier, and share states through the folder
+        state = self.__dict__.copy()
+        state['_states'] = collections.OrderedDict()
+        return state
@@ -0,0 +1,240 @@
+import time
+from defSim.focal_agent_sim import focal_agent_sim
+from defSim.neighbor_selector_sim import neighbor_selector_sim
+from defSim.influence_sim import influence_sim
+
+# the phases of a simulation step, with the names of their output columns
+_phases = {'focal_agent': 'FocalAgentSeconds',
+           'neighbor_selection': 'NeighborSelectionSeconds',
+           'influence': 'InfluenceSeconds',
+           'dissimilarity': 'DissimilaritySeconds',
+           'tickwise': 'TickwiseSeconds',
+           'convergence': 'ConvergenceSeconds'}
+
+
+class Instrumentation:
+    """
+    This class measures where a simulation spends its time. It is used by
+    :meth:`~defSim.Simulation.Simulation.run` with instrument=True, which replaces the components of the simulation by
+    stand-ins that time them for the duration of the run, so the steps are still run by
+    :meth:`~defSim.Simulation.Simulation.run_step`, and simulations that are not instrumented are not slowed down.
+    It accumulates the wall-clock time of each phase of a step (the selection of the focal agent and its neighbors, the
+    influence step, the recording of tickwise output and the convergence checks) and counts the influence attempts and
+    successes, the selected neighbors and the recomputed distances. The time spent recomputing distances is part of
+    the time of the influence step, and is also reported on its own.
+
+    After the run, the measurements are added to the output of the simulation as extra columns, and the instrumentation
+    is available as simulation.instrumentation::
+
+        simulation.run(instrument=True)
+        print(simulation.instrumentation.summary())
+    """
+
+    def __init__(self):
+        self.seconds = {phase: 0.0 for phase in _phases}
+        self.total_seconds = 0.0
+        self.steps = 0
+        self.influence_attempts = 0
+        self.influence_successes = 0
+        self.selected_neighbors = 0
+        self.distance_updates = 0
+        self.convergence_checks = 0
+        self._start = None
+        self._components = None
+        self._steps_before = None
+
+    def start(self, simulation):
+        """
+        Instruments a simulation: until :meth:`stop` is called, its focal agent selector, neighbor selector and
+        influence function are replaced by stand-ins that time them and then call the original components, and its
+        recording of tickwise output is timed in the same way.
+        """
+        self._components = (simulation.focal_agent_selector, simulation.neighbor_selector,
+                            simulation.influence_function)
+        self._steps_before = (simulation.time_steps, simulation.influence_steps)
+        simulation.focal_agent_selector = _TimedFocalAgentSelector(simulation.focal_agent_selector,
+                                                                   simulation.parameter_dict, self)
+        simulation.neighbor_selector = _TimedNeighborSelector(simulation.neighbor_selector, self)
+        simulation.influence_function = _TimedInfluenceOperator(simulation.influence_function,
+                                                                simulation.communication_regime, self)
+        # the instance attribute shadows the method of the class, and is removed again when the run is done
+        simulation._record_tickwise = _timed(simulation._record_tickwise, self, 'tickwise')
+        self._start = time.perf_counter()
+
+    def stop(self, simulation):
+        """
+        Restores the components of the simulation, and counts its steps and successful influence attempts.
+        """
+        self.total_seconds += time.perf_counter() - self._start
+        simulation.focal_agent_selector, simulation.neighbor_selector, simulation.influence_function = \
+            self._components
+        vars(simulation).pop('_record_tickwise', None)
+        steps = simulation.time_steps - self._steps_before[0]
+        self.steps += steps
+        self.influence_attempts += steps
+        self.influence_successes += simulation.influence_steps - self._steps_before[1]
+
+    def convergence_check(self, check):
+        """
+        :param check: The convergence check of a simulation.
+        :returns: An object that times and counts the calls of its check_convergence method.
+        """
+        return _TimedConvergenceCheck(check, self)
+
+    @property
+    def mean_neighbors(self) -> float:
+        """
+        The average number of neighbors selected per step.
+        """
+        return self.selected_neighbors / self.steps if self.steps else 0.0
+
+    @property
+    def success_rate(self) -> float:
+        """
+        The share of influence attempts that changed an agent.
+        """
+        return self.influence_successes / self.influence_attempts if self.influence_attempts else 0.0
+
+    def columns(self) -> dict:
+        """
+        :returns: A dictionary with the measurements, used as extra columns of the output table.
+        """
+        columns = {column: self.seconds[phase] for phase, column in _phases.items()}
+        columns.update({'RunSeconds': self.total_seconds,
+                        'DistanceUpdates': self.distance_updates,
+                        'InfluenceAttempts': self.influence_attempts,
+                        'InfluenceSuccesses': self.influence_successes,
+                        'MeanSelectedNeighbors': self.mean_neighbors,
+                        'ConvergenceChecks': self.convergence_checks})
+        return columns
+
+    def summary(self) -> str:
+        """
+        :returns: A table with the time of each phase, its share of the run and its time per step, followed by the
+            counters.
+        """
+        steps = max(1, self.steps)
+        total = self.total_seconds if self.total_seconds > 0 else 1.0
+        measured = sum(seconds for phase, seconds in self.seconds.items() if phase != 'dissimilarity')
+        lines = ["{:<22}{:>12}{:>9}{:>14}".format("phase", "seconds", "share", "us per step")]
+        for phase, seconds in list(self.seconds.items()) + [('other', max(0.0, self.total_seconds - measured))]:
+            name = phase if phase != 'dissimilarity' else '  of which distances'
+            lines.append("{:<22}{:>12.4f}{:>9.1%}{:>14.2f}".format(name, seconds, seconds / total,
+                                                                 seconds / steps * 1e6))
+        lines.append("{:<22}{:>12.4f}".format("total", self.total_seconds))
+        lines.append("")
+        lines.append("steps: {}".format(self.steps))
+        lines.append("influence attempts: {} ({} successful, {:.1%})".format(self.influence_attempts,
+                                                                            self.influence_successes,
+                                                                            self.success_rate))
+        lines.append("mean selected neighbors: {:.2f}".format(self.mean_neighbors))
+        lines.append("distance recomputations: {} ({:.2f} per step)".format(self.distance_updates,
+                                                                           self.distance_updates / steps))
+        lines.append("convergence checks: {} ({:.2f} ms each)".format(
+            self.convergence_checks, self.seconds['convergence'] / max(1, self.convergence_checks) * 1e3))
+        return "\n".join(lines)
+
+
+def _timed(function, instrumentation: Instrumentation, phase: str):
+    """
+    :returns: A function that calls the given function and adds the time it took to the phase.
+    """
+    def timed_function(*args, **kwargs):
+        start = time.perf_counter()
+        result = function(*args, **kwargs)
+        instrumentation.seconds[phase] += time.perf_counter() - start
+        return result
+    return timed_function
+
+
+class _TimedFocalAgentSelector(focal_agent_sim.FocalAgentSelector):
+    """
+    Stands in for the focal agent selector of a simulation, and times the selection of the focal agent.
+    """
+
+    def __init__(self, realization, parameter_dict: dict, instrumentation: Instrumentation):
+        self._realization = realization
+        self._parameter_dict = parameter_dict
+        self._instrumentation = instrumentation
+
+    def select_agent(self, network, agents=[]) -> int:
+        start = time.perf_counter()
+        selected_agent = focal_agent_sim.select_focal_agent(network, self._realization, agents,
+                                                            **self._parameter_dict)
+        self._instrumentation.seconds['focal_agent'] += time.perf_counter() - start
+        return selected_agent
+
+
+class _TimedNeighborSelector(neighbor_selector_sim.NeighborSelector):
+    """
+    Stands in for the neighbor selector of a simulation, and times and counts the selected neighbors.
+    """
+
+    def __init__(self, realization, instrumentation: Instrumentation):
+        self._realization = realization
+        self._instrumentation = instrumentation
+
+    def select_neighbors(self, network, focal_agent, regime, **kwargs):
+        start = time.perf_counter()
+        neighbors = neighbor_selector_sim.select_neighbors(network, self._realization, focal_agent, regime, **kwargs)
+        self._instrumentation.seconds['neighbor_selection'] += time.perf_counter() - start
+        self._instrumentation.selected_neighbors += len(neighbors) if hasattr(neighbors, '__len__') else 1
+        return neighbors
+
+
+class _TimedInfluenceOperator(influence_sim.InfluenceOperator):
+    """
+    Stands in for the influence function of a simulation, and times the influence step. The dissimilarity calculator
+    is replaced by a :class:`_TimedCalculator` during the step.
+    """
+
+    def __init__(self, realization, regime: str, instrumentation: Instrumentation):
+        self._realization = realization
+        self.regime = regime
+        self._instrumentation = instrumentation
+
+    def spread_influence(self, network, agent_i, agents_j, dissimilarity_measure, attributes=None, **kwargs) -> bool:
+        start = time.perf_counter()
+        success = influence_sim.spread_influence(network, self._realization, agent_i, agents_j, self.regime,
+                                                 _TimedCalculator(dissimilarity_measure, self._instrumentation),
+                                                 attributes, **kwargs)
+        self._instrumentation.seconds['influence'] += time.perf_counter() - start
+        return success
+
+
+class _TimedCalculator:
+    """
+    Stands in for the dissimilarity calculator during the influence step, and counts and times the recomputed
+    distances.
+    """
+
+    def __init__(self, calculator, instrumentation: Instrumentation):
+        self._calculator = calculator
+        self._instrumentation = instrumentation
+
+    def calculate_dissimilarity(self, network, agent1_id, agent2_id) -> float:
+        start = time.perf_counter()
+        dissimilarity = self._calculator.calculate_dissimilarity(network, agent1_id, agent2_id)
+        self._instrumentation.seconds['dissimilarity'] += time.perf_counter() - start
+        self._instrumentation.distance_updates += 1
+        return dissimilarity
+
+    def __getattr__(self, name: str):
+        return getattr(self._calculator, name)
+
+
+class _TimedConvergenceCheck:
+
+    def __init__(self, check, instrumentation: Instrumentation):
+        self._check = check
+        self._instrumentation = instrumentation
+
+    def check_convergence(self, *args, **kwargs) -> bool:
+        start = time.perf_counter()
+        converged = self._check.check_convergence(*args, **kwargs)
+        self._instrumentation.seconds['convergence'] += time.perf_counter() - start
+        self._instrumentation.convergence_checks += 1
+        return converged
+
+    def __getattr__(self, name: str):
+        return getattr(self._check, name)
@@ -0,0 +1,371 @@
+import argparse
+import concurrent.futures
+import hashlib
+import json
+import math
+import os
+import pathlib
+import pickle
+import shutil
+import subprocess
+import sys
+import time
+import multiprocessing as mp
+import pandas as pd
+from abc import ABC, abstractmethod
+from typing import List
+import defSim
+from defSim.tools.ExperimentStore import stable_repr
+
+
+class Launcher(ABC):
+    """
+    This class is the base for launchers, which run the chunks of a :class:`JobRunner` on some backend. Launchers
+    only start the commands of the chunks and wait for them to finish. The JobRunner checks which chunks produced
+    results, and launches the failed ones again.
+
+    :param int=1 processes_per_chunk: The number of processes that run the simulations of one chunk.
+    """
+
+    num_workers = 1
+
+    def __init__(self, processes_per_chunk: int = 1):
+        self.processes_per_chunk = processes_per_chunk
+
+    @abstractmethod
+    def launch(self, runner: 'JobRunner', chunks: List[int]):
+        """
+        Runs chunks and returns when they are finished.
+
+        :param runner: The JobRunner, which gives the command (:meth:`JobRunner.command`) and log file
+            (:meth:`JobRunner.log_path`) of each chunk.
+        :param chunks: The indices of the chunks to run.
+        """
+        pass
+
+
+class LocalLauncher(Launcher):
+    """
+    Runs chunks as subprocesses on this machine, at most num_workers at a time.
+
+    :param int=mp.cpu_count() num_workers: The number of chunks that run at the same time.
+    :param int=1 processes_per_chunk: The number of processes that run the simulations of one chunk.
+    """
+
+    def __init__(self, num_workers: int = mp.cpu_count(), processes_per_chunk: int = 1):
+        super().__init__(processes_per_chunk=processes_per_chunk)
+        self.num_workers = num_workers
+
+    def launch(self, runner: 'JobRunner', chunks: List[int]):
+        environment = _environment()
+
+        def run(chunk):
+            with open(runner.log_path(chunk), 'a') as log_file:
+                return subprocess.call(runner.command(chunk, self.processes_per_chunk), stdout=log_file,
+                                       stderr=subprocess.STDOUT, env=environment)
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.num_workers) as executor:
+            list(executor.map(run, chunks))
+
+
+class SlurmLauncher(Launcher):
+    """
+    Runs chunks as a SLURM job array, and waits until the job has left the queue. The job script is written to the
+    folder of the JobRunner, so the submitted job can be inspected.
+
+    :param str="30:00" walltime: The maximum time of one chunk.
+    :param str="short" partition: The partition of the cluster to run the jobs on.
+    :param int=1 cpus_per_task: The number of cores per chunk, which are all used to run its simulations.
+    :param str="8000" memory: The memory per chunk, in megabytes or with a unit such as "8G".
+    :param int=25 num_workers: The maximum number of chunks that run at the same time.
+    :param float=30 poll_interval: The number of seconds between two checks whether the job has finished.
+    :param list=None sbatch_options: Further lines for the job script, such as "--account=project".
+    """
+
+    def __init__(self, walltime: str = "30:00", partition: str = "short", cpus_per_task: int = 1,
+                 memory: str = "8000", num_workers: int = 25, poll_interval: float = 30,
+                 sbatch_options: List[str] = None):
+        super().__init__(processes_per_chunk=cpus_per_task)
+        self.walltime = walltime
+        self.partition = partition
+        self.memory = memory
+        self.num_workers = num_workers
+        self.poll_interval = poll_interval
+        self.sbatch_options = sbatch_options if sbatch_options is not None else []
+
+    def write_script(self, runner: 'JobRunner', chunks: List[int]) -> pathlib.Path:
+        """
+        Writes the script of a job array that runs chunks.
+
+        :returns: The path to the script.
+        """
+        command = runner.command("$SLURM_ARRAY_TASK_ID", self.processes_per_chunk)
+        lines = ["#!/bin/bash",
+                 "#SBATCH --job-name=defSim_{}".format(runner.folder.name),
+                 "#SBATCH --array={}%{}".format(",".join(str(chunk) for chunk in chunks), self.num_workers),
+                 "#SBATCH --output={}".format(runner.folder / "logs" / "chunk_%a.log"),
+                 "#SBATCH --open-mode=append",
+                 "#SBATCH --time={}".format(self.walltime),
+                 "#SBATCH --mem={}".format(self.memory),
+                 "#SBATCH --partition={}".format(self.partition),
+                 "#SBATCH --cpus-per-task={}".format(self.processes_per_chunk)]
+        lines += ["#SBATCH {}".format(option) for option in self.sbatch_options]
+        lines += ["export PYTHONPATH={}".format(_environment()["PYTHONPATH"]),
+                  " ".join('"{}"'.format(part) if part != "$SLURM_ARRAY_TASK_ID" else part for part in command)]
+        script_path = runner.folder / "job.sh"
+        script_path.write_text("\n".join(lines) + "\n")
+        return script_path
+
+    def launch(self, runner: 'JobRunner', chunks: List[int]):
+        script_path = self.write_script(runner, chunks)
+        job_id = subprocess.check_output(["sbatch", "--parsable", str(script_path)], text=True).strip().split(";")[0]
+        print("submitted job %s with %d chunks" % (job_id, len(chunks)))
+        while True:
+            time.sleep(self.poll_interval)
+            queue = subprocess.run(["squeue", "-h", "-j", job_id], capture_output=True, text=True)
+            if queue.returncode != 0 or not queue.stdout.strip():
+                break
+
+
+class JobRunner:
+    """
+    This class runs an experiment as a set of chunks, for example as a job array on a cluster. It writes a compact
+    manifest to a job folder: the experiment without its simulations and with its network in array form (written
+    once), and one task file per chunk with only the parameter dictionaries of its simulations. A launcher runs each
+    chunk in a separate process (see :func:`main`), which writes the results of the chunk to the folder. Chunks without
+    results are launched again, up to max_retries times, and the results of all chunks are then merged in the order of
+    the parameter_dict_list.
+
+    If the job folder already holds the manifest of the same experiment, the stored chunks are used and the chunks
+    that finished are not run again, so an interrupted job can be resumed by running it again. This also holds for
+    experiments without seed, whose simulations are in a different order every time the experiment is created. A job
+    folder with results of another experiment is only replaced if overwrite is True. The chunks import the experiment
+    again from its pickle, so custom components must be importable (i.e. not defined in the __main__ script).
+
+    :param experiment: The Experiment to run. It must be defined by parameter combinations, not by simulations.
+    :param str="jobs" folder: The job folder. It is created if it does not exist.
+    :param Launcher=None launcher: The launcher that runs the chunks. If None, chunks run in a LocalLauncher.
+    :param int=None chunk_size: The number of simulations per chunk.
+    :param float=None chunk_seconds: The expected runtime of a chunk in seconds, which is used when chunk_size is None
+        and runtimes of the experiment are known (see Experiment.estimate_runtime). If both are None, the simulations
+        are split into four chunks per worker of the launcher.
+    :param int=2 max_retries: The number of times a chunk that failed is launched again.
+    :param bool=False overwrite: Whether to remove the results of another experiment from the job folder.
+    """
+
+    def __init__(self, experiment, folder: str or pathlib.Path = "jobs", launcher: Launcher = None,
+                 chunk_size: int = None, chunk_seconds: float = None, max_retries: int = 2, overwrite: bool = False):
+        if experiment.simulations is not None:
+            raise ValueError("A JobRunner can only run experiments that are defined by parameter combinations")
+        self.experiment = experiment
+        self.folder = pathlib.Path(folder).resolve()
+        self.launcher = launcher if launcher is not None else LocalLauncher()
+        self.chunk_size = chunk_size
+        self.chunk_seconds = chunk_seconds
+        self.max_retries = max_retries
+        self.overwrite = overwrite
+        self.num_chunks = None
+
+    def prepare(self):
+        """
+        Writes the manifest of the experiment to the job folder, unless the folder already holds the manifest of the
+        same experiment. In that case, the parameter_dict_list of the experiment is read from the stored chunks, so
+        the results are merged in the order in which they were stored.
+
+        :raises FileExistsError: If the folder holds results of another experiment and overwrite is False.
+        """
+        experiment = self.experiment
+        if len(experiment.parameter_dict_list) == 0:
+            experiment.parameter_dict_list = experiment._create_parameter_dictionaries()
+        fingerprint = _fingerprint(experiment)
+        job_path = self.folder / "job.json"
+        if job_path.exists():
+            job = json.loads(job_path.read_text())
+            if job['fingerprint'] == fingerprint:
+                self.num_chunks = job['num_chunks']
+                experiment.parameter_dict_list = [parameter_dict for chunk in range(self.num_chunks)
+                                                  for _, parameter_dict in _read_pickle(self.task_path(chunk))]
+                return
+            if not self.overwrite and any((self.folder / "results").glob("chunk_*.pickle")):
+                raise FileExistsError("{} holds results of another experiment, run with overwrite=True to remove "
+                                      "them".format(self.folder))
+            job_path.unlink()
+            for subfolder in ["tasks", "results"]:
+                shutil.rmtree(self.folder / subfolder, ignore_errors=True)
+        for subfolder in ["tasks", "results", "logs"]:
+            (self.folder / subfolder).mkdir(parents=True, exist_ok=True)
+
+        chunks = self._split(experiment.parameter_dict_list)
+        for chunk, tasks in enumerate(chunks):
+            _write_pickle(self.task_path(chunk), tasks)
+        _write_pickle(self.folder / "experiment.pickle", experiment._prepare_workers())
+        self.num_chunks = len(chunks)
+        # the job file is written last, so it only exists for a complete manifest
+        job_path.write_text(json.dumps({'fingerprint': fingerprint, 'num_chunks': self.num_chunks,
+                                        'num_simulations': len(experiment.parameter_dict_list),
+                                        'defSim_version': defSim.__version__}, indent=1))
+
+    def pending(self) -> List[int]:
+        """
+        :returns: The indices of the chunks without results.
+        """
+        return [chunk for chunk in range(self.num_chunks) if not self.result_path(chunk).exists()]
+
+    def run(self) -> pd.DataFrame:
+        """
+        Prepares the job folder, launches the chunks without results until all of them succeeded or they failed
+        max_retries + 1 times, and merges the results.
+
+        :returns: A dataframe that contains one row per simulation, in the order of the parameter_dict_list.
+        """
+        self.prepare()
+        for attempt in range(self.max_retries + 1):
+            pending = self.pending()
+            if not pending:
+                break
+            if attempt > 0:
+                print("launching %d failed chunks again" % len(pending))
+            self.launcher.launch(self, pending)
+        failed = self.pending()
+        if failed:
+            raise RuntimeError("{} chunks failed, see the log files in {}: {}".format(
+                len(failed), self.folder / "logs", ", ".join(str(chunk) for chunk in failed)))
+        return self.merge()
+
+    def merge(self) -> pd.DataFrame:
+        """
+        :returns: A dataframe with the results of all chunks, in the order of the parameter_dict_list.
+        """
+        results = []
+        for chunk in range(self.num_chunks):
+            with open(self.result_path(chunk), 'rb') as result_file:
+                results.append(pickle.load(result_file))
+        return pd.concat(results).reset_index()
+
+    def command(self, chunk: int or str, processes: int = 1) -> List[str]:
+        """
+        :returns: The command that runs a chunk.
+        """
+        # the module is imported rather than run with -m, as importing defSim already imports it
+        return [sys.executable, "-c", "from defSim.tools.JobRunner import main; main()", str(self.folder), str(chunk),
+                "--processes", str(processes)]
+
+    def log_path(self, chunk: int) -> pathlib.Path:
+        return self.folder / "logs" / "chunk_{}.log".format(chunk)
+
+    def result_path(self, chunk: int) -> pathlib.Path:
+        return self.folder / "results" / "chunk_{}.pickle".format(chunk)
+
+    def task_path(self, chunk: int) -> pathlib.Path:
+        return self.folder / "tasks" / "chunk_{}.pickle".format(chunk)
+
+    def _split(self, parameter_dicts: List[dict]) -> List[list]:
+        """
+        Splits the simulations into chunks of consecutive simulations, by number or by expected runtime.
+        """
+        tasks = list(enumerate(parameter_dicts))
+        cost_model = None
+        if self.chunk_size is None and self.chunk_seconds is not None:
+            cost_model = self.experiment.fit_cost_model()
+        if cost_model is not None:
+            predictions = cost_model.predict([self.experiment._cost_parameters(parameter_dict)
+                                              for parameter_dict in parameter_dicts])
+            chunks, chunk, chunk_seconds = [], [], 0
+            for task, seconds in zip(tasks, predictions):
+                if chunk and chunk_seconds + seconds > self.chunk_seconds:
+                    chunks.append(chunk)
+                    chunk, chunk_seconds = [], 0
+                chunk.append(task)
+                chunk_seconds += seconds
+            return chunks + [chunk] if chunk else chunks
+        chunk_size = self.chunk_size
+        if chunk_size is None:
+            chunk_size = math.ceil(len(tasks) / (4 * self.launcher.num_workers))
+        chunk_size = max(1, chunk_size)
+        return [tasks[start:start + chunk_size] for start in range(0, len(tasks), chunk_size)]
+
+
+def run_chunk(folder: str or pathlib.Path, chunk: int, processes: int = 1):
+    """
+    Runs the simulations of a chunk of a job folder, and writes their results to the folder.
+
+    :param folder: The job folder written by a JobRunner.
+    :param chunk: The index of the chunk.
+    :param int=1 processes: The number of processes that run the simulations.
+    """
+    from defSim.Experiment import _initialize_worker, _run_simulation_in_worker
+
+    folder = pathlib.Path(folder)
+    with open(folder / "experiment.pickle", 'rb') as experiment_file:
+        worker_experiment, shared_network = pickle.load(experiment_file)
+    tasks = _read_pickle(folder / "tasks" / "chunk_{}.pickle".format(chunk))
+    print("chunk %d: running %d simulations" % (chunk, len(tasks)), flush=True)
+
+    start_time = time.perf_counter()
+    parameter_dicts = [parameter_dict for _, parameter_dict in tasks]
+    if processes > 1:
+        with mp.Pool(processes=processes, initializer=_initialize_worker,
+                     initargs=(worker_experiment, shared_network)) as pool:
+            results = pool.map(_run_simulation_in_worker, parameter_dicts, chunksize=1)
+    else:
+        _initialize_worker(worker_experiment, shared_network)
+        results = [_run_simulation_in_worker(parameter_dict) for parameter_dict in parameter_dicts]
+    _write_pickle(folder / "results" / "chunk_{}.pickle".format(chunk), pd.concat(results))
+    print("chunk %d: done in %.1f seconds" % (chunk, time.perf_counter() - start_time), flush=True)
+
+
+def _fingerprint(experiment) -> str:
+    """
+    :returns: A hash of the simulations of an experiment, to recognize a folder written for the same experiment.
+    """
+    # the simulations are shuffled, and without experiment seed their seeds differ every time the experiment is
+    # created, so the parameter dictionaries are hashed without order and seeds (simulations that already ran in
+    # this session also added their random generator)
+    parameter_dicts = sorted(stable_repr({key: value for key, value in parameter_dict.items()
+                                          if key not in ('seed', 'np_random_generator')})
+                             for parameter_dict in experiment.parameter_dict_list)
+    return hashlib.sha256(stable_repr([parameter_dicts, experiment.repetitions, experiment._component_configuration(),
+                                       experiment.seed]).encode('utf-8')).hexdigest()
+
+
+def _write_pickle(path: pathlib.Path, value):
+    # the file is written under a temporary name first, so a file that exists is always complete
+    temporary_path = path.with_suffix('.{}.tmp'.format(os.getpid()))
+    with open(temporary_path, 'wb') as pickle_file:
+        pickle.dump(value, pickle_file, protocol=pickle.HIGHEST_PROTOCOL)
+    temporary_path.replace(path)
+
+
+def _read_pickle(path: pathlib.Path):
+    with open(path, 'rb') as pickle_file:
+        return pickle.load(pickle_file)
+
+
+def _environment() -> dict:
+    """
+    :returns: The environment of chunk processes, in which defSim can be imported from the same location as here.
+    """
+    environment = dict(os.environ)
+    package_root = str(pathlib.Path(defSim.__file__).resolve().parent.parent)
+    paths = [package_root] + [path for path in environment.get("PYTHONPATH", "").split(os.pathsep) if path]
+    environment["PYTHONPATH"] = os.pathsep.join(paths)
+    return environment
+
+
+def main(arguments: List[str] = None):
+    """
+    Runs a chunk from the command line, with the job folder and the index of the chunk as arguments, for example
+    ``python -c "from defSim.tools.JobRunner import main; main()" jobs 3 --processes 4``.
+
+    :param list=None arguments: The command line arguments. If None, they are read from sys.argv.
+    """
+    parser = argparse.ArgumentParser(description="Runs a chunk of a defSim job folder.")
+    parser.add_argument("folder", help="the job folder written by a JobRunner")
+    parser.add_argument("chunk", type=int, help="the index of the chunk")
+    parser.add_argument("--processes", type=int, default=1, help="the number of processes to run simulations in")
+    arguments = parser.parse_args(arguments)
+    run_chunk(arguments.folder, arguments.chunk, processes=arguments.processes)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,176 @@
+import collections
+import hashlib
+import math
+import os
+import pathlib
+import numpy as np
+import networkx as nx
+from defSim.tools.ExperimentStore import stable_repr
+
+
+def grid_layout(network: nx.Graph) -> np.ndarray:
+    """
+    Places the agents of a network created with the 'grid' topology on their positions in the grid. Grids are
+    numbered row by row, except for small grids with a Moore neighborhood, whose agents are numbered by their row and
+    column (agent 34 is in row 3 and column 4).
+
+    :param network: A grid network.
+    :returns: An array with the row and column of each agent, in the order of network.nodes.
+    """
+    labels = np.fromiter(network.nodes, dtype=np.int64, count=network.number_of_nodes())
+    side = max(1, math.isqrt(len(labels)))
+    if len(labels) > 0 and labels.max() >= len(labels):
+        side = 10
+    return np.column_stack(np.divmod(labels, side)).astype(float)
+
+
+def ring_layout(network: nx.Graph) -> np.ndarray:
+    """
+    Places the agents of a network created with the 'ring' topology on a circle, in the order of their index.
+
+    :param network: A ring network.
+    :returns: An array with the position of each agent, in the order of network.nodes.
+    """
+    labels = np.fromiter(network.nodes, dtype=np.int64, count=network.number_of_nodes())
+    angles = 2 * np.pi * labels / max(1, len(labels))
+    return np.column_stack((np.cos(angles), np.sin(angles)))
+
+
+# the layouts that are computed from the indices of the agents, which is faster than reading them from a cache
+analytic_layouts = {'grid': grid_layout, 'ring': ring_layout}
+
+
+def positions_array(network: nx.Graph, pos) -> np.ndarray:
+    """
+    :param network: The network that is drawn.
+    :param pos: The positions of the agents, as a dictionary with the position of each agent (as returned by networkx
+        layout functions) or an array with one row per agent in the order of network.nodes, such as the positions
+        returned by :func:`~defSim.network_init.network_init._produce_spatial_random_graph` with return_positions=True.
+    :returns: An array with the position of each agent, in the order of network.nodes.
+    """
+    if isinstance(pos, dict):
+        return np.array([pos[node] for node in network.nodes], dtype=float).reshape(-1, 2)
+    return np.asarray(pos, dtype=float)
+
+
+def edge_indices(network: nx.Graph) -> np.ndarray:
+    """
+    :returns: An array with one row per edge and the positions in network.nodes of the two agents it connects.
+    """
+    num_nodes = network.number_of_nodes()
+    endpoints = (node for edge in network.edges() for node in edge)
+    labels = np.fromiter(network.nodes, dtype=np.int64, count=num_nodes) if _has_integer_labels(network) else None
+    if labels is not None and np.array_equal(labels, np.arange(num_nodes)):
+        indices = np.fromiter(endpoints, dtype=np.int64, count=2 * network.number_of_edges())
+    else:
+        index = {node: position for position, node in enumerate(network.nodes)}
+        indices = np.fromiter((index[node] for node in endpoints), dtype=np.int64,
+                              count=2 * network.number_of_edges())
+    return indices.reshape(-1, 2)
+
+
+def structure_hash(network: nx.Graph) -> str:
+    """
+    Hashes the structure of a network: its agents in order and its edges, but not the attributes of the agents, so
+    the hash stays the same while the agents change during a simulation.
+
+    :returns: A hexadecimal SHA-256 hash.
+    """
+    digest = hashlib.sha256()
+    if _has_integer_labels(network):
+        digest.update(np.fromiter(network.nodes, dtype=np.int64, count=network.number_of_nodes()).tobytes())
+    else:
+        digest.update(stable_repr(list(network.nodes)).encode('utf-8'))
+    edges = np.sort(edge_indices(network), axis=1)
+    edges = edges[np.lexsort((edges[:, 1], edges[:, 0]))]  # independent of the order in which edges were added
+    digest.update(type(network).__name__.encode('utf-8'))
+    digest.update(edges.tobytes())
+    return digest.hexdigest()
+
+
+def _has_integer_labels(network: nx.Graph) -> bool:
+    return all(isinstance(node, (int, np.integer)) for node in network.nodes)
+
+
+class LayoutCache:
+    """
+    This class caches the layouts of networks, so a network that is plotted at many points in time (or in many
+    simulations with the same structure) is laid out once, and always in the same way. Layouts are kept in memory by a
+    hash of the structure of the network, the layout function and its arguments, and optionally also written to a
+    folder as .npy files, so they are reused between sessions. Layouts of networks with a different structure, for
+    instance after rewiring, are computed again.
+
+    The layouts of grid and ring networks are computed from the indices of the agents and are not cached.
+
+    :param folder_path: Path to a folder in which layouts are stored. If None, layouts are only kept in memory.
+    :param int=16 max_items: The maximum number of layouts that is kept in memory. The least recently used layout is
+        removed first.
+    """
+
+    def __init__(self, folder_path: str or pathlib.Path = None, max_items: int = 16):
+        self.folder = pathlib.Path(folder_path).resolve() if folder_path is not None else None
+        if self.folder is not None:
+            self.folder.mkdir(parents=True, exist_ok=True)
+        self.max_items = max_items
+        self.hits = 0
+        self.misses = 0
+        self._layouts = collections.OrderedDict()
+
+    @staticmethod
+    def create_key(network: nx.Graph, layout=nx.spring_layout, **layout_arguments) -> str:
+        """
+        :returns: The key of the layout of a network.
+        """
+        layout_name = layout if isinstance(layout, str) else "{}.{}".format(layout.__module__, layout.__qualname__)
+        components = stable_repr([layout_name, layout_arguments])
+        return hashlib.sha256((structure_hash(network) + components).encode('utf-8')).hexdigest()
+
+    def positions(self, network: nx.Graph, layout=nx.spring_layout, **layout_arguments) -> np.ndarray:
+        """
+        Returns the layout of a network, which is computed if it is not in the cache.
+
+        :param network: The network to lay out.
+        :param layout: A networkx layout function, or 'grid' or 'ring' for the analytic layouts of these topologies.
+        :param layout_arguments: Arguments of the layout function.
+        :returns: An array with the position of each agent, in the order of network.nodes.
+        """
+        if isinstance(layout, str):
+            return analytic_layouts[layout.lower()](network)
+
+        key = self.create_key(network, layout, **layout_arguments)
+        positions = self._layouts.get(key)
+        if positions is None and self.folder is not None:
+            path = self.folder / '{}.npy'.format(key)
+            if path.exists():
+                positions = np.load(path)
+                self._remember(key, positions)
+        if positions is not None:
+            self._layouts.move_to_end(key)
+            self.hits += 1
+            return positions
+
+        self.misses += 1
+        positions = positions_array(network, layout(network, **layout_arguments))
+        self.put(key, positions)
+        return positions
+
+    def put(self, key: str, positions: np.ndarray):
+        """
+        Adds a layout to the cache.
+
+        :param key: The key of the layout, see :meth:`create_key`.
+        :param positions: An array with the position of each agent, in the order of network.nodes.
+        """
+        self._remember(key, positions)
+        if self.folder is not None:
+            path = self.folder / '{}.npy'.format(key)
+            temporary_path = path.with_suffix('.{}.tmp'.format(os.getpid()))
+            with open(temporary_path, 'wb') as layout_file:
+                np.save(layout_file, positions)
+            temporary_path.replace(path)  # other processes never see a partially written layout
+
+    def _remember(self, key: str, positions: np.ndarray):
+        self._layouts[key] = positions
+        self._layouts.move_to_end(key)
+        while len(self._layouts) > self.max_items:
+            self._layouts.popitem(last=False)
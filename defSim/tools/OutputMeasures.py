@@ -1,4 +1,7 @@
+import heapq
+from abc import abstractmethod
 import networkx as nx
+import numpy as np
 from .CreateOutputTable import OutputTableCreator
 
 
@@ -6,12 +9,15 @@ class ClusterFinder(OutputTableCreator):
 
     label = "ClusterFinder"
 
-    def __init__(self, cluster_dissimilarity_threshold: float = 0, strict_zones: bool = False):
+    def __init__(self, cluster_dissimilarity_threshold: float = 0, strict_zones: bool = False,
+                 connection: str = "weak"):
         super().__init__()
         self.cluster_dissimilarity_threshold = cluster_dissimilarity_threshold
-        self.strict_zones = strict_zones    
+        self.strict_zones = strict_zones
+        self.connection = connection
+        self.requires = [('cluster_sizes', cluster_dissimilarity_threshold, strict_zones, connection)]
 
-    def create_output(self, network: nx.Graph, **kwargs):
+    def create_output(self, network: nx.Graph, context: 'OutputContext' = None, **kwargs):
         """
         Finds the size and number of cultural regions, zones, or clusters present in the graph. Following Axelrod (1997)
         *regions* are defined as a set of connected nodes with an identical attribute profile.
@@ -23,23 +29,136 @@ class ClusterFinder(OutputTableCreator):
             returns the strict number of regions
         :param strict_zones: If true, cluster_dissimilarity_threshold is neglected and strict zones are returned (only
             the links with dissimilarity != 1 are preserved)
+        :param str="weak" connection: Only used for directed networks. If "weak", agents belong to the same cluster if
+            they are connected regardless of the direction of the ties. If "strong", agents belong to the same cluster
+            only if they can reach each other following the direction of the ties.
+        :param context: An :class:`OutputContext` for the network, to reuse intermediate results. If None, a new one is
+            created.
         :returns: A list with sizes of the retrieved clusters
         """
 
-        networkcopy = network.copy()
-        if self.strict_zones:
-            remove = [pair for pair, dissimilarity in nx.get_edge_attributes(networkcopy, 'dist').items()
-                      if dissimilarity == 1]
-        else:
-            remove = [pair for pair, dissimilarity in nx.get_edge_attributes(networkcopy, 'dist').items()
-                      if dissimilarity > self.cluster_dissimilarity_threshold]
-        networkcopy.remove_edges_from(remove)
+        if context is None:
+            context = OutputContext(network)
+        return context.cluster_sizes(self.cluster_dissimilarity_threshold, self.strict_zones, self.connection)
+
+
+class OutputContext:
+    """
+    This class memoizes intermediate results that are shared between output realizations, for a single evaluation of
+    the output table. The values of agents on a feature, the edge distances and the cluster sizes for a given
+    threshold are each computed once, however many realizations use them.
+
+    Realizations declare what they need in their 'requires' attribute, as tuples of a method name of this class and its
+    arguments (e.g. ('feature_values', 'f01')). :meth:`prepare` computes all requirements at once, gathering the values
+    of all requested features in a single pass over the agents.
+
+    The context assumes the network does not change while it is in use. Create a new context after the network changes.
+
+    :param network: A NetworkX object
+    """
+
+    def __init__(self, network: nx.Graph):
+        self.network = network
+        self.num_agents = network.number_of_nodes()
+        self._feature_values = {}
+        self._edge_distances = None
+        self._cluster_sizes = {}
+
+    def prepare(self, realizations: list):
+        """
+        Computes the requirements of all given realizations.
+
+        :param realizations: A list of OutputTableCreator instances.
+        """
+        requirements = [requirement for realization in realizations
+                        for requirement in getattr(realization, 'requires', [])]
+        self._gather_features([requirement[1] for requirement in requirements if requirement[0] == 'feature_values'])
+        for name, *args in requirements:
+            if name != 'feature_values':
+                getattr(self, name)(*args)
+
+    def feature_values(self, feature: str) -> np.ndarray:
+        """
+        :param feature: The name of an agent feature.
+        :returns: An array with the values of all agents that have the feature, in node order.
+        """
+        if feature not in self._feature_values:
+            self._gather_features([feature])
+        return self._feature_values[feature]
+
+    def edge_distances(self) -> tuple:
+        """
+        :returns: The arrays of :func:`edge_distance_array` for the network.
+        """
+        if self._edge_distances is None:
+            self._edge_distances = edge_distance_array(self.network)
+        return self._edge_distances
+
+    def cluster_sizes(self, cluster_dissimilarity_threshold: float = 0, strict_zones: bool = False,
+                      connection: str = "weak") -> list:
+        """
+        Finds the cluster sizes as described in :class:`ClusterFinder`.
 
-        try:  # workaround for DiGraphs (nx.connected_components does not work on them)
-            return [len(c) for c in sorted(nx.connected_components(networkcopy), key=len, reverse=True)]
-        except:
-            return [9999999]
-        # todo: implement for DiGraph
+        :returns: A list with sizes of the retrieved clusters, largest first.
+        """
+        key = (None if strict_zones else cluster_dissimilarity_threshold, strict_zones,
+               connection if self.network.is_directed() else "weak")
+        if key not in self._cluster_sizes:
+            sources, targets, distances = self.edge_distances()
+            if strict_zones:
+                preserved = distances != 1
+            else:
+                preserved = distances <= cluster_dissimilarity_threshold
+            self._cluster_sizes[key] = _connected_component_sizes(self.num_agents, sources[preserved],
+                                                                  targets[preserved],
+                                                                  directed=self.network.is_directed(),
+                                                                  connection=connection)
+        return list(self._cluster_sizes[key])
+
+    def _gather_features(self, features: list):
+        features = [feature for feature in dict.fromkeys(features) if feature not in self._feature_values]
+        if not features:
+            return
+        values = {feature: [] for feature in features}
+        for _, attributes in self.network.nodes(data=True):
+            for feature in features:
+                if feature in attributes:
+                    values[feature].append(attributes[feature])
+        for feature in features:
+            self._feature_values[feature] = np.array(values[feature])
+
+
+def edge_distance_array(network: nx.Graph):
+    """
+    Collects the distances between all connected agents in arrays, without copying the network. Agents are identified by
+    their position in the node order of the network. Edges without a distance are treated as having distance 0.
+
+    :param network: A NetworkX object
+    :returns: A tuple of three arrays: the positions of the first agent of every edge, the positions of the second
+        agent of every edge, and the distance of every edge.
+    """
+    index = {agent: position for position, agent in enumerate(network)}
+    num_edges = network.number_of_edges()
+    edges = network.edges(data='dist', default=0)
+    sources = np.fromiter((index[agent] for agent, _, _ in edges), dtype=np.intp, count=num_edges)
+    targets = np.fromiter((index[neighbor] for _, neighbor, _ in edges), dtype=np.intp, count=num_edges)
+    distances = np.fromiter((distance for _, _, distance in edges), dtype=float, count=num_edges)
+    return sources, targets, distances
+
+
+def _connected_component_sizes(num_agents: int, sources: np.ndarray, targets: np.ndarray, directed: bool = False,
+                               connection: str = "weak") -> list:
+    """
+    Finds the sizes of the connected components spanned by the given edges, from a sparse adjacency matrix.
+
+    :returns: A list of component sizes, largest first.
+    """
+    from scipy.sparse import csr_matrix  # imported here, so importing defSim does not import scipy
+    from scipy.sparse.csgraph import connected_components
+
+    adjacency = csr_matrix((np.ones(len(sources), dtype=np.int8), (sources, targets)), shape=(num_agents, num_agents))
+    _, labels = connected_components(adjacency, directed=directed, connection=connection)
+    return sorted(np.bincount(labels).tolist(), reverse=True)
 
 
 class AttributeReporter(OutputTableCreator):
@@ -50,8 +169,9 @@ class AttributeReporter(OutputTableCreator):
         super().__init__()
         self.feature = feature
         self.label = feature
+        self.requires = [('feature_values', feature)]
 
-    def create_output(self, network: nx.Graph, **kwargs):
+    def create_output(self, network: nx.Graph, context: OutputContext = None, **kwargs):
         """
 
         This function will output a single row of a dataframe where the columns are user-given agent-features and column
@@ -59,17 +179,21 @@ class AttributeReporter(OutputTableCreator):
 
         :param network: A NetworkX object
         :param feature: The name of the feature to output
+        :param context: An :class:`OutputContext` for the network. If None, a new one is created.
         :return: A list of feature values for each agent
         """
 
-        return list(nx.get_node_attributes(network, self.feature).values())
+        if context is None:
+            context = OutputContext(network)
+        return context.feature_values(self.feature).tolist()
 
 
 class AverageDistanceReporter(OutputTableCreator):
 
     label = "AverageDistance"
+    requires = [('edge_distances',)]
 
-    def create_output(self, network: nx.Graph, **kwargs):
+    def create_output(self, network: nx.Graph, context: OutputContext = None, **kwargs):
         """
 
         Output the average feature distance across all edges. Based on
@@ -77,11 +201,17 @@ class AverageDistanceReporter(OutputTableCreator):
         distance measure was specified in the simulation).
 
         :param network: A NetworkX object
+        :param context: An :class:`OutputContext` for the network. If None, a new one is created.
 
-        :return: Average distance (float)
+        :return: Average distance (float), NaN for a network without edges
         """    
 
-        return sum(nx.get_edge_attributes(network, 'dist').values()) / len(network.edges())
+        if context is None:
+            context = OutputContext(network)
+        _, _, distances = context.edge_distances()
+        if len(distances) == 0:
+            return float('nan')
+        return distances.sum().item() / len(distances)
 
 
 class AverageOpinionReporter(OutputTableCreator):
@@ -91,18 +221,22 @@ class AverageOpinionReporter(OutputTableCreator):
     def __init__(self, feature: str = 'f01'):
         super().__init__()
         self.feature = feature     
+        self.requires = [('feature_values', feature)]
 
-    def create_output(self, network: nx.Graph, **kwargs):
+    def create_output(self, network: nx.Graph, context: OutputContext = None, **kwargs):
         """
 
         Output the average opinion on a feature across all agents. 
 
         :param network: A NetworkX object
+        :param context: An :class:`OutputContext` for the network. If None, a new one is created.
 
         :return: Average opinion (float)
         """    
 
-        return sum(nx.get_node_attributes(network, self.feature).values()) / len(network.nodes())
+        if context is None:
+            context = OutputContext(network)
+        return context.feature_values(self.feature).sum().item() / context.num_agents
 
 
 class DispersionReporter(OutputTableCreator):
@@ -112,21 +246,25 @@ class DispersionReporter(OutputTableCreator):
     def __init__(self, feature: str = 'f01'):
         super().__init__()
         self.feature = feature
+        self.requires = [('feature_values', feature)]
 
-    def create_output(self, network: nx.Graph, **kwargs):
+    def create_output(self, network: nx.Graph, context: OutputContext = None, **kwargs):
         """
         Report the amount of dispersion defined as the average absolute deviation from the mean on a given feature.
         The implementation mirrors that from [Bramson2016]_
 
         :param network: A NetworkX object
+        :param context: An :class:`OutputContext` for the network. If None, a new one is created.
         :return: Dispersion (float)
         """
 
-        attribute_values = nx.get_node_attributes(network, self.feature).values()
-        mu_values = sum(attribute_values) / len(attribute_values)
-        dispersion = 2 / len(attribute_values) * sum([abs(i - mu_values) for i in attribute_values])
+        if context is None:
+            context = OutputContext(network)
+        attribute_values = context.feature_values(self.feature)
+        mu_values = attribute_values.sum() / len(attribute_values)
+        dispersion = 2 / len(attribute_values) * np.abs(attribute_values - mu_values).sum()
 
-        return dispersion
+        return dispersion.item()
 
 
 class SpreadReporter(OutputTableCreator):
@@ -136,18 +274,22 @@ class SpreadReporter(OutputTableCreator):
     def __init__(self, feature: str = 'f01'):
         super().__init__()
         self.feature = feature
+        self.requires = [('feature_values', feature)]
 
-    def create_output(self, network: nx.Graph, **kwargs):
+    def create_output(self, network: nx.Graph, context: OutputContext = None, **kwargs):
         """
         Report the spread defined as the difference between the maximum and minimum value on a given feature.
 
         :param network: A NetworkX object
+        :param context: An :class:`OutputContext` for the network. If None, a new one is created.
         :return: Spread (float)
         """
 
-        attribute_values = nx.get_node_attributes(network, self.feature).values()
+        if context is None:
+            context = OutputContext(network)
+        attribute_values = context.feature_values(self.feature)
 
-        return (max(attribute_values) - min(attribute_values))
+        return (attribute_values.max() - attribute_values.min()).item()
 
 
 class CoverageReporter(OutputTableCreator):
@@ -156,8 +298,9 @@ class CoverageReporter(OutputTableCreator):
     def __init__(self, feature: str = 'f01'):
         super().__init__()
         self.feature = feature
+        self.requires = [('feature_values', feature)]
 
-    def create_output(self, network: nx.Graph, **kwargs):
+    def create_output(self, network: nx.Graph, context: OutputContext = None, **kwargs):
         """
         Report coverage for nondiscrete features, following [Bramson2016]_.
         Its goal is to report the proportion of distinct opinion positions held by the agents in the model.
@@ -168,12 +311,15 @@ class CoverageReporter(OutputTableCreator):
         The minimum coverage value is equal to 1 divided by the number of agents in the network.
 
         :param network: A NetworkX object
+        :param context: An :class:`OutputContext` for the network. If None, a new one is created.
         :return: Coverage (float)
         """
 
-        sortdata = sorted(nx.get_node_attributes(network, self.feature).values())
+        if context is None:
+            context = OutputContext(network)
+        sortdata = np.sort(context.feature_values(self.feature)).tolist()
 
-        halo_radius = 0.5 / len(network.nodes)
+        halo_radius = 0.5 / context.num_agents
         lo_bounds = [i - halo_radius for i in sortdata]
         hi_bounds = [i + halo_radius for i in sortdata]
 
@@ -189,4 +335,255 @@ class CoverageReporter(OutputTableCreator):
             else:  # i == len(sortdata)-1
                 if hi_bounds[i] < 1:
                     area_not_covered += 1 - hi_bounds[i]
-        return (1 - area_not_covered)
\ No newline at end of file
+        return (1 - area_not_covered)
+
+
+class IncrementalReporter(OutputTableCreator):
+    """
+    Base class of reporters that keep a statistic up to date from the influence events of a simulation, instead of
+    computing it from the values of all agents every time they are called. Used as tickwise realizations of a
+    :class:`~defSim.Simulation.Simulation`, they compute the statistic from the network at the first recorded tick,
+    and then update it for every change of an agent (see :meth:`~defSim.Simulation.Simulation.on_influence`), so
+    recording the statistic costs O(1) amortized per tick instead of O(N). They report the same values as the reporters
+    they replace, and can also be used as those outside of a simulation.
+
+    The statistic is computed again from the network after every N updates (for N agents), so rounding errors do not
+    accumulate, and whenever it is asked for a different network.
+
+    :param str='f01' feature: The name of the feature.
+    """
+
+    def __init__(self, feature: str = 'f01'):
+        super().__init__()
+        self.feature = feature
+        self._network = None
+        self._positions = {}
+        self._values = None
+        self._updates = 0
+
+    def reset(self):
+        """
+        Discards the statistic, which is computed again from the network the next time it is asked for.
+        """
+        self._network = None
+
+    def start(self, network: nx.Graph):
+        """
+        Computes the statistic from the values of all agents of a network, and follows its changes from then on.
+        """
+        self._network = network
+        self._positions = {agent: position for position, agent in enumerate(network)}
+        self._values = np.fromiter((attributes[self.feature] for _, attributes in network.nodes(data=True)),
+                                   dtype=float, count=network.number_of_nodes())
+        self._updates = 0
+        self._start()
+
+    def on_influence(self, agent: int, feature: str, old_value, new_value):
+        """
+        Updates the statistic for a change of the feature of an agent.
+        """
+        if feature != self.feature or self._network is None:
+            return
+        position = self._positions[agent]
+        self._update(position, self._values[position], new_value)
+        self._values[position] = new_value
+        self._updates += 1
+        if self._updates >= len(self._values):
+            self._network = None
+
+    def create_output(self, network: nx.Graph, **kwargs):
+        """
+        :param network: A NetworkX object
+        :returns: The current value of the statistic.
+        """
+        if network is not self._network:
+            self.start(network)
+        return self._value()
+
+    def _start(self):
+        pass
+
+    def _update(self, position: int, old_value: float, new_value: float):
+        pass
+
+    @abstractmethod
+    def _value(self):
+        """
+        :returns: The current value of the statistic.
+        """
+        pass
+
+
+class IncrementalAverageOpinionReporter(IncrementalReporter):
+    """
+    Reports the same average opinion as the :class:`AverageOpinionReporter`, from a running sum.
+    """
+
+    label = "AverageOpinion"
+
+    def _start(self):
+        self._sum = self._values.sum()
+
+    def _update(self, position: int, old_value: float, new_value: float):
+        self._sum += new_value - old_value
+
+    def _value(self):
+        return self._sum.item() / len(self._values)
+
+
+class IncrementalSpreadReporter(IncrementalReporter):
+    """
+    Reports the same spread as the :class:`SpreadReporter`, from a heap of the lowest and a heap of the highest values.
+    Changed values are pushed as new entries, and entries of values that have since changed are dropped when they
+    reach the top of a heap.
+    """
+
+    label = "Spread"
+
+    def _start(self):
+        self._lowest = [(value, position) for position, value in enumerate(self._values.tolist())]
+        self._highest = [(-value, position) for value, position in self._lowest]
+        heapq.heapify(self._lowest)
+        heapq.heapify(self._highest)
+
+    def _update(self, position: int, old_value: float, new_value: float):
+        heapq.heappush(self._lowest, (new_value, position))
+        heapq.heappush(self._highest, (-new_value, position))
+
+    def _value(self):
+        values = self._values
+        lowest, highest = self._lowest, self._highest
+        while lowest[0][0] != values[lowest[0][1]]:
+            heapq.heappop(lowest)
+        while -highest[0][0] != values[highest[0][1]]:
+            heapq.heappop(highest)
+        return float(-highest[0][0] - lowest[0][0])
+
+
+class IncrementalDispersionReporter(IncrementalReporter):
+    """
+    Reports the same dispersion as the :class:`DispersionReporter`, the average absolute deviation from the mean. The
+    sum of absolute deviations is computed from the number and the sum of the values below and above a pivot close
+    to the mean, which are updated for every change. The values closest to the pivot are kept in a small sorted array,
+    to correct for the values between the pivot and the current mean. The pivot is moved to the mean (in O(N), with
+    NumPy) when the mean moves past these values, or when too many values come close to the pivot.
+
+    :param str='f01' feature: The name of the feature.
+    :param int=64 window_size: The number of values closest to the pivot that are kept sorted.
+    """
+
+    label = "Dispersion"
+
+    def __init__(self, feature: str = 'f01', window_size: int = 64):
+        super().__init__(feature=feature)
+        self.window_size = window_size
+
+    def _start(self):
+        self._sum = self._values.sum()
+        self._move_pivot(self._sum / len(self._values))
+
+    def _move_pivot(self, pivot: float):
+        values = self._values
+        self._pivot = pivot
+        below, above = values < pivot, values > pivot
+        self._num_below, self._sum_below = int(below.sum()), values[below].sum()
+        self._num_above, self._sum_above = int(above.sum()), values[above].sum()
+        self._num_equal = len(values) - self._num_below - self._num_above
+        # the window holds the values closer to the pivot than the window_size-th closest value
+        distances = np.abs(values - pivot)
+        distances = distances[distances > 0]
+        if len(distances) > self.window_size:
+            self._width = np.partition(distances, self.window_size)[self.window_size]
+        else:
+            self._width = np.inf
+        self._window = np.sort(values[(values != pivot) & (np.abs(values - pivot) < self._width)])
+
+    def _update(self, position: int, old_value: float, new_value: float):
+        self._sum += new_value - old_value
+        self._count(old_value, -1)
+        self._count(new_value, 1)
+
+    def _count(self, value: float, sign: int):
+        if value < self._pivot:
+            self._num_below += sign
+            self._sum_below += sign * value
+        elif value > self._pivot:
+            self._num_above += sign
+            self._sum_above += sign * value
+        else:
+            self._num_equal += sign
+            return
+        if abs(value - self._pivot) < self._width:
+            if sign > 0:
+                self._window = np.insert(self._window, np.searchsorted(self._window, value), value)
+            else:
+                index = np.searchsorted(self._window, value)
+                if index < len(self._window) and self._window[index] == value:
+                    self._window = np.delete(self._window, index)
+
+    def _value(self):
+        num_agents = len(self._values)
+        mean = self._sum / num_agents
+        if abs(mean - self._pivot) >= self._width or len(self._window) > 4 * self.window_size:
+            self._move_pivot(mean)
+        pivot, window = self._pivot, self._window
+        deviation = (mean * self._num_below - self._sum_below + self._num_equal * abs(mean - pivot) +
+                     self._sum_above - mean * self._num_above)
+        # values between the pivot and the mean are on the other side of the mean than the sums assume
+        if mean > pivot:
+            between = window[np.searchsorted(window, pivot, side='right'):np.searchsorted(window, mean)]
+            deviation += 2 * (mean * len(between) - between.sum())
+        elif mean < pivot:
+            between = window[np.searchsorted(window, mean, side='right'):np.searchsorted(window, pivot)]
+            deviation += 2 * (between.sum() - mean * len(between))
+        return float(2 / num_agents * deviation)
+
+
+class IncrementalAverageDistanceReporter(IncrementalReporter):
+    """
+    Reports the same average distance as the :class:`AverageDistanceReporter`, from a running sum of the distances of
+    all edges. The agents that changed are collected, and the distances of their edges are read when the average is
+    reported, so every edge is read at most once per report. The average distance depends on all features, so every
+    change of an agent is followed, whatever the feature. Like the :class:`AverageDistanceReporter`, it reports NaN for
+    a network without edges.
+    """
+
+    label = "AverageDistance"
+
+    def __init__(self):
+        super().__init__(feature=None)
+
+    def start(self, network: nx.Graph):
+        self._network = network
+        sources, targets, self._distances = edge_distance_array(network)
+        agents = list(network)
+        self._edges = {(agents[source], agents[target]): edge for edge, (source, target)
+                       in enumerate(zip(sources.tolist(), targets.tolist()))}
+        if not network.is_directed():
+            self._edges.update({(target, source): edge for (source, target), edge in list(self._edges.items())})
+        self._sum = self._distances.sum()
+        self._changed = set()
+        self._updates = 0
+
+    def on_influence(self, agent: int, feature: str, old_value, new_value):
+        if self._network is not None:
+            self._changed.add(agent)
+
+    def _value(self):
+        network, distances, edges = self._network, self._distances, self._edges
+        for agent in self._changed:
+            incident = network.edges(agent, data='dist', default=0)
+            if network.is_directed():
+                incident = list(incident) + list(network.in_edges(agent, data='dist', default=0))
+            for source, target, distance in incident:
+                edge = edges[(source, target)]
+                self._sum += distance - distances[edge]
+                distances[edge] = distance
+                self._updates += 1
+        self._changed.clear()
+        if len(distances) == 0:
+            return float('nan')
+        average = self._sum.item() / len(distances)
+        if self._updates >= len(distances):
+            self._network = None
+        return average
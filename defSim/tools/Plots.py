@@ -7,12 +7,14 @@ Requires:
 """
 
 import matplotlib.pyplot as plt
+from matplotlib.collections import LineCollection
 import seaborn as sns
 import networkx as nx
 import numpy as np
 import pandas as pd
-import itertools
 import copy
+from defSim.tools.TickwiseRecorder import read_tickwise, histogram_rows, TrajectoryHistogram
+from defSim.tools.Layouts import LayoutCache, positions_array, edge_indices
 
 
 class dsPlot:
@@ -34,19 +36,27 @@ class dsPlot:
 
 class NetworkPlot(dsPlot):
     """
-    Facilitates creating network plots, using networkx plot functions. These functions
-    use matplotlib behind the scenes.
+    Facilitates creating network plots with matplotlib. The edges are drawn as a single LineCollection and the nodes
+    as a single scatter plot, so networks with hundreds of thousands of agents are drawn in seconds. Layouts are
+    cached by the structure of the network, so plotting the same network at many points in time lays it out once,
+    and in the same way every time.
 
     :param float node_size=100: Sets the size of nodes in the plot.
     :param cmap: Matplotlib color map to apply to the network nodes.
     :param float edge_alpha=0.2: Sets opacity of edges.
+    :param layout_cache: A :class:`~defSim.tools.Layouts.LayoutCache`, which can be shared between plots and can keep
+        layouts on disk. If None, the plot keeps its own cache in memory.
     """
 
-    def __init__(self, node_size: float = 100, cmap=plt.cm.winter, edge_alpha: float = 0.2):
+    edges_per_path = 1000
+
+    def __init__(self, node_size: float = 100, cmap=plt.cm.winter, edge_alpha: float = 0.2,
+                 layout_cache: LayoutCache = None):
         super().__init__()
         self.node_size = node_size
         self.cmap = cmap
         self.edge_alpha = edge_alpha
+        self.layout_cache = layout_cache if layout_cache is not None else LayoutCache()
 
     def plot(self, network, feature: str = None, colors=None, title=None, pos=None, layout=nx.spring_layout):
         """
@@ -59,47 +69,45 @@ class NetworkPlot(dsPlot):
         colors are set based on the colormap.
         :param str title: Title for the plot
         :param pos: (Optional) representation of network position for each node, can be used to keep the network
-            layout exactly the same between plots. If pos is not given, network positions are generated using
-            layout function.
+            layout exactly the same between plots. Either a dictionary with the position of each node, or an array
+            with one row per node, such as the positions returned by
+            :func:`~defSim.network_init.network_init._produce_spatial_random_graph` with return_positions=True. If pos
+            is not given, network positions are generated using layout function.
         :param networkx.spring_layout layout: Function to use to generate the network layout. Can also be set to
-            'grid' to plot grid networks accurately, as there is no standard networkx layout for this.
+            'grid' or 'ring' to plot grid and ring networks accurately (and without the cost of a force-directed
+            layout), as there are no standard networkx layouts for these.
         """
 
-        # Get all nodes in the network
-        nodes = network.nodes()
+        # Determine network layout if pos is not set
+        if pos is None:
+            positions = self.layout_cache.positions(network, layout)
+        else:
+            positions = positions_array(network, pos)
 
         # If a feature is chosen, colors and associated limits are set based on values of that feature
         # If no feature is chose, all agents get the same color
-        if colors is None:
-            if feature is not None:
-                vmin = min([network.nodes[n][feature] for n in nodes])
-                vmax = max([network.nodes[n][feature] for n in nodes])
-                colors = [network.nodes[n][feature] for n in nodes]
-            else:
-                vmin, vmax = 1, 1
+        if colors is None and feature is not None:
+            colors = np.fromiter((network.nodes[n][feature] for n in network.nodes), dtype=float,
+                                 count=network.number_of_nodes())
 
-        # Determine network layout if pos is not set
-        if pos is None:
-            if isinstance(layout, str) and layout.lower() == 'grid':
-                # we infer the positions of the nodes from their index
-                pos = dict()
-                for i in network.nodes():
-                    pos[i] = [int(i / 10), i % 10]
-            else:
-                pos = layout(network)
+        ax = plt.gca()
 
-        # Draw edges
-        ec = nx.draw_networkx_edges(network, pos, alpha=self.edge_alpha)
+        # Draw edges, with a path per batch of edges (separated by NaN) instead of a path per edge, which is much faster
+        # to create and render. The limits of the axes are set by the nodes, at the ends of the edges.
+        edges = positions[edge_indices(network)]
+        vertices = np.concatenate([edges, np.full((len(edges), 1, 2), np.nan)], axis=1).reshape(-1, 2)
+        batch = 3 * self.edges_per_path
+        ec = LineCollection([vertices[start:start + batch] for start in range(0, len(vertices), batch)], colors='k',
+                            alpha=self.edge_alpha, zorder=1)
+        ax.add_collection(ec, autolim=False)
 
         # Draw nodes
-        if feature is not None:
-            nc = nx.draw_networkx_nodes(network, pos, nodelist=nodes, node_color=colors, node_size=self.node_size,
-                                        cmap=self.cmap, vmin=vmin, vmax=vmax)
+        if colors is not None:
+            nc = ax.scatter(positions[:, 0], positions[:, 1], s=self.node_size, c=colors,
+                            cmap=self.cmap if feature is not None else None, zorder=2)
         else:
-            nc = nx.draw_networkx_nodes(network, pos, nodelist=nodes,
-                                        node_size=self.node_size, cmap=self.cmap,
-                                        vmin=vmin, vmax=vmax
-                                        )
+            nc = ax.scatter(positions[:, 0], positions[:, 1], s=self.node_size, c='#1f78b4', zorder=2)
+        ax.autoscale_view()
 
         if title is not None:
             plt.title(title)
@@ -112,10 +120,11 @@ class NetworkPlot(dsPlot):
 class DynamicsPlot(dsPlot):
     """
     Facilitates plotting the dynamics of opinion changes for a feature.
-    Uses seaborn relplot behind the scenes.
+    Uses seaborn relplot behind the scenes, or a single matplotlib LineCollection for long trajectories of many agents.
     """
 
-    def __init__(self, colors='blue', palette="deep", linewidth=.8, ylim=None, xlim=None, fast: bool = False):
+    def __init__(self, colors='blue', palette="deep", linewidth=.8, ylim=None, xlim=None, fast: bool = False,
+                 scalable: bool = False, resolution: int = None):
         """
             :param colors: List of colors, used to color the lines. If None,
                 colors are set based on the palette. Usually, the number of hues should equal the number of agents
@@ -128,6 +137,13 @@ class DynamicsPlot(dsPlot):
             :param xlim: Iterable with 2 values, which gives (xmin, xmax)
             :param bool fast=False: If True, show plain (but fast) plot. If False, show plot with customizable markup
                 (slow).
+            :param bool scalable=False: If True, the trajectories are decimated to the resolution of the plot and drawn
+                as a single LineCollection, which takes seconds and bounded memory for millions of agent-ticks. The
+                ticks are divided in as many buckets as there are horizontal pixels, and the minimum and maximum of each
+                agent in each bucket are drawn, so the extremes of the trajectories are kept. Takes precedence over
+                fast.
+            :param int=None resolution: The number of buckets used by the scalable plot. If None, the width of the
+                axes in pixels.
             """
         super().__init__()
         self.colors = colors
@@ -136,6 +152,8 @@ class DynamicsPlot(dsPlot):
         self.ylim = ylim
         self.xlim = xlim
         self.fast = fast
+        self.scalable = scalable
+        self.resolution = resolution
 
     def plot(self, data, y: str = "Tickwise_f01", hue=None, xlab: str = None, ylab: str = None, ylim=None, xlim=None):
         """
@@ -161,26 +179,26 @@ class DynamicsPlot(dsPlot):
         if xlim is None:
             xlim = self.xlim
 
-        if self.fast:
-            plt.plot(data[y][0], color=self.colors, linewidth=self.linewidth)
+        if self.scalable:
+            self._plot_collection(read_tickwise(data[y][0]), hue=hue, xlab=xlab, ylab=ylab, ylim=ylim, xlim=xlim)
+        elif self.fast:
+            plt.plot(read_tickwise(data[y][0]), color=self.colors, linewidth=self.linewidth)
         else:
-            listvals = data[y][0]
+            listvals = read_tickwise(data[y][0])
             n_steps = len(listvals)
             n_agents = len(listvals[0])
 
             # set format: the first n_agents values are step 1, then the next n_agents values are step 2, etc...
-            values = list(itertools.chain(*listvals))
-            agents = [i + 1 for i in range(n_agents)] * n_steps
-            steps = np.repeat([i + 1 for i in range(n_steps)], repeats=n_agents)
-            records = list(zip(steps, agents, values))
-            df = pd.DataFrame.from_records(records, columns=['step', 'agent', 'value'])
+            df = pd.DataFrame({'step': np.repeat(np.arange(1, n_steps + 1), n_agents),
+                               'agent': np.tile(np.arange(1, n_agents + 1), n_steps),
+                               'value': np.asarray(listvals).reshape(-1)})
 
             if hue is None:
                 hue = 'agent'
             else:
-                hue = list(hue) * n_steps
+                hue = np.tile(np.asarray(list(hue)), n_steps)
 
-            df['hue'] = df['agent'] if hue == 'agent' else hue
+            df['hue'] = df['agent'] if isinstance(hue, str) else hue
 
             if self.colors is not None:
                 palette = sns.color_palette(self.colors)
@@ -199,6 +217,86 @@ class DynamicsPlot(dsPlot):
 
             ax.set(ylim=ylim, xlim=xlim, xlabel=xlab, ylabel=ylab)
 
+    def _plot_collection(self, values, hue=None, xlab: str = None, ylab: str = None, ylim=None, xlim=None):
+        """
+        Draws the decimated trajectories of all agents as a single LineCollection on the current axes.
+        """
+        ax = plt.gca()
+        resolution = self.resolution
+        if resolution is None:
+            resolution = max(1, int(ax.get_window_extent().width))
+        ticks, extremes = decimate_min_max(values, resolution)
+        n_agents = extremes.shape[1]
+
+        # one line per agent, with the steps counted from 1 as in the other plots
+        segments = np.empty((n_agents, len(ticks), 2))
+        segments[:, :, 0] = ticks.T + 1
+        segments[:, :, 1] = extremes.T
+
+        if hue is not None:
+            hue = list(hue)
+            groups = list(dict.fromkeys(hue))
+            if self.colors is not None and not isinstance(self.colors, str):
+                palette = sns.color_palette(self.colors)
+            else:
+                palette = sns.color_palette(self.palette, n_colors=len(groups))
+            colors = [palette[groups.index(group) % len(palette)] for group in hue]
+        elif self.colors is not None:
+            colors = self.colors
+        else:
+            colors = sns.color_palette(self.palette, n_colors=n_agents)
+
+        lines = LineCollection(segments, colors=colors, linewidths=self.linewidth)
+        ax.add_collection(lines)
+        ax.autoscale_view()
+        ax.set(xlabel=xlab if xlab is not None else 'step', ylabel=ylab if ylab is not None else 'value')
+        if ylim is not None:
+            ax.set_ylim(ylim)
+        if xlim is not None:
+            ax.set_xlim(xlim)
+        return lines
+
+
+def decimate_min_max(values, num_buckets: int, chunk_bytes: int = 2 ** 26) -> tuple:
+    """
+    Reduces tickwise values to at most two points per bucket of consecutive ticks for every agent: the minimum and the
+    maximum of the agent in the bucket, in the order in which they occurred. Lines through these points look the same
+    as lines through all values when each bucket is drawn in one pixel column. Ticks are read in chunks of about
+    chunk_bytes, so values that are memory mapped are not read into memory at once.
+
+    :param values: Tickwise values, with one row per tick and one column per agent.
+    :param int num_buckets: The number of buckets. If there are no more than twice as many ticks, all values are kept.
+    :param int=2**26 chunk_bytes: The approximate number of bytes of values read at once.
+    :returns: A tuple of two arrays with one row per point and one column per agent: the ticks (row indices) of the
+        points and their values.
+    """
+    values = read_tickwise(values)
+    n_ticks, n_agents = values.shape
+    if n_ticks <= 2 * num_buckets:
+        return np.repeat(np.arange(n_ticks)[:, np.newaxis], n_agents, axis=1), np.asarray(values, dtype=float)
+
+    bucket_size = -(-n_ticks // num_buckets)
+    num_buckets = -(-n_ticks // bucket_size)
+    ticks = np.empty((2 * num_buckets, n_agents), dtype=np.int64)
+    extremes = np.empty((2 * num_buckets, n_agents), dtype=float)
+    buckets_per_chunk = max(1, chunk_bytes // max(1, bucket_size * n_agents * values.dtype.itemsize))
+    for start in range(0, num_buckets, buckets_per_chunk):
+        stop = min(num_buckets, start + buckets_per_chunk)
+        block = np.asarray(values[start * bucket_size:stop * bucket_size], dtype=float)
+        if len(block) < (stop - start) * bucket_size:
+            # the last bucket is filled up with its last tick
+            block = np.concatenate([block, np.repeat(block[-1:], (stop - start) * bucket_size - len(block), axis=0)])
+        block = block.reshape(stop - start, bucket_size, n_agents)
+        lowest, highest = block.argmin(axis=1), block.argmax(axis=1)
+        first, second = np.minimum(lowest, highest), np.maximum(lowest, highest)
+        offsets = (np.arange(start, stop) * bucket_size)[:, np.newaxis]
+        ticks[2 * start:2 * stop:2] = offsets + first
+        ticks[2 * start + 1:2 * stop:2] = offsets + second
+        extremes[2 * start:2 * stop:2] = np.take_along_axis(block, first[:, np.newaxis], axis=1)[:, 0]
+        extremes[2 * start + 1:2 * stop:2] = np.take_along_axis(block, second[:, np.newaxis], axis=1)[:, 0]
+    np.minimum(ticks, n_ticks - 1, out=ticks)
+    return ticks, extremes
+
 
 class RelPlot(dsPlot):
     """
@@ -399,36 +497,47 @@ class HeatMap(dsPlot):
 class TrajectoryHeatPlot(dsPlot):
     """
     This class creates a 2D heatmap of continuous features by time. It is used to plot opinion trajectories much like
-    'DynamicsPlot', but conveys agent density in each position.
+    'DynamicsPlot', but conveys agent density in each position. Record a
+    :class:`~defSim.tools.TickwiseRecorder.TrajectoryHistogram` during the run to plot long trajectories without
+    storing the opinion of every agent at every tick.
     """
 
-    def __init__(self, data=None, y: str = "Tickwise_f01", bins=20):
+    def __init__(self, data=None, y: str = "Tickwise_f01", bins=20, value_range: tuple = (0, 1)):
         """
-        :param data: A Pandas dataframe that contains the variable with name 'y'. This dataframe is used to extract the
-            tickwise lists of opinions and converted to a time by bins array of opinion frequencies.
+        :param data: A Pandas dataframe that contains the variable with name 'y', or a
+            :class:`~defSim.tools.TickwiseRecorder.TrajectoryHistogram`. From a dataframe, the tickwise lists of
+            opinions are extracted and converted to a time by bins array of opinion frequencies. A TrajectoryHistogram
+            (in the dataframe or passed directly) already holds these frequencies, and is plotted as it is.
         :param str y: The name of the y-column to be extracted from the dataframe. The column should contain a list of
-            lists.
-        :param int bins: The number of bins used for the frequency table.
-        :param ylim:
+            lists, a two-dimensional array, the path to tickwise output that was streamed to disk or a
+            TrajectoryHistogram.
+        :param int bins: The number of bins used for the frequency table. Ignored for a TrajectoryHistogram.
+        :param tuple value_range: The range of the opinions. Ignored for a TrajectoryHistogram.
         """
         super().__init__()
         self.data = data
         self.y = y
         self.bins = bins
+        self.value_range = tuple(value_range)
 
     def prep_data(self):
         """
-        Preparing the data can take quite a while, this function can be run separately to create the appropriate data. It is only called by the `plot' function if no `z' data is provided.
+        Preparing the data can take a while for long trajectories of many agents, this function can be run separately
+        to create the appropriate data. It is only called by the `plot' function if no `z' data is provided. It is not
+        needed if the data is a TrajectoryHistogram, which is binned during the run.
         """
-        df = self.data[self.y][0]
-        max_iter = len(df)
-
-        z = []
-        bins = [i / self.bins for i in range(self.bins + 1)]
-        for i in range(max_iter):
-            z.append(pd.cut(df[i], bins).value_counts().to_list())
-        z = np.array(z)
-        return z
+        data = self.data if isinstance(self.data, TrajectoryHistogram) else self.data[self.y][0]
+        if isinstance(data, TrajectoryHistogram):
+            self.bins, self.value_range = data.bins, data.value_range
+            return data.to_array()
+
+        values = read_tickwise(data)
+        edges = np.linspace(self.value_range[0], self.value_range[1], self.bins + 1)
+        # ticks are binned in chunks, so trajectories that were streamed to disk are not read into memory at once
+        chunk_rows = max(1, 2 ** 20 // max(1, values.shape[1]))
+        return np.concatenate([histogram_rows(values[start:start + chunk_rows], edges)
+                               for start in range(0, len(values), chunk_rows)] or
+                              [np.zeros((0, self.bins), dtype=np.int64)])
 
     def plot(self, z=None, fig=None, ax=None, palette="rainbow", facecolor='lightgrey',
              xlab: str = "Time", ylab: str = "Opinion"):
@@ -468,7 +577,8 @@ class TrajectoryHeatPlot(dsPlot):
 
         fig.colorbar(im, extend='min', label='Freq', pad=0.02)
 
-        ax.set(xlabel=xlab, ylabel=ylab, yticks=[0 - 0.5, self.bins - 0.5], yticklabels=['0', '1'])
+        ax.set(xlabel=xlab, ylabel=ylab, yticks=[0 - 0.5, np.shape(z)[1] - 0.5],
+               yticklabels=['{:g}'.format(self.value_range[0]), '{:g}'.format(self.value_range[1])])
         ax.invert_yaxis()
 
         plt.tight_layout()
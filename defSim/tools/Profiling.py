@@ -0,0 +1,166 @@
+import cProfile
+import collections
+import math
+import os
+import pathlib
+import pstats
+import random
+import uuid
+from typing import List
+from defSim.tools.ExperimentStore import stable_repr
+
+
+class ProfiledParameters(dict):
+    """
+    The parameter dictionary of a simulation that is profiled. It is a normal dictionary otherwise, so the simulation
+    and its results are the same, and it marks the simulation also after it is sent to a worker process.
+    """
+
+
+class Profiler:
+    """
+    This class profiles a sample of the simulations of an experiment in the processes that run them, so profiles of
+    parallel experiments show the simulations rather than the parent process waiting for the workers. Pass it to an
+    :class:`~defSim.Experiment.Experiment` with the profile argument::
+
+        experiment = Experiment(..., profile=Profiler("profiles", sample=0.05))
+        experiment.run(parallel=True)
+
+    The sample is drawn systematically from the simulations ordered by parameter combination, so every combination is
+    profiled in proportion to its number of simulations and the merged profile reflects the mix of the experiment.
+    Every profiled simulation writes a stats file to the folder. When the experiment is done, these are merged into
+    combined.prof, which can be read with :mod:`pstats` or tools such as snakeviz, and combined.collapsed, with one
+    line per call stack in the collapsed format of flamegraph tools (flamegraph.pl, inferno, speedscope).
+
+    :param folder: The folder of the profiles. It is created if it does not exist.
+    :param float=0.1 sample: The share of the simulations that is profiled if it is below 1, otherwise the number of
+        profiled simulations.
+    :param profiler: A callable that creates a profiler with the enable, disable and dump_stats methods of
+        cProfile.Profile, whose files can be read by pstats.
+    :param int=None seed: The seed of the sample.
+    """
+
+    def __init__(self, folder: str or pathlib.Path = "profiles", sample: float = 0.1, profiler=cProfile.Profile,
+                 seed: int = None):
+        self.folder = pathlib.Path(folder).resolve()
+        self.sample = sample
+        self.profiler = profiler
+        self.seed = seed
+
+    def select(self, parameter_dicts: List[dict]) -> List[dict]:
+        """
+        Draws the sample of simulations to profile, and removes the profiles of a previous run from the folder.
+
+        :param parameter_dicts: The parameter dictionaries of all simulations.
+        :returns: The parameter dictionaries, with those of the sampled simulations replaced by ProfiledParameters.
+        """
+        self.folder.mkdir(parents=True, exist_ok=True)
+        for path in self.folder.glob("simulation_*.prof"):
+            path.unlink()
+
+        cells = collections.defaultdict(list)
+        for index, parameter_dict in enumerate(parameter_dicts):
+            cells[stable_repr({key: value for key, value in parameter_dict.items()
+                               if key not in ('seed', 'np_random_generator')})].append(index)
+        ordered = [index for indices in cells.values() for index in indices]
+        size = self.sample_size(len(ordered))
+        selected = set()
+        if size > 0:
+            step = len(ordered) / size
+            offset = random.Random(self.seed).uniform(0, step)
+            selected = {ordered[min(len(ordered) - 1, int(offset + number * step))] for number in range(size)}
+        return [ProfiledParameters(parameter_dict) if index in selected else parameter_dict
+                for index, parameter_dict in enumerate(parameter_dicts)]
+
+    def sample_size(self, num_simulations: int) -> int:
+        """
+        :returns: The number of simulations that are profiled out of num_simulations.
+        """
+        if self.sample < 1:
+            return min(num_simulations, math.ceil(self.sample * num_simulations))
+        return min(num_simulations, int(self.sample))
+
+    def run(self, function, *args, **kwargs):
+        """
+        Calls function(*args, **kwargs) with the profiler enabled, and writes the stats to the folder.
+
+        :returns: The return value of the function.
+        """
+        profiler = self.profiler()
+        profiler.enable()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            profiler.disable()
+            self.folder.mkdir(parents=True, exist_ok=True)
+            path = self.folder / "simulation_{}.prof".format(uuid.uuid4().hex)
+            temporary_path = path.with_suffix(".{}.tmp".format(os.getpid()))
+            profiler.dump_stats(str(temporary_path))
+            temporary_path.replace(path)  # merging never reads a partially written file
+
+    def merge(self) -> pstats.Stats or None:
+        """
+        Merges the stats of all profiled simulations, and writes them to combined.prof and combined.collapsed.
+
+        :returns: The merged Stats, or None if no simulation was profiled.
+        """
+        paths = sorted(str(path) for path in self.folder.glob("simulation_*.prof"))
+        if not paths:
+            return None
+        stats = pstats.Stats(*paths)
+        stats.dump_stats(str(self.folder / "combined.prof"))
+        write_collapsed_stacks(stats, self.folder / "combined.collapsed")
+        return stats
+
+
+def write_collapsed_stacks(stats: pstats.Stats, path: str or pathlib.Path, max_depth: int = 64,
+                           min_share: float = 1e-5):
+    """
+    Writes stats in the collapsed stack format of flamegraph tools: one line per call stack, with the functions from
+    the outermost to the innermost separated by semicolons, followed by the time spent in the innermost function in
+    microseconds. Profiles only record which function called which, so the time of a function is divided over its
+    call stacks in proportion to the time of the calls from each caller.
+
+    :param stats: The pstats.Stats to write.
+    :param path: The path of the file.
+    :param int=64 max_depth: The maximum depth of a stack.
+    :param float=1e-5 min_share: Stacks with less than this share of the total time are left out.
+    """
+    entries = stats.stats
+    callees = collections.defaultdict(dict)
+    for function, (_, _, _, _, callers) in entries.items():
+        for caller, caller_stats in callers.items():
+            callees[caller][function] = caller_stats[3] if isinstance(caller_stats, tuple) else 0
+    roots = [function for function, entry in entries.items() if not set(entry[4]) - {function}]
+    total = sum(entries[function][3] for function in roots) or 1.0
+
+    lines = collections.Counter()
+
+    def walk(function, stack: list, share: float):
+        _, _, own_seconds, cumulative_seconds, _ = entries[function]
+        stack = stack + [_label(function)]
+        microseconds = int(round(own_seconds * share * 1e6))
+        if microseconds > 0:
+            lines[";".join(stack)] += microseconds
+        if len(stack) >= max_depth:
+            return
+        for callee, call_seconds in callees[function].items():
+            if callee not in entries or _label(callee) in stack:  # recursive calls are counted in the outer call
+                continue
+            seconds = call_seconds * share
+            callee_seconds = entries[callee][3]
+            if seconds / total >= min_share and callee_seconds > 0:
+                walk(callee, stack, min(1.0, seconds / callee_seconds))
+
+    for root in roots:
+        walk(root, [], 1.0)
+    with open(path, 'w') as collapsed_file:
+        for stack, microseconds in sorted(lines.items()):
+            collapsed_file.write("{} {}\n".format(stack, microseconds))
+
+
+def _label(function: tuple) -> str:
+    file_name, line, name = function
+    if file_name == '~':  # built-in functions
+        return name.replace(";", ",")
+    return "{} ({}:{})".format(name, os.path.basename(file_name), line).replace(";", ",")
@@ -0,0 +1,118 @@
+import numpy as np
+import networkx as nx
+
+
+class SharedNetwork:
+    """
+    This class holds the structure of a network in a compact array form, so it can be sent to worker processes once
+    instead of pickling a NetworkX graph for every simulation. Agents are stored once in node order, and the neighbors
+    of each agent as positions in a compressed sparse row layout, in the order in which NetworkX lists them. Node and
+    tie attributes are only stored if the network has any, as a snapshot taken when the SharedNetwork is created.
+
+    Every call to :meth:`to_graph` returns a new, private graph over this read-only structure. The agents and ties of
+    that graph get their own attribute dictionaries, so simulations can change attributes and distances freely. The
+    graph is built directly from the arrays, which is considerably faster than copying a NetworkX graph.
+
+    :param network: A NetworkX Graph or DiGraph.
+    """
+
+    def __init__(self, network: nx.Graph):
+        if network.is_multigraph():
+            raise ValueError("Multigraphs cannot be shared in array form")
+        self.directed = network.is_directed()
+        self.graph_attributes = dict(network.graph)
+        self.nodes = list(network)
+
+        # every tie gets a number, which is shared by both directions of the tie in an undirected network
+        index = {agent: position for position, agent in enumerate(self.nodes)}
+        edge_ids = {}
+        edge_attributes = []
+        for agent, neighbor, attributes in network.edges(data=True):
+            edge_ids[agent, neighbor] = len(edge_attributes)
+            edge_attributes.append(dict(attributes))
+        self.edge_attributes = edge_attributes if any(edge_attributes) else None
+
+        def edge_id(agent, neighbor):
+            if (agent, neighbor) in edge_ids:
+                return edge_ids[agent, neighbor]
+            return edge_ids[neighbor, agent]
+
+        self.successors = _adjacency_arrays(network._adj if not self.directed else network._succ, index, edge_id)
+        if self.directed:
+            self.predecessors = _adjacency_arrays(network._pred, index, lambda agent, neighbor: edge_id(neighbor, agent))
+        else:
+            self.predecessors = None
+
+        node_attributes = [dict(attributes) for _, attributes in network.nodes(data=True)]
+        self.node_attributes = node_attributes if any(node_attributes) else None
+
+    def number_of_nodes(self) -> int:
+        return len(self.nodes)
+
+    def number_of_edges(self) -> int:
+        num_entries = len(self.successors[1])
+        return num_entries if self.directed else (num_entries + np.count_nonzero(self._self_loops())) // 2
+
+    def to_graph(self) -> nx.Graph:
+        """
+        Creates a private graph with the shared structure. Agents, and the neighbors of every agent, are in the same
+        order as in the original network.
+
+        :returns: A new NetworkX Graph or DiGraph.
+        """
+        nodes = self.nodes
+        if self.node_attributes is None:
+            node_dict = {agent: {} for agent in nodes}
+        else:
+            node_dict = {agent: dict(attributes) for agent, attributes in zip(nodes, self.node_attributes)}
+        edge_data = [None] * (max(self.successors[2], default=-1) + 1)
+        edge_attributes = self.edge_attributes
+
+        # the adjacency dictionaries are filled in directly, which skips the checks of add_edges_from
+        successors = _adjacency_dicts(nodes, self.successors, edge_data, edge_attributes)
+        graph = nx.DiGraph() if self.directed else nx.Graph()
+        graph.graph.update(self.graph_attributes)
+        graph._node = node_dict
+        if self.directed:
+            graph._succ = graph._adj = successors
+            graph._pred = _adjacency_dicts(nodes, self.predecessors, edge_data, edge_attributes)
+        else:
+            graph._adj = successors
+        return graph
+
+    def _self_loops(self) -> np.ndarray:
+        indptr, indices, _ = self.successors
+        return indices == np.repeat(np.arange(len(self.nodes)), np.diff(indptr))
+
+
+def _adjacency_arrays(adjacency: dict, index: dict, edge_id) -> tuple:
+    """
+    Stores the neighbors of all agents in arrays: the start of the neighbors of each agent (indptr), the positions of
+    the neighbors (indices) and the number of the tie to each neighbor (edge_ids).
+    """
+    indptr = np.zeros(len(index) + 1, dtype=np.intp)
+    indptr[1:] = np.cumsum([len(adjacency[agent]) for agent in index])
+    indices = np.fromiter((index[neighbor] for agent in index for neighbor in adjacency[agent]), dtype=np.intp,
+                          count=indptr[-1])
+    edge_ids = np.fromiter((edge_id(agent, neighbor) for agent in index for neighbor in adjacency[agent]),
+                           dtype=np.intp, count=indptr[-1])
+    return indptr, indices, edge_ids
+
+
+def _adjacency_dicts(nodes: list, arrays: tuple, edge_data: list, edge_attributes: list) -> dict:
+    """
+    Creates the adjacency dictionaries of a graph from the arrays of :func:`_adjacency_arrays`. Both directions of a
+    tie share the same attribute dictionary, which is created the first time the tie is encountered.
+    """
+    indptr, indices, edge_ids = (array.tolist() for array in arrays)
+    adjacency = {}
+    for position, agent in enumerate(nodes):
+        neighbors = {}
+        for entry in range(indptr[position], indptr[position + 1]):
+            edge = edge_ids[entry]
+            data = edge_data[edge]
+            if data is None:
+                data = edge_data[edge] = {} if edge_attributes is None else dict(edge_attributes[edge])
+            neighbors[nodes[indices[entry]]] = data
+        adjacency[agent] = neighbors
+    return adjacency
@@ -0,0 +1,416 @@
+import numbers
+import pathlib
+import queue
+import struct
+import threading
+import uuid
+import numpy as np
+import networkx as nx
+from typing import List
+
+
+class TickwiseRecorder:
+    """
+    This class stores tickwise recordings of an agent feature in a preallocated two-dimensional NumPy array, in which
+    each row holds the values of all agents at one recorded tick. Compared to storing a Python list per tick, this keeps
+    memory usage at a few bytes per agent per recorded tick.
+
+    The array is allocated for the expected number of recorded ticks and grows geometrically if more rows are needed.
+    Numeric features are stored as float32, unless a dtype is given, such as int32 codes for categorical features.
+    Features that are not numeric are stored in an object array.
+
+    :param feature: The name of the agent feature to record.
+    :param agents: A list of the indices of all agents, in the order in which their values are stored in each row.
+    :param int=1024 expected_rows: The number of rows to allocate when recording starts.
+    :param dtype: The NumPy data type of the recorded values. If None, float32 for numeric features.
+    """
+
+    growth_factor = 2
+
+    def __init__(self, feature: str, agents: List[int], expected_rows: int = 1024, dtype=None):
+        self.feature = feature
+        self.agents = list(agents)
+        self.expected_rows = max(1, int(expected_rows))
+        self.dtype = dtype
+        self.num_rows = 0
+        self._data = None
+
+    def record(self, network: nx.Graph):
+        """
+        Gathers the current values of all agents on the recorded feature and appends them as a new row.
+
+        :param network: The network in which the agents exist.
+        """
+        nodes = network.nodes
+        feature = self.feature
+        if self._data is None:
+            if self.dtype is None:
+                self.dtype = _infer_dtype([nodes[agent][feature] for agent in self.agents])
+            self._data = np.empty((self.expected_rows, len(self.agents)), dtype=self.dtype)
+        elif self.num_rows == self._data.shape[0]:
+            self._grow()
+
+        if self._data.dtype == object:
+            self._data[self.num_rows] = [nodes[agent][feature] for agent in self.agents]
+        else:
+            self._data[self.num_rows] = np.fromiter((nodes[agent][feature] for agent in self.agents),
+                                                    dtype=self._data.dtype, count=len(self.agents))
+        self.num_rows += 1
+
+    def to_array(self) -> np.ndarray:
+        """
+        :returns: A NumPy array with one row per recorded tick and one column per agent.
+        """
+        if self._data is None:
+            return np.empty((0, len(self.agents)), dtype=self.dtype if self.dtype is not None else np.float32)
+        return self._data[:self.num_rows]
+
+    def _grow(self):
+        new_data = np.empty((self._data.shape[0] * self.growth_factor, self._data.shape[1]), dtype=self._data.dtype)
+        new_data[:self.num_rows] = self._data[:self.num_rows]
+        self._data = new_data
+
+
+class StreamingTickwiseRecorder(TickwiseRecorder):
+    """
+    This class records an agent feature like the :class:`TickwiseRecorder`, but streams the recorded ticks to a .npy file
+    during the run instead of keeping them in memory. Rows are collected in a buffer of chunk_rows ticks, and full
+    buffers are handed to a background thread that appends them to the file, so the simulation does not wait for disk
+    I/O. At most a few chunks are held in memory at any time, regardless of the length of the run.
+
+    The file can be read lazily (memory mapped) with :func:`read_tickwise` as soon as the recorder has been flushed.
+
+    :param feature: The name of the agent feature to record.
+    :param agents: A list of the indices of all agents, in the order in which their values are stored in each row.
+    :param folder_path: Path to the folder in which the .npy file is created.
+    :param str=None file_name: Name of the .npy file. If None, a unique name is generated from the feature name.
+    :param int=None chunk_rows: The number of ticks written to disk at once. If None, chunks of about 8 MB are used.
+    :param dtype: The NumPy data type of the recorded values. If None, float32 for numeric features.
+    """
+
+    header_size = 128  # fixed header size, so the shape can be rewritten in place when rows are appended
+    max_queued_chunks = 2
+
+    def __init__(self, feature: str, agents: List[int], folder_path: str or pathlib.Path, file_name: str = None,
+                 chunk_rows: int = None, dtype=None):
+        super().__init__(feature=feature, agents=agents, expected_rows=1, dtype=dtype)
+        if file_name is None:
+            file_name = 'tickwise_{}_{}.npy'.format(feature, uuid.uuid4().hex[:8])
+        self.path = pathlib.Path(folder_path).resolve() / file_name
+        self.chunk_rows = chunk_rows
+        self.rows_written = 0  # rows handed to the writer thread
+        self._buffered_rows = 0
+        self._queue = None
+        self._writer = None
+        self._writer_errors = []
+        self._file = None
+
+    def record(self, network: nx.Graph):
+        """
+        Gathers the current values of all agents on the recorded feature and appends them to the file.
+
+        :param network: The network in which the agents exist.
+        """
+        nodes = network.nodes
+        feature = self.feature
+        if self._data is None:
+            if self.dtype is None:
+                self.dtype = _infer_dtype([nodes[agent][feature] for agent in self.agents])
+            if self.dtype == object:
+                raise TypeError("Only numeric features can be streamed to disk, feature {} is not numeric".format(
+                    feature))
+            if self.chunk_rows is None:
+                row_bytes = max(1, len(self.agents) * np.dtype(self.dtype).itemsize)
+                self.chunk_rows = max(1, 2 ** 23 // row_bytes)
+            self._data = np.empty((self.chunk_rows, len(self.agents)), dtype=self.dtype)
+
+        self._data[self._buffered_rows] = np.fromiter((nodes[agent][feature] for agent in self.agents),
+                                                      dtype=self._data.dtype, count=len(self.agents))
+        self._buffered_rows += 1
+        self.num_rows += 1
+        if self._buffered_rows == self.chunk_rows:
+            self._write_buffer()
+
+    def flush(self) -> pathlib.Path:
+        """
+        Writes all buffered ticks, waits for the writer thread to finish and updates the shape in the file header.
+        Recording can continue after a flush.
+
+        :returns: The path to the .npy file.
+        """
+        if self._data is None:
+            # nothing recorded yet, still create a valid (empty) file
+            self._data = np.empty((0, len(self.agents)), dtype=self.dtype if self.dtype is not None else np.float32)
+        self._write_buffer()
+        if self._writer is not None:
+            self._put(None)
+            self._writer.join()
+            self._writer = None
+        self._raise_writer_error()
+        if self._file is None:
+            self._open_file()
+        self._file.seek(0)
+        self._file.write(_npy_header((self.rows_written, len(self.agents)), self._data.dtype, self.header_size))
+        self._file.flush()
+        return self.path
+
+    def close(self) -> pathlib.Path:
+        """
+        Flushes the recorder and closes the file.
+
+        :returns: The path to the .npy file.
+        """
+        try:
+            return self.flush()
+        finally:
+            if self._writer is not None:
+                # after a failed write the writer thread still runs, discarding the chunks that are queued
+                self._queue.put(None)
+                self._writer.join()
+                self._writer = None
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def to_array(self) -> np.ndarray:
+        """
+        :returns: A read-only memory map of the recorded ticks, with one row per tick and one column per agent.
+        """
+        return read_tickwise(self.flush())
+
+    def _write_buffer(self):
+        if self._buffered_rows == 0:
+            return
+        if self._writer is None:
+            if self._file is None:
+                self._open_file()
+            self._queue = queue.Queue(maxsize=self.max_queued_chunks)
+            self._writer = threading.Thread(target=_write_chunks, args=(self._file, self._queue, self._writer_errors),
+                                            daemon=True)
+            self._writer.start()
+        self._put(self._data[:self._buffered_rows])
+        self.rows_written += self._buffered_rows
+        # the queued buffer is owned by the writer thread now
+        self._data = np.empty_like(self._data)
+        self._buffered_rows = 0
+
+    def _put(self, chunk):
+        """
+        Hands a chunk to the writer thread. While the queue is full, the writer thread is checked for errors, so a
+        failed write stops the simulation instead of blocking it forever.
+        """
+        while True:
+            self._raise_writer_error()
+            try:
+                self._queue.put(chunk, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def _raise_writer_error(self):
+        if self._writer_errors:
+            raise self._writer_errors[0]
+
+    def _open_file(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path, 'w+b')
+        self._file.write(_npy_header((0, len(self.agents)), self._data.dtype, self.header_size))
+
+    def __getstate__(self):
+        if self._file is not None:
+            raise TypeError("A StreamingTickwiseRecorder cannot be copied after recording has started")
+        return self.__dict__.copy()
+
+
+class TrajectoryHistogram:
+    """
+    This class records the distribution of an agent feature over time as a histogram with one row per recorded tick
+    and one column per bin, instead of the values of all agents. It takes a few bytes per bin per tick regardless of
+    the number of agents, and is the data of a :class:`~defSim.tools.Plots.TrajectoryHeatPlot`, which no longer has
+    to bin the tickwise values of every agent after the run. Pass it to a simulation as one of the tickwise
+    realizations::
+
+        results = Simulation(..., tickwise=[TrajectoryHistogram('f01', bins=50)]).run()
+        TrajectoryHeatPlot(results, y='Tickwise_f01Histogram').plot()
+
+    Each simulation records into its own copy, so the same histogram can be passed to an
+    :class:`~defSim.Experiment.Experiment`. In a simulation, the agents are counted once, and the counts are updated for
+    every influence event (see :meth:`~defSim.Simulation.Simulation.on_influence`), so a recorded tick takes time in
+    proportion to the number of bins rather than the number of agents. Bins include their lower edge, the last bin
+    also its upper edge, and values outside the range are counted in the nearest bin.
+
+    :param str='f01' feature: The name of the agent feature to record.
+    :param int=20 bins: The number of bins, of equal width.
+    :param tuple=(0, 1) value_range: The lower edge of the first and the upper edge of the last bin.
+    :param str=None label: The name of the tickwise output. If None, the feature name followed by 'Histogram'.
+    :param int=1024 expected_rows: The number of rows to allocate when recording starts.
+    """
+
+    growth_factor = 2
+
+    def __init__(self, feature: str = 'f01', bins: int = 20, value_range: tuple = (0, 1), label: str = None,
+                 expected_rows: int = 1024):
+        self.feature = feature
+        self.bins = int(bins)
+        self.value_range = tuple(value_range)
+        self.edges = np.linspace(value_range[0], value_range[1], self.bins + 1)
+        self.label = label if label is not None else '{}Histogram'.format(feature)
+        self.expected_rows = max(1, int(expected_rows))
+        self.agents = []
+        self.num_rows = 0
+        self.incremental = False
+        self._counts = None
+        self._current = None  # the counts of the current values, if they are updated incrementally
+
+    def start(self, agents: List[int], expected_rows: int = None, incremental: bool = False) -> 'TrajectoryHistogram':
+        """
+        :param agents: A list of the indices of all agents.
+        :param int=None expected_rows: The number of rows to allocate. If None, self.expected_rows.
+        :param bool=False incremental: If True, the agents are counted at the first recorded tick only, and the counts
+            are updated by :meth:`on_influence`, which must then be called for every change of the feature.
+        :returns: An empty copy of this histogram that records the agents.
+        """
+        recorder = TrajectoryHistogram(feature=self.feature, bins=self.bins, value_range=self.value_range,
+                                       label=self.label,
+                                       expected_rows=expected_rows if expected_rows is not None else
+                                       self.expected_rows)
+        recorder.agents = list(agents)
+        recorder.incremental = incremental
+        return recorder
+
+    def on_influence(self, agent: int, feature: str, old_value, new_value):
+        """
+        Moves an agent to the bin of its new value, if the histogram is incremental.
+        """
+        if feature != self.feature or self._current is None:
+            return
+        bins = np.searchsorted(self.edges, [old_value, new_value], side='right') - 1
+        old_bin, new_bin = (min(max(bin_index, 0), self.bins - 1) for bin_index in bins)
+        self._current[old_bin] -= 1
+        self._current[new_bin] += 1
+
+    def record(self, network: nx.Graph):
+        """
+        Counts the current values of all agents on the recorded feature and appends the counts as a new row.
+
+        :param network: The network in which the agents exist.
+        """
+        nodes = network.nodes
+        feature = self.feature
+        if self._counts is None:
+            self._counts = np.zeros((self.expected_rows, self.bins), dtype=np.int32)
+        elif self.num_rows == self._counts.shape[0]:
+            self._grow()
+        if self._current is None:
+            values = np.fromiter((nodes[agent][feature] for agent in self.agents), dtype=np.float64,
+                                 count=len(self.agents))
+            counts = histogram_rows(values, self.edges)
+            if self.incremental:
+                self._current = counts
+        else:
+            counts = self._current
+        self._counts[self.num_rows] = counts
+        self.num_rows += 1
+
+    def to_array(self) -> np.ndarray:
+        """
+        :returns: A NumPy array with one row per recorded tick and one column per bin.
+        """
+        if self._counts is None:
+            return np.zeros((0, self.bins), dtype=np.int32)
+        return self._counts[:self.num_rows]
+
+    def _grow(self):
+        new_counts = np.zeros((self._counts.shape[0] * self.growth_factor, self.bins), dtype=self._counts.dtype)
+        new_counts[:self.num_rows] = self._counts[:self.num_rows]
+        self._counts = new_counts
+
+    def __getstate__(self):
+        # only the recorded rows are copied
+        state = self.__dict__.copy()
+        if self._counts is not None:
+            state['_counts'] = self._counts[:self.num_rows].copy()
+        return state
+
+    def __repr__(self):
+        return "TrajectoryHistogram({!r}, {} bins over {}, {} ticks)".format(self.feature, self.bins,
+                                                                          self.value_range, self.num_rows)
+
+
+def histogram_rows(values: np.ndarray, edges: np.ndarray) -> np.ndarray:
+    """
+    Counts the values in each row of an array in the bins between the edges, with the same bins as
+    :class:`TrajectoryHistogram`.
+
+    :param values: A one-dimensional array, or a two-dimensional array of which each row is counted separately.
+    :param edges: The increasing edges of the bins.
+    :returns: An array of counts with the shape of values, except that its last dimension is the number of bins.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    bins = len(edges) - 1
+    indices = np.clip(np.searchsorted(edges, values, side='right') - 1, 0, bins - 1)
+    if values.ndim == 1:
+        return np.bincount(indices, minlength=bins)
+    # offset the bins of each row, so all rows are counted with a single bincount
+    indices = indices + np.arange(values.shape[0])[:, np.newaxis] * bins
+    return np.bincount(indices.ravel(), minlength=values.shape[0] * bins).reshape(values.shape[0], bins)
+
+
+def read_tickwise(tickwise_output) -> np.ndarray:
+    """
+    Returns tickwise output as an array. Output that was streamed to disk is memory mapped, so values are only read from
+    disk when they are accessed.
+
+    :param tickwise_output: A cell of a Tickwise column: an array, a list of lists, the path to a .npy file or a
+        :class:`TrajectoryHistogram`.
+    :returns: A NumPy array (or a read-only memory map) with one row per recorded tick.
+    """
+    if isinstance(tickwise_output, TrajectoryHistogram):
+        return tickwise_output.to_array()
+    if isinstance(tickwise_output, (str, pathlib.Path)):
+        return np.load(tickwise_output, mmap_mode='r')
+    if isinstance(tickwise_output, np.ndarray):
+        return tickwise_output
+    return np.asarray(tickwise_output)
+
+
+def _write_chunks(file, chunk_queue: queue.Queue, errors: list):
+    """
+    Target of the writer thread: appends chunks to the end of the file until None is received. An exception is
+    stored in errors, to be raised in the recording thread, and the remaining chunks are discarded.
+    """
+    try:
+        file.seek(0, 2)
+    except Exception as error:
+        errors.append(error)
+    while True:
+        chunk = chunk_queue.get()
+        if chunk is None:
+            break
+        if not errors:
+            try:
+                file.write(np.ascontiguousarray(chunk).tobytes())
+            except Exception as error:
+                errors.append(error)
+
+
+def _npy_header(shape: tuple, dtype, size: int) -> bytes:
+    """
+    Creates a version 1.0 .npy header padded to a fixed size.
+    """
+    header = "{{'descr': {!r}, 'fortran_order': False, 'shape': {!r}, }}".format(
+        np.lib.format.dtype_to_descr(np.dtype(dtype)), tuple(shape))
+    header_length = size - 10  # magic string (6), version (2) and header length (2)
+    return b'\x93NUMPY\x01\x00' + struct.pack('<H', header_length) + header.ljust(header_length - 1).encode(
+        'latin1') + b'\n'
+
+
+def _infer_dtype(values: list):
+    """
+    Selects the storage type for a list of feature values: float32 if all values are real numbers, and object
+    otherwise. Integers are stored as floats as well, as the values of a continuous feature may all be whole numbers
+    at the first recorded tick.
+    """
+    if all(isinstance(value, numbers.Real) for value in values):
+        return np.float32
+    return object
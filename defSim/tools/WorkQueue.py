@@ -0,0 +1,267 @@
+import json
+import os
+import pathlib
+import pickle
+import shutil
+import socket
+import subprocess
+import sys
+import threading
+import time
+import traceback
+import uuid
+import pandas as pd
+from typing import List
+import defSim
+from defSim.tools.JobRunner import _environment, _fingerprint, _write_pickle
+
+
+class WorkQueue:
+    """
+    This class is a task queue in a folder, for worker processes on any number of machines that share a filesystem.
+    Every task is a file with one or more parameter dictionaries of an experiment. A worker claims a task by renaming
+    its file from the pending folder to the claimed folder, which succeeds for only one worker, and renews its lease by
+    touching the claimed file while the task runs. A task whose lease was not renewed for lease_seconds (because its
+    worker or machine failed) is put back in the pending folder, so another worker runs it. Results are written to the
+    done folder, and tasks whose simulations raise an error are moved to the failed folder with the traceback.
+
+    Workers are started with ``python -m defSim.worker <folder>``, on this machine or on the nodes of a cluster, and
+    run tasks until the queue is empty. As workers take a new task whenever they finish one, tasks that take longer do
+    not leave other workers idle.
+
+    :param folder: The folder of the queue. It is created if it does not exist.
+    :param float=300 lease_seconds: The time after which a claimed task without heartbeat is run again.
+    """
+
+    def __init__(self, folder: str or pathlib.Path = "queue", lease_seconds: float = 300):
+        self.folder = pathlib.Path(folder).resolve()
+        self.lease_seconds = lease_seconds
+        for subfolder in ["pending", "claimed", "done", "failed"]:
+            (self.folder / subfolder).mkdir(parents=True, exist_ok=True)
+
+    def submit(self, experiment, tasks_per_file: int = 1, overwrite: bool = False) -> int:
+        """
+        Adds the simulations of an experiment to the queue. If the queue already holds the same experiment, nothing is
+        added, so the stored tasks are used and the results of tasks that finished before are kept. This also holds
+        for experiments without seed, whose simulations are in a different order every time the experiment is created.
+        The tasks of another experiment are removed, but its results only if overwrite is True.
+
+        :param experiment: An Experiment defined by parameter combinations.
+        :param int=1 tasks_per_file: The number of simulations per task.
+        :param bool=False overwrite: Whether to remove the results of another experiment from the queue.
+        :returns: The number of tasks in the queue.
+        :raises FileExistsError: If the queue holds results of another experiment and overwrite is False.
+        """
+        if experiment.simulations is not None:
+            raise ValueError("Only experiments defined by parameter combinations can be added to a queue")
+        if len(experiment.parameter_dict_list) == 0:
+            experiment.parameter_dict_list = experiment._create_parameter_dictionaries()
+        fingerprint = _fingerprint(experiment)
+        queue_path = self.folder / "queue.json"
+        if queue_path.exists():
+            queue = json.loads(queue_path.read_text())
+            if queue['fingerprint'] == fingerprint:
+                return queue['num_tasks']
+            if not overwrite and any((self.folder / "done").glob("task_*.pickle")):
+                raise FileExistsError("{} holds results of another experiment, submit with overwrite=True to remove "
+                                      "them".format(self.folder))
+            queue_path.unlink()
+            for subfolder in ["pending", "claimed", "done", "failed"]:
+                shutil.rmtree(self.folder / subfolder)
+                (self.folder / subfolder).mkdir()
+
+        _write_pickle(self.folder / "experiment.pickle", experiment._prepare_workers())
+        tasks = list(enumerate(experiment.parameter_dict_list))
+        num_tasks = 0
+        for num_tasks, start in enumerate(range(0, len(tasks), max(1, tasks_per_file)), start=1):
+            _write_pickle(self.folder / "pending" / "task_{:08d}.pickle".format(start),
+                          tasks[start:start + tasks_per_file])
+        # the queue file is written last, so workers only start on a complete queue
+        queue_path.write_text(json.dumps({'fingerprint': fingerprint, 'num_tasks': num_tasks,
+                                          'num_simulations': len(tasks), 'lease_seconds': self.lease_seconds,
+                                          'defSim_version': defSim.__version__}, indent=1))
+        return num_tasks
+
+    def claim(self, worker_id: str) -> str or None:
+        """
+        Claims a pending task.
+
+        :param worker_id: A name of the worker that is unique across all machines.
+        :returns: The name of the claimed task, or None if no task is pending.
+        """
+        for path in sorted((self.folder / "pending").glob("task_*.pickle")):
+            try:
+                # the lease starts now: a rename keeps the time the task was submitted (or last claimed), and the
+                # file is touched before the rename, so it is never claimed with an expired lease
+                os.utime(path)
+                os.rename(path, self._claimed_path(path.name, worker_id))
+            except FileNotFoundError:  # another worker claimed it first
+                continue
+            return path.name
+        return None
+
+    def heartbeat(self, name: str, worker_id: str) -> bool:
+        """
+        Renews the lease of a claimed task.
+
+        :returns: False if the task is no longer claimed by the worker, because its lease expired.
+        """
+        try:
+            os.utime(self._claimed_path(name, worker_id))
+            return True
+        except FileNotFoundError:
+            return False
+
+    def read(self, name: str, worker_id: str) -> list:
+        """
+        :returns: The list of (index, parameter dictionary) tuples of a claimed task.
+        """
+        with open(self._claimed_path(name, worker_id), 'rb') as task_file:
+            return pickle.load(task_file)
+
+    def complete(self, name: str, worker_id: str, result: pd.DataFrame):
+        """
+        Stores the result of a claimed task and removes the claim.
+        """
+        _write_pickle(self.folder / "done" / name, result)
+        self._claimed_path(name, worker_id).unlink(missing_ok=True)
+
+    def fail(self, name: str, worker_id: str, error: str):
+        """
+        Moves a claimed task to the failed folder, next to a text file with the error.
+        """
+        (self.folder / "failed" / name).with_suffix(".txt").write_text(error)
+        try:
+            os.rename(self._claimed_path(name, worker_id), self.folder / "failed" / name)
+        except FileNotFoundError:
+            pass
+
+    def reclaim_expired(self) -> int:
+        """
+        Puts claimed tasks whose lease expired back in the pending folder.
+
+        :returns: The number of reclaimed tasks.
+        """
+        reclaimed = 0
+        now = time.time()
+        for path in (self.folder / "claimed").glob("task_*.pickle.*"):
+            try:
+                if now - path.stat().st_mtime < self.lease_seconds:
+                    continue
+                name = path.name[:path.name.index(".pickle") + len(".pickle")]
+                if (self.folder / "done" / name).exists():
+                    path.unlink()  # the worker finished, but failed to remove its claim
+                else:
+                    os.rename(path, self.folder / "pending" / name)
+                    reclaimed += 1
+            except FileNotFoundError:  # the task was completed or reclaimed in the meantime
+                continue
+        return reclaimed
+
+    def status(self) -> dict:
+        """
+        :returns: A dictionary with the number of pending, claimed, done and failed tasks.
+        """
+        return {subfolder: sum(1 for _ in (self.folder / subfolder).glob("task_*.pickle*"))
+                for subfolder in ["pending", "claimed", "done", "failed"]}
+
+    def results(self) -> pd.DataFrame:
+        """
+        :returns: A dataframe with the results of all finished tasks, in the order of the parameter_dict_list.
+        """
+        results = []
+        for path in sorted((self.folder / "done").glob("task_*.pickle")):
+            with open(path, 'rb') as result_file:
+                results.append(pickle.load(result_file))
+        return pd.concat(results).reset_index()
+
+    def wait(self, poll_interval: float = 5, timeout: float = None) -> pd.DataFrame:
+        """
+        Waits until all tasks are done, and reclaims tasks of failed workers in the meantime.
+
+        :param float=5 poll_interval: The number of seconds between two checks of the queue.
+        :param float=None timeout: The maximum number of seconds to wait. If None, there is no limit.
+        :returns: The merged results of all tasks.
+        """
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        while True:
+            self.reclaim_expired()
+            status = self.status()
+            if status['failed']:
+                raise RuntimeError("{} tasks failed, see the error files in {}".format(status['failed'],
+                                                                                      self.folder / "failed"))
+            if status['pending'] == 0 and status['claimed'] == 0:
+                return self.results()
+            if deadline is not None and time.monotonic() > deadline:
+                raise TimeoutError("{pending} tasks are pending and {claimed} are running".format(**status))
+            time.sleep(poll_interval)
+
+    def _claimed_path(self, name: str, worker_id: str) -> pathlib.Path:
+        return self.folder / "claimed" / "{}.{}".format(name, worker_id)
+
+
+def work(folder: str or pathlib.Path, worker_id: str = None, max_tasks: int = None, wait_for_tasks: bool = False,
+         poll_interval: float = 1) -> int:
+    """
+    Runs tasks of a WorkQueue until the queue is empty. While no task is pending but other workers are still running
+    tasks, the worker waits, so it can take over the tasks of workers that fail.
+
+    :param folder: The folder of the queue.
+    :param str=None worker_id: A name of the worker that is unique across all machines. If None, it is created from
+        the host name, the process id and a random part.
+    :param int=None max_tasks: The maximum number of tasks to run. If None, there is no limit.
+    :param bool=False wait_for_tasks: If true, the worker keeps waiting for new tasks when the queue is empty.
+    :param float=1 poll_interval: The number of seconds between two checks of the queue when no task is pending.
+    :returns: The number of tasks the worker ran.
+    """
+    from defSim.Experiment import _initialize_worker, _run_simulation_in_worker
+
+    folder = pathlib.Path(folder).resolve()
+    if worker_id is None:
+        worker_id = "{}-{}-{}".format(socket.gethostname(), os.getpid(), uuid.uuid4().hex[:8])
+    while not (folder / "queue.json").exists():  # the queue is still being written
+        time.sleep(poll_interval)
+    queue = WorkQueue(folder, lease_seconds=json.loads((folder / "queue.json").read_text())['lease_seconds'])
+    with open(folder / "experiment.pickle", 'rb') as experiment_file:
+        _initialize_worker(*pickle.load(experiment_file))
+
+    num_tasks = 0
+    while max_tasks is None or num_tasks < max_tasks:
+        queue.reclaim_expired()
+        name = queue.claim(worker_id)
+        if name is None:
+            if not wait_for_tasks and queue.status()['claimed'] == 0:
+                break
+            time.sleep(poll_interval)
+            continue
+
+        stop_heartbeat = threading.Event()
+
+        def renew_lease():
+            queue.heartbeat(name, worker_id)
+            while not stop_heartbeat.wait(queue.lease_seconds / 3):
+                queue.heartbeat(name, worker_id)
+
+        heartbeat = threading.Thread(target=renew_lease, daemon=True)
+        heartbeat.start()
+        try:
+            results = [_run_simulation_in_worker(parameter_dict) for _, parameter_dict in queue.read(name, worker_id)]
+            queue.complete(name, worker_id, pd.concat(results))
+        except Exception:
+            queue.fail(name, worker_id, traceback.format_exc())
+        finally:
+            stop_heartbeat.set()
+            heartbeat.join()
+        num_tasks += 1
+    return num_tasks
+
+
+def start_local_workers(folder: str or pathlib.Path, num_workers: int) -> List:
+    """
+    Starts worker processes for a queue on this machine.
+
+    :returns: The list of started processes.
+    """
+    environment = _environment()
+    return [subprocess.Popen([sys.executable, "-m", "defSim.worker", str(folder)], env=environment)
+            for _ in range(num_workers)]
@@ -0,0 +1,198 @@
+import importlib
+import os
+import pickle
+import tempfile
+import threading
+import uuid
+import multiprocessing as mp
+import networkx as nx
+from typing import List
+from defSim.tools.SharedNetwork import SharedNetwork
+
+PRELOADED_NETWORK = "preloaded network"  # stands for the network that was sent to the workers when they started
+
+_preloaded_network = None
+_current_token = None
+
+
+class WorkerPool:
+    """
+    This class is a pool of worker processes that is kept alive between experiments, so interactive workflows that run
+    many small experiments only pay the start of the processes, the import of defSim and the transfer of the network
+    once. Pass it to :meth:`~defSim.Experiment.Experiment.run` with the executor argument. The pool should be shut down
+    with :meth:`close`, or used as a context manager::
+
+        with WorkerPool(num_workers=4, network=network) as pool:
+            for homophily in [0.5, 1, 2]:
+                results = Experiment(network=network, influence_parameters={'homophily': homophily}).run(executor=pool)
+
+    Every experiment run in the pool sends its settings to the workers once: they are pickled once, sent along with
+    the tasks (or through a temporary file if they are large) and unpickled once per worker.
+
+    :param int=mp.cpu_count() num_workers: The number of worker processes.
+    :param str=None start_method: The start method of the processes, "fork", "spawn" or "forkserver". If None, the
+        default of the platform is used.
+    :param list=None preload: The modules that the workers import when they start. If None, the Experiment module
+        (and with it defSim, pandas and tqdm) and the SciPy module used to find clusters are imported.
+    :param network: A network that is sent to the workers when they start. Experiments with this network (the same
+        object) do not send it again.
+    :param bool=True warm_up: Whether to wait until all workers have started, so the first experiment does not wait
+        for them.
+    :param float=120 start_timeout: The maximum number of seconds to wait for the workers to start, if warm_up is true.
+    """
+
+    def __init__(self, num_workers: int = mp.cpu_count(), start_method: str = None, preload: List[str] = None,
+                 network: nx.Graph = None, warm_up: bool = True, start_timeout: float = 120):
+        self.num_workers = num_workers
+        self.start_method = start_method
+        self.preload = list(preload) if preload is not None else ["defSim.Experiment", "scipy.sparse.csgraph"]
+        self.network = network
+        context = mp.get_context(start_method)
+        if context.get_start_method() == "forkserver":
+            context.set_forkserver_preload(self.preload)
+        shared_network = SharedNetwork(network) if network is not None else None
+        # the workers and this process meet at the barrier once all workers have imported the modules
+        ready = context.Barrier(num_workers + 1) if warm_up else None
+        self._pool = context.Pool(processes=num_workers, initializer=_start_worker,
+                                  initargs=(self.preload, shared_network, ready))
+        if warm_up:
+            try:
+                ready.wait(timeout=start_timeout)
+            except threading.BrokenBarrierError:
+                self._pool.terminate()
+                raise RuntimeError("The workers did not start within {} seconds".format(start_timeout))
+            finally:
+                ready.abort()  # workers that are restarted later do not wait
+
+    def shares_network(self, network) -> bool:
+        """
+        :returns: Whether the network was sent to the workers when they started.
+        """
+        return self.network is not None and network is self.network
+
+    def pids(self) -> List[int]:
+        """
+        :returns: The process ids of the workers.
+        """
+        return sorted(process.pid for process in self._pool._pool)
+
+    def bind(self, initializer=None, initargs: tuple = ()) -> '_BoundPool':
+        """
+        Prepares the pool for a set of tasks: initializer(*initargs) is called in each worker before the first of
+        these tasks that it runs.
+
+        :returns: An object with the imap, imap_unordered and map methods of a multiprocessing Pool, which can be used
+            as a context manager to remove the settings of the tasks when they are done.
+        """
+        return _BoundPool(self._pool, initializer, initargs)
+
+    def close(self):
+        """
+        Lets the workers finish their tasks and stops them.
+        """
+        self._pool.close()
+        self._pool.join()
+
+    def terminate(self):
+        """
+        Stops the workers immediately.
+        """
+        self._pool.terminate()
+        self._pool.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.terminate()
+
+    def __reduce__(self):
+        raise TypeError("A WorkerPool cannot be sent to other processes")
+
+
+class _Payload:
+    """
+    The pickled initializer of a set of tasks, sent along with every task. Large payloads are written to a temporary
+    file, so only its path is sent with the tasks.
+    """
+
+    max_inline_bytes = 1 << 16
+
+    def __init__(self, initializer, initargs: tuple):
+        self.token = uuid.uuid4().hex
+        data = pickle.dumps((initializer, initargs), protocol=pickle.HIGHEST_PROTOCOL)
+        self.path = None
+        if len(data) > self.max_inline_bytes:
+            file_descriptor, self.path = tempfile.mkstemp(prefix="defSim_", suffix=".pickle")
+            with os.fdopen(file_descriptor, 'wb') as payload_file:
+                payload_file.write(data)
+            data = None
+        self.data = data
+
+    def load(self) -> tuple:
+        if self.data is not None:
+            return pickle.loads(self.data)
+        with open(self.path, 'rb') as payload_file:
+            return pickle.load(payload_file)
+
+    def remove(self):
+        if self.path is not None and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class _BoundPool:
+
+    def __init__(self, pool, initializer, initargs: tuple):
+        self._pool = pool
+        self._payload = _Payload(initializer, initargs) if initializer is not None else None
+
+    def imap(self, function, iterable, chunksize: int = 1):
+        return self._pool.imap(_call_in_worker, self._tasks(function, iterable), chunksize)
+
+    def imap_unordered(self, function, iterable, chunksize: int = 1):
+        return self._pool.imap_unordered(_call_in_worker, self._tasks(function, iterable), chunksize)
+
+    def map(self, function, iterable, chunksize: int = None) -> list:
+        return self._pool.map(_call_in_worker, list(self._tasks(function, iterable)), chunksize)
+
+    def _tasks(self, function, iterable):
+        return ((self._payload, function, item) for item in iterable)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self._payload is not None:
+            self._payload.remove()
+
+
+def preloaded_network() -> SharedNetwork or None:
+    """
+    :returns: In a worker of a WorkerPool, the network that was sent to it when it started.
+    """
+    return _preloaded_network
+
+
+def _start_worker(modules: List[str], shared_network: SharedNetwork, ready):
+    global _preloaded_network
+    for module in modules:
+        importlib.import_module(module)
+    _preloaded_network = shared_network
+    if ready is not None:
+        try:
+            ready.wait()
+        except threading.BrokenBarrierError:
+            pass
+
+
+def _call_in_worker(task):
+    global _current_token
+    payload, function, item = task
+    if payload is not None and payload.token != _current_token:
+        initializer, initargs = payload.load()
+        initializer(*initargs)
+        _current_token = payload.token
+    return function(item)
@@ -0,0 +1,17 @@
+import importlib
+
+# the tools are imported when they are first used, as some of them import pandas, matplotlib or seaborn (PEP 562)
+_modules = ["Animation", "ClusterExecutionScript", "ConvergenceChecks", "CostModel", "CreateDataFiles",
+            "CreateOutputTable", "EventLog", "ExperimentStore", "InitialStateCache", "Instrumentation", "JobRunner",
+            "Layouts", "NetworkDistanceUpdater", "OutputMeasures", "Plots", "Profiling", "SharedNetwork",
+            "TickwiseRecorder", "WorkerPool", "WorkQueue"]
+
+
+def __getattr__(name: str):
+    if name in _modules:
+        return importlib.import_module("defSim.tools." + name)
+    raise AttributeError("module 'defSim.tools' has no attribute '{}'".format(name))
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_modules))
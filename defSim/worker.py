@@ -0,0 +1,26 @@
+"""
+Runs the tasks of a :class:`~defSim.tools.WorkQueue.WorkQueue`. Start any number of workers, on any machines that share
+the folder of the queue, with::
+
+    python -m defSim.worker <queue_dir>
+"""
+import argparse
+from defSim.tools.WorkQueue import work
+
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(description="Runs the tasks of a defSim work queue.")
+    parser.add_argument("queue_dir", help="the folder of the queue")
+    parser.add_argument("--worker-id", default=None, help="a unique name of the worker")
+    parser.add_argument("--max-tasks", type=int, default=None, help="the maximum number of tasks to run")
+    parser.add_argument("--wait", action="store_true", help="keep waiting for new tasks when the queue is empty")
+    parser.add_argument("--poll-interval", type=float, default=1,
+                        help="the number of seconds between two checks of the queue")
+    arguments = parser.parse_args(arguments)
+    num_tasks = work(arguments.queue_dir, worker_id=arguments.worker_id, max_tasks=arguments.max_tasks,
+                     wait_for_tasks=arguments.wait, poll_interval=arguments.poll_interval)
+    print("ran %d tasks" % num_tasks)
+
+
+if __name__ == '__main__':
+    main()